@@ -1,19 +1,16 @@
 # -*- coding: utf-8 -*-
 import json
-from langchain.vectorstores import Chroma
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-from langchain.llms import HuggingFacePipeline
-from langchain import PromptTemplate, LLMChain
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import Chroma
-from langchain import PromptTemplate
-from langchain.chat_models import ChatOpenAI
-from openai import OpenAI
 import re
 import os
 import time
 
+# openai, langchain and transformers are imported by the functions that use
+# them; transformers and chromadb in particular take seconds to import.
+
 def get_context(query, documents, embeddings):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain.vectorstores import Chroma
+
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=2048, chunk_overlap=100)
     texts = text_splitter.split_documents(documents)
 
@@ -38,6 +35,7 @@ class CustomEncoder(json.JSONEncoder):
 
 def separate_captions(caption, api, llm):
   if llm=='gpt-4o':
+    from openai import OpenAI
 
     client = OpenAI(
     api_key=api,
@@ -70,6 +68,10 @@ def separate_captions(caption, api, llm):
         output_dict = None
 
   else:
+    from langchain import LLMChain, PromptTemplate
+    from langchain.llms import HuggingFacePipeline
+    from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+
     #Create a local tokenizer copy the first time
     if os.path.isdir("./tokenizer/"):
         tokenizer = AutoTokenizer.from_pretrained("./tokenizer/")
@@ -116,6 +118,8 @@ def separate_captions(caption, api, llm):
 
 def get_keywords(caption, api, llm):
 #   llm = ChatOpenAI(model_name='gpt-4o', openai_api_key=api)
+  from openai import OpenAI
+
   caption_prompt = f"You are an experienced material scientist. Summarize the text in a less than three keywords separated by comma. The keywords should be a broad and general description of the caption and can be related to the materials used, characterization techniques or any other scientific related keyword. Do not halucinate or create content that does not exist in the provided text: {caption}"
   client = OpenAI(
     api_key=api,
@@ -3,6 +3,7 @@ import json
 import logging
 import os
 import pathlib
+import shutil
 import time
 import warnings
 
@@ -15,22 +16,42 @@ import torchvision.transforms as T
 import yaml
 from PIL import Image
 from scipy.special import softmax
-from skimage import io
 from torch.autograd import Variable
 from torchvision.models.detection.faster_rcnn import FastRCNNPredictor
 
+from .figures import onnx_backend, quantize, repostprocess
+from .figures.image import FigureImage
 from .figures.models.crnn import CRNN
 from .figures.models.network import resnet152
 from .figures.models.yolov3 import YOLOv3, YOLOv3img
 from .figures.scale import ctc
+from .figures.scale.gate import KEYWORDS, ScaleGate, caption_score
 from .figures.scale.process import non_max_suppression_malisiewicz
-from .figures.separator import process
+from .figures.separator import batch, process
+from .figures.writer import CropWriter
 from .tool import ExsclaimTool
-from .utilities import boxes
+from .utilities import boxes, ledger, result_cache
+from .utilities.box_set import BoxSet
 from .utilities.logging import Printer
-from .utilities.models import load_model_from_checkpoint
+from .utilities.models import CHECKPOINTS, ModelRegistry, load_model_from_checkpoint
+
+# Stages of extract_image_objects that can be selected in the query with
+# "figure_separator": {"stages": [...]}
+STAGES = ("subfigures", "scale")
+# Runtimes the YOLO, Faster R-CNN and CRNN models can run on
+BACKENDS = ("torch", "onnx")
+# Fine tuned YOLO subfigure detector of the "torch" backend
+YOLO_CHECKPOINT = CHECKPOINTS / "yolov11_finetuned_augmentation_best.pt"
+
+
+# Height and (maximum) width scale labels are resized to for the CRNN
+SCALE_LABEL_HEIGHT = 128
+SCALE_LABEL_WIDTH = 512
+# Characters read by the CRNN, in class order. The CTC blank is the last class
+SCALE_LABEL_CLASSES = "0123456789mMcCuUnN .A"
+# Scale objects of a figure the scale gate skips
+NO_SCALE_OBJECTS = np.zeros((0, 6), dtype=np.float32)
 
-from ultralytics import YOLO
 
 def convert_to_rgb(image):
     return image.convert("RGB")
@@ -52,38 +73,105 @@ class FigureSeparator(ExsclaimTool):
         self.exsclaim_json = {}
 
     def _load_model(self):
-        """Load relevant models for the object detection tasks"""
-        """Load YOLO model directly from checkpoint"""
-        try:
-            model_path = os.path.join(
-                os.path.dirname(__file__),
-                "figures/checkpoints/yolov11_finetuned_augmentation_best.pt"
-                # "figures/checkpoints/yolov11_subfigure_classification.pt"
-            )
-            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-            
-            # Load model directly from .pt file
-            self.yolo_model = YOLO(model_path)
-            self.yolo_model.to(self.device)
-            
-            # Common YOLO settings if needed
-            self.confidence_threshold = 0.25  # Default confidence threshold
-            self.image_size = 640  # Default YOLO image size
-            
-        except Exception as e:
-            self.logger.error(f"Error loading model: {str(e)}", exc_info=True)
-            raise
-
+        """Set up the models for the object detection tasks
 
+        Models are registered here and loaded the first time they are used,
+        so only the models needed by the selected stages are ever loaded.
+        """
+        config = self.search_query.get("figure_separator", {})
+        self.stages = set(config.get("stages", STAGES))
+        self.batch_size = config.get("batch_size", 16)
+        self.prefetch = config.get("prefetch", 2)
+        self.decode_workers = config.get("decode_workers", 2)
+        self.scale_batch_size = config.get("scale_batch_size", 4)
+        self.scale_min_size = config.get("scale_min_size", 800)
+        self.scale_max_size = config.get("scale_max_size", 1333)
+        self.scale_label_batch_size = config.get("scale_label_batch_size", 64)
+        self.scale_label_width = config.get("scale_label_width", "fixed")
+        self.scale_label_grammar = config.get("scale_label_grammar", False)
+        if self.scale_label_width not in ("fixed", "dynamic"):
+            raise ValueError(
+                "scale_label_width must be 'fixed' or 'dynamic', not {}".format(
+                    self.scale_label_width
+                )
+            )
+        self.scale_label_normalize = T.Compose(
+            [
+                T.Lambda(convert_to_rgb),
+                T.ToTensor(),
+                T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+            ]
+        )
+        gate_config = config.get("scale_gate", {})
+        self.scale_gate = ScaleGate(
+            mode=gate_config.get("mode", "off"),
+            threshold=gate_config.get("threshold", 0.1),
+            keywords=gate_config.get("keywords", KEYWORDS),
+        )
+        self.thresholds = dict(
+            repostprocess.THRESHOLDS, **config.get("thresholds", {})
+        )
+        raw_config = config.get("raw_detections", False)
+        self.raw_thresholds = None
+        if raw_config:
+            raw_config = {} if raw_config is True else raw_config
+            self.raw_thresholds = dict(repostprocess.RAW_THRESHOLDS, **raw_config)
+        self.raw_detections = {}
+        cache_config = config.get("result_cache", False)
+        self.result_cache = None
+        if cache_config and self.raw_thresholds is not None:
+            self.logger.warning(
+                "Raw detections are only saved for figures that are run "
+                "through the models. Not using the result cache."
+            )
+        elif cache_config:
+            cache_config = {} if cache_config is True else cache_config
+            self.result_cache = result_cache.ResultCache(
+                cache_config.get("path", result_cache.DEFAULT_PATH),
+                max_bytes=int(cache_config.get("max_size_mb", 512) * 2**20),
+            )
+        self.result_keys = {}
+        self.crop_writer = CropWriter(
+            workers=config.get("writer_workers", 2),
+            image_format=config.get("crop_format", "png"),
+            compress_level=config.get("compress_level", 6),
+        )
+        self.backend = config.get("backend", "torch")
+        if self.backend not in BACKENDS:
+            raise ValueError(
+                "Unknown figure separator backend {}. Choose from {}".format(
+                    self.backend, BACKENDS
+                )
+            )
+        self.onnx_directory = pathlib.Path(
+            config.get("onnx_dir", onnx_backend.ONNX_DIRECTORY)
+        )
+        self.quantization = config.get("quantization")
+        if self.quantization not in (None,) + quantize.MODES:
+            raise ValueError(
+                "Unknown quantization {}. Choose from {}".format(
+                    self.quantization, quantize.MODES
+                )
+            )
+        unknown_stages = self.stages - set(STAGES)
+        if unknown_stages:
+            raise ValueError(
+                "Unknown figure separator stages {}. Choose from {}".format(
+                    sorted(unknown_stages), STAGES
+                )
+            )
 
         # Set configuration variables
         model_path = os.path.dirname(__file__) + "/figures/"
         configuration_file = model_path + "config/yolov3_default_subfig.cfg"
         with open(configuration_file, "r") as f:
-            configuration = yaml.load(f, Loader=yaml.FullLoader)
+            self.subfigure_configuration = yaml.load(f, Loader=yaml.FullLoader)
+        master_config_file = model_path + "config/yolov3_default_master.cfg"
+        with open(master_config_file, "r") as f:
+            self.master_configuration = yaml.load(f, Loader=yaml.FullLoader)
 
-        self.image_size = configuration["TEST"]["IMGSIZE"]
-        self.nms_threshold = configuration["TEST"]["NMSTHRE"]
+        self.image_size = self.subfigure_configuration["TEST"]["IMGSIZE"]
+        self.nms_threshold = self.subfigure_configuration["TEST"]["NMSTHRE"]
         self.confidence_threshold = 0.0001
         self.gpu_id = 1
         # This suppresses warning if user has no CUDA device initialized,
@@ -100,28 +188,83 @@ class FigureSeparator(ExsclaimTool):
         self.device = (
             torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu")
         )
-        # Load object detection model
-        object_detection_model = YOLOv3(configuration["MODEL"])
-        self.object_detection_model = load_model_from_checkpoint(
-            object_detection_model, "object_detection_model.pt", self.cuda, self.device
+        if self.quantization and (self.cuda or self.backend != "torch"):
+            self.logger.warning(
+                "INT8 quantization only applies to the torch backend on CPUs. "
+                "Running the models unquantized."
+            )
+            self.quantization = None
+
+        self.models = ModelRegistry(
+            {
+                "yolo_model": self._load_yolo_model,
+                "object_detection_model": self._load_object_detection_model,
+                "text_recognition_model": self._load_text_recognition_model,
+                "classifier_model": self._load_classifier_model,
+                "scale_bar_detection_model": self._load_scale_bar_detection_model,
+                "scale_label_recognition_model": (
+                    self._load_scale_label_recognition_model
+                ),
+            }
         )
-        # Load text recognition model
+
+    def _onnx_path(self, model_name):
+        """Path of an exported model for the "onnx" backend"""
+        path = self.onnx_directory / onnx_backend.MODEL_FILES[model_name]
+        if not path.is_file():
+            raise FileNotFoundError(
+                "No ONNX model at {}. Export it with "
+                "python -m exsclaim.figures.export".format(path)
+            )
+        return path
+
+    def _load_yolo_model(self):
+        """Load YOLO model directly from checkpoint"""
+        from ultralytics import YOLO
+
+        if self.backend == "onnx":
+            return onnx_backend.load_yolo(self._onnx_path("yolo_model"))
+        try:
+            # Load model directly from .pt file
+            yolo_model = YOLO(str(YOLO_CHECKPOINT))
+            yolo_model.to(self.device)
+            return yolo_model
+        except Exception as e:
+            self.logger.error(f"Error loading model: {str(e)}", exc_info=True)
+            raise
+
+    def _load_object_detection_model(self):
+        object_detection_model = YOLOv3(self.subfigure_configuration["MODEL"])
+        return load_model_from_checkpoint(
+            object_detection_model, "object_detection_model.pt", self.cuda, self.device
+        ).eval()
+
+    def _load_text_recognition_model(self):
         text_recognition_model = resnet152()
-        self.text_recognition_model = load_model_from_checkpoint(
+        return load_model_from_checkpoint(
             text_recognition_model, "text_recognition_model.pt", self.cuda, self.device
-        )
-        # Load classification model
-        master_config_file = model_path + "config/yolov3_default_master.cfg"
-        with open(master_config_file, "r") as f:
-            master_config = yaml.load(f, Loader=yaml.FullLoader)
-        classifier_model = YOLOv3img(master_config["MODEL"])
-        self.classifier_model = load_model_from_checkpoint(
+        ).eval()
+
+    def _load_classifier_model(self):
+        classifier_model = YOLOv3img(self.master_configuration["MODEL"])
+        return load_model_from_checkpoint(
             classifier_model, "classifier_model.pt", self.cuda, self.device
-        )
-        # Load scale bar detection model
-        # load an object detection model pre-trained on COCO
-        scale_bar_detection_model = (
-            torchvision.models.detection.fasterrcnn_resnet50_fpn(pretrained=True)
+        ).eval()
+
+    def _build_scale_bar_detection_model(self):
+        """Faster R-CNN with a 3 class head and untrained weights
+
+        Figures are resized so their short side is scale_min_size and their
+        long side at most scale_max_size, and boxes are mapped back to the
+        figure's own pixels by the model.
+        """
+        # every weight, including the backbone, comes from our checkpoint
+        # so nothing is downloaded
+        scale_bar_detection_model = torchvision.models.detection.fasterrcnn_resnet50_fpn(
+            weights=None,
+            weights_backbone=None,
+            min_size=self.scale_min_size,
+            max_size=self.scale_max_size,
         )
         input_features = (
             scale_bar_detection_model.roi_heads.box_predictor.cls_score.in_features
@@ -130,25 +273,112 @@ class FigureSeparator(ExsclaimTool):
         scale_bar_detection_model.roi_heads.box_predictor = FastRCNNPredictor(
             input_features, number_classes
         )
-        self.scale_bar_detection_model = load_model_from_checkpoint(
-            scale_bar_detection_model,
+        return scale_bar_detection_model
+
+    def _load_scale_bar_detection_model(self):
+        if self.backend == "onnx":
+            return onnx_backend.OnnxScaleBarDetector(
+                self._onnx_path("scale_bar_detection_model"), self.cuda
+            )
+        scale_bar_detection_model = load_model_from_checkpoint(
+            self._build_scale_bar_detection_model(),
             "scale_bar_detection_model.pt",
             self.cuda,
             self.device,
-        )
-        # Load scale label recognition model
+        ).eval()
+        if self.quantization:
+            scale_bar_detection_model = quantize.load_quantized(
+                CHECKPOINTS / "scale_bar_detection_model.pt",
+                self.quantization,
+                lambda images: quantize.quantize_scale_bar_detector(
+                    scale_bar_detection_model, self.quantization, images
+                ),
+                self._calibration_figures,
+            )
+            # the cache may have been made with other resizing options
+            scale_bar_detection_model.transform.min_size = (self.scale_min_size,)
+            scale_bar_detection_model.transform.max_size = self.scale_max_size
+        return scale_bar_detection_model
+
+    def _load_scale_label_recognition_model(self):
+        if self.backend == "onnx":
+            return onnx_backend.OnnxLabelReader(
+                self._onnx_path("scale_label_recognition_model"), self.cuda
+            )
         parent_dir = pathlib.Path(__file__).resolve(strict=True).parent
         config_path = parent_dir / "figures" / "config" / "scale_label_reader.json"
         with open(config_path, "r") as f:
             configuration_file = json.load(f)
         configuration = configuration_file["theta"]
         scale_label_recognition_model = CRNN(configuration=configuration)
-        self.scale_label_recognition_model = load_model_from_checkpoint(
+        scale_label_recognition_model = load_model_from_checkpoint(
             scale_label_recognition_model,
             "scale_label_recognition_model.pt",
             self.cuda,
             self.device,
-        )
+        ).eval()
+        if self.quantization:
+            scale_label_recognition_model = quantize.load_quantized(
+                CHECKPOINTS / "scale_label_recognition_model.pt",
+                self.quantization,
+                lambda images: quantize.quantize_scale_label_reader(
+                    scale_label_recognition_model, self.quantization, images
+                ),
+                self._calibration_labels,
+            )
+        return scale_label_recognition_model
+
+    def _calibration_images(self, directory):
+        """Paths of the images in a calibration directory of tests/data"""
+        directory = quantize.CALIBRATION_DIRECTORY / directory
+        if not directory.is_dir():
+            raise FileNotFoundError(
+                "Static quantization calibrates on {}, which is missing. "
+                "Use dynamic quantization instead.".format(directory)
+            )
+        return sorted(directory.iterdir())
+
+    def _calibration_figures(self):
+        """Figures to calibrate the quantized scale bar detector on"""
+        return [
+            FigureImage(path).tensor()
+            for path in self._calibration_images("scale_bar_test_images")
+        ]
+
+    def _calibration_labels(self):
+        """Batches of scale labels to calibrate the quantized CRNN on"""
+        labels = [
+            self.scale_label_normalize(
+                self._resize_scale_label(Image.open(path).convert("RGB"))
+            )
+            for path in self._calibration_images("scale_label_test_images")
+        ]
+        # dynamic widths differ, so each label is its own batch
+        return [label.unsqueeze(0) for label in labels]
+
+    @property
+    def yolo_model(self):
+        return self.models.get("yolo_model")
+
+    @property
+    def object_detection_model(self):
+        return self.models.get("object_detection_model")
+
+    @property
+    def text_recognition_model(self):
+        return self.models.get("text_recognition_model")
+
+    @property
+    def classifier_model(self):
+        return self.models.get("classifier_model")
+
+    @property
+    def scale_bar_detection_model(self):
+        return self.models.get("scale_bar_detection_model")
+
+    @property
+    def scale_label_recognition_model(self):
+        return self.models.get("scale_label_recognition_model")
 
     def _update_exsclaim(self, exsclaim_dict, figure_name, figure_dict):
         figure_name = figure_name.split("/")[-1]
@@ -159,19 +389,309 @@ class FigureSeparator(ExsclaimTool):
             exsclaim_dict[figure_name]["unassigned"]["master_images"].append(unassigned)
         return exsclaim_dict
 
-    def _appendJSON(self, exsclaim_json, figures_separated):
-        """Commit updates to EXSCLAIM JSON and updates list of separated figures
+    def _separate_figure(
+        self, figure_path, figure_image=None, detections=None, scale_objects=None
+    ):
+        """Extract image objects from one figure, logging any failure
+
+        Args:
+            figure_path (pathlib.Path): path to the figure image
+            figure_image (FigureImage): the decoded figure, if already read
+            detections (np.ndarray): the figure's subfigure detections from
+                detect_subfigures, if already run
+            scale_objects (np.ndarray): the figure's scale bar and label
+                detections from detect_scale, if already run
+        Returns:
+            success (bool): True if the figure was separated
+        Modifies:
+            self.exsclaim_json[figure_path.name]
+        """
+        try:
+            self.extract_image_objects(
+                figure_path, detections, figure_image, scale_objects
+            )
+            return True
+        except Exception:
+            if self.print:
+                Printer(
+                    (
+                        "<!> ERROR: An exception occurred in"
+                        " FigureSeparator on figure: {}".format(figure_path)
+                    )
+                )
+            self.logger.exception(
+                (
+                    "<!> ERROR: An exception occurred in"
+                    " FigureSeparator on figure: {}".format(figure_path)
+                )
+            )
+            return False
+
+    def _write_subfigure(self, figure_path, figure_image, master_image):
+        """Queue a master image's crop to be saved
+
+        Crops are saved to images/<figure>/<label>/<figure>_<label>.png,
+        where <figure> is the figure's name without its extension.
+
+        Args:
+            figure_path (pathlib.Path): path to the figure image
+            figure_image (FigureImage): the decoded figure
+            master_image (dict): Master Image JSON of the subfigure
+        """
+        figure_base_name = pathlib.Path(figure_path).stem
+        label = master_image["subfigure_label"]["text"]
+        subfigure_directory = (
+            self.results_directory / "images" / figure_base_name / label
+        )
+        os.makedirs(subfigure_directory, exist_ok=True)
+        x1, y1, x2, y2 = boxes.convert_labelbox_to_coords(master_image["geometry"])
+        self.crop_writer.write(
+            pathlib.Path(figure_path).name,
+            figure_image.crop(x1, y1, x2, y2),
+            subfigure_directory / "{}_{}.png".format(figure_base_name, label),
+        )
+
+    def _result_settings(self):
+        """Model versions and options a figure's separator output depends on
+
+        A model's version is the size and modification time of its file.
+        Quantized models are cached from, and versioned by, their fp32
+        checkpoint.
+
+        Returns:
+            settings (dict): JSON serializable settings, part of the key of
+                the figure's result in the result cache
+        """
+        if self.backend == "onnx":
+            paths = [
+                self.onnx_directory / onnx_backend.MODEL_FILES[model_name]
+                for model_name in sorted(onnx_backend.MODEL_FILES)
+            ]
+        else:
+            paths = [
+                YOLO_CHECKPOINT,
+                CHECKPOINTS / "scale_bar_detection_model.pt",
+                CHECKPOINTS / "scale_label_recognition_model.pt",
+            ]
+        versions = {}
+        for path in paths:
+            try:
+                stat = path.stat()
+                versions[path.name] = [stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                versions[path.name] = None
+        return {
+            "models": versions,
+            "stages": sorted(self.stages),
+            "backend": self.backend,
+            "quantization": self.quantization,
+            "thresholds": self.thresholds,
+            "scale_min_size": self.scale_min_size,
+            "scale_max_size": self.scale_max_size,
+            "scale_label_width": self.scale_label_width,
+            "scale_label_grammar": self.scale_label_grammar,
+            "scale_gate": [
+                self.scale_gate.mode,
+                self.scale_gate.threshold,
+                sorted(self.scale_gate.keywords),
+            ],
+        }
+
+    def _figure_settings(self, settings, figure_name):
+        """Settings of one figure's result, from _result_settings
+
+        A scale gate that reads captions skips scale detection depending on
+        the figure's caption, so its caption score is part of the settings.
+
+        Args:
+            settings (dict): the run's settings, from _result_settings
+            figure_name (str): name of the figure
+        Returns:
+            settings (dict): JSON serializable settings of the figure's result
+        """
+        if "scale" not in self.stages or self.scale_gate.mode not in (
+            "caption",
+            "both",
+        ):
+            return settings
+        figure_json = self.exsclaim_json.get(figure_name, {})
+        score = caption_score(figure_json, self.scale_gate.keywords)
+        return dict(settings, caption_score=score)
+
+    def _split_cached(self, figures):
+        """Separate figures whose results are in the result cache
+
+        Cached figures have their geometry copied into their Figure JSON
+        and their crops saved again, without running any model.
+
+        Args:
+            figures (list of pathlib.Path): paths to the figures to separate
+        Returns:
+            uncached (list of pathlib.Path): figures that still need to be
+                separated. The key of each is kept in self.result_keys so
+                _cache_result can store its result
+            cached (list of tuples): (figure_name, success) of figures
+                separated from the cache
+        Modifies:
+            self.exsclaim_json, self.result_keys
+        """
+        if self.result_cache is None:
+            return figures, []
+        settings = self._result_settings()
+        uncached = []
+        cached = []
+        for figure_path in figures:
+            full_figure_path = self.results_directory.parent / figure_path
+            try:
+                key = result_cache.make_key(
+                    result_cache.file_digest(full_figure_path),
+                    self._figure_settings(settings, figure_path.name),
+                )
+            except OSError:
+                # unreadable figures fail, and are logged, when separated
+                uncached.append(figure_path)
+                continue
+            result = self.result_cache.get(key)
+            if result is None:
+                self.result_keys[figure_path.name] = key
+                uncached.append(figure_path)
+                continue
+            self.display_info(">>> Using cached results for: " + str(figure_path))
+            success = self._apply_cached(figure_path, full_figure_path, result)
+            cached.append((figure_path.name, success))
+        return uncached, cached
+
+    def _apply_cached(self, figure_path, full_figure_path, result):
+        """Write a cached result into the figure's JSON and save its crops
+
+        Args:
+            figure_path (pathlib.Path): path to the figure image
+            full_figure_path (pathlib.Path): the figure's path on disk
+            result (dict): the figure's result, as stored by _cache_result
+        Returns:
+            success (bool): True if the figure's crops were queued
+        Modifies:
+            self.exsclaim_json[figure_path.name]
+        """
+        figure_name = figure_path.name
+        figure_json = self.exsclaim_json.get(figure_name, {})
+        figure_json["figure_name"] = figure_name
+        figure_json["master_images"] = result["master_images"]
+        if "scale_bar_objects" in result:
+            unassigned = figure_json.get("unassigned", {})
+            unassigned.setdefault("scale_bar_labels", [])
+            unassigned["scale_bar_objects"] = result["scale_bar_objects"]
+            figure_json["unassigned"] = unassigned
+        self.exsclaim_json[figure_name] = figure_json
+        try:
+            figure_image = FigureImage(full_figure_path)
+            for master_image in figure_json["master_images"]:
+                self._write_subfigure(figure_path, figure_image, master_image)
+            return True
+        except Exception:
+            self.logger.exception(
+                "Could not save cached subfigures of {}".format(figure_path)
+            )
+            return False
+
+    def _cache_result(self, figure_path):
+        """Store a separated figure's result in the result cache"""
+        key = self.result_keys.pop(figure_path.name, None)
+        if key is None:
+            return
+        figure_json = self.exsclaim_json[figure_path.name]
+        result = {"master_images": figure_json["master_images"]}
+        if "scale" in self.stages:
+            unassigned = figure_json.get("unassigned", {})
+            result["scale_bar_objects"] = unassigned.get("scale_bar_objects", [])
+        self.result_cache.put(key, result)
+
+    def _save_raw_detections(self, figure_path):
+        """Save a separated figure's raw detections next to the results"""
+        raw = self.raw_detections.pop(figure_path.name, None)
+        if raw is None or self.raw_thresholds is None:
+            return
+        repostprocess.save_raw_detections(
+            repostprocess.sidecar_path(self.results_directory, figure_path.name),
+            dict(raw, figure_name=figure_path.name),
+        )
+
+    def _display_cache_stats(self):
+        """Report the result cache's hits and misses"""
+        if self.result_cache is None:
+            return
+        stats = self.result_cache.stats()
+        self.display_info(
+            "Result cache: {hits} hits, {misses} misses, {evictions} evicted,"
+            " {entries} results ({bytes} bytes) stored\n".format(**stats)
+        )
+
+    def _commit_written(self, separated, wait=False):
+        """Record separated figures whose crops have all been saved
 
         Args:
-            results_directory (string): Path to results directory
-            exsclaim_json (dict): Updated EXSCLAIM JSON
-            figures_separated (set): Figures which have already been separated
+            separated (list of tuples): (figure_name, success) of figures
+                that are separated but not yet recorded
+            wait (bool): if True, wait for every figure's crops to be saved
+        Returns:
+            separated (list of tuples): the figures still being written
         """
-        with open(self.results_directory / "exsclaim.json", "w", encoding="utf-8") as f:
-            json.dump(exsclaim_json, f, indent=3)
-        with open(self.results_directory / "_figures", "a+", encoding="utf-8") as f:
-            for figure in figures_separated:
-                f.write("%s\n" % figure)
+        writing = []
+        for figure_name, success in separated:
+            written = self.crop_writer.written(figure_name, wait)
+            if written is None:
+                writing.append((figure_name, success))
+                continue
+            self._commit_figure(
+                ledger.FIGURE_SEPARATOR,
+                self.exsclaim_json,
+                figure_name,
+                success and written,
+            )
+        return writing
+
+    def stream(self, search_query, articles):
+        """Separate figures one article at a time
+
+        Args:
+            search_query (dict): A Search Query JSON to guide search
+            articles (iterable of dicts): EXSCLAIM JSONs, one per article
+        Yields:
+            article_json (dict): the article's EXSCLAIM JSON with figures
+                separated
+        """
+        self.display_info("Running Figure Separator\n")
+        os.makedirs(self.results_directory, exist_ok=True)
+        figures_separated = self.ledger.completed(ledger.FIGURE_SEPARATOR)
+        figures_path = self.results_directory / "figures"
+        for article_json in articles:
+            self.exsclaim_json = article_json
+            figures = [
+                figures_path / figure_name
+                for figure_name in article_json
+                if figure_name not in figures_separated
+            ]
+            figures, separated = self._split_cached(figures)
+            detected = self.detect_scale(self.detect_subfigures(figures))
+            for figure_path, figure_image, detections, scale_objects in detected:
+                self.display_info(
+                    ">>> Extracting images from: " + str(figure_path)
+                )
+                success = self._separate_figure(
+                    figure_path, figure_image, detections, scale_objects
+                )
+                if success:
+                    self._cache_result(figure_path)
+                    self._save_raw_detections(figure_path)
+                self.raw_detections.pop(figure_path.name, None)
+                separated.append((figure_path.name, success))
+                separated = self._commit_written(separated)
+            self._commit_written(separated, wait=True)
+            yield self.exsclaim_json
+        self.crop_writer.close()
+        if self.scale_gate.mode != "off":
+            self.display_info(self.scale_gate.summary())
+        self._display_cache_stats()
 
     def run(self, search_query, exsclaim_dict):
         """Run the models relevant to manipulating article figures"""
@@ -180,55 +700,39 @@ class FigureSeparator(ExsclaimTool):
         self.exsclaim_json = exsclaim_dict
         t0 = time.time()
         # List figures that have already been separated
-        figures_file = self.results_directory / "_figures"
-        if os.path.isfile(figures_file):
-            with open(figures_file, "r", encoding="utf-8") as f:
-                contents = f.readlines()
-            figures_separated = {f.strip() for f in contents}
-        else:
-            figures_separated = set()
-
-        with open(figures_file, "w", encoding="utf-8") as f:
-            for figure in figures_separated:
-                f.write("%s\n" % str(pathlib.Path(figure).name))
-        new_figures_separated = set()
+        figures_separated = self.ledger.completed(ledger.FIGURE_SEPARATOR)
 
-        counter = 1
         figures_path = self.results_directory / "figures"
         figures = [
             figures_path / self.exsclaim_json[figure]["figure_name"]
             for figure in self.exsclaim_json
             if self.exsclaim_json[figure]["figure_name"] not in figures_separated
         ]
-        for figure_path in figures:
+        total = len(figures)
+        figures, separated = self._split_cached(figures)
+        counter = len(separated) + 1
+        detected = self.detect_scale(self.detect_subfigures(figures))
+        for figure_path, figure_image, detections, scale_objects in detected:
             self.display_info(
-                ">>> ({0} of {1}) ".format(counter, +len(figures))
+                ">>> ({0} of {1}) ".format(counter, total)
                 + "Extracting images from: "
                 + str(figure_path)
             )
-            try:
-                self.extract_image_objects(figure_path)
-                new_figures_separated.add(figure_path.name)
-            except Exception:
-                if self.print:
-                    Printer(
-                        (
-                            "<!> ERROR: An exception occurred in"
-                            " FigureSeparator on figure: {}".format(figure_path)
-                        )
-                    )
-                self.logger.exception(
-                    (
-                        "<!> ERROR: An exception occurred in"
-                        " FigureSeparator on figure: {}".format(figure_path)
-                    )
-                )
-
-            # Save to file every N iterations (to accomodate restart scenarios)
-            if counter % 100 == 0:
-                self._appendJSON(self.exsclaim_json, new_figures_separated)
-                new_figures_separated = set()
+            success = self._separate_figure(
+                figure_path, figure_image, detections, scale_objects
+            )
+            if success:
+                self._cache_result(figure_path)
+                self._save_raw_detections(figure_path)
+            self.raw_detections.pop(figure_path.name, None)
+            separated.append((figure_path.name, success))
+            separated = self._commit_written(separated)
             counter += 1
+        self._commit_written(separated, wait=True)
+        self.crop_writer.close()
+        if self.scale_gate.mode != "off":
+            self.display_info(self.scale_gate.summary())
+        self._display_cache_stats()
 
         t1 = time.time()
         self.display_info(
@@ -236,9 +740,85 @@ class FigureSeparator(ExsclaimTool):
                 t1 - t0, int(counter - 1)
             )
         )
-        self._appendJSON(self.exsclaim_json, new_figures_separated)
         return self.exsclaim_json
 
+    def repostprocess(self):
+        """Separate figures again from their saved raw detections
+
+        The current thresholds are applied to the raw detections saved by a
+        run with raw detections on, without running any model. Each
+        figure's master images, scale bar objects and subfigure crops are
+        replaced, keeping the captions matched to its subfigures, and
+        exsclaim.json is rewritten.
+
+        Returns:
+            count (int): number of figures separated again
+        """
+        self.display_info("Re-applying Figure Separator thresholds\n")
+        self.exsclaim_json = self.store.load()
+        figures_path = self.results_directory / "figures"
+        sidecars = sorted(
+            (self.results_directory / repostprocess.DIRECTORY).glob("*.npz")
+        )
+        count = 0
+        separated = []
+        for sidecar in sidecars:
+            raw = repostprocess.load_raw_detections(sidecar)
+            figure_name = raw.pop("figure_name")
+            if figure_name not in self.exsclaim_json:
+                continue
+            figure_path = figures_path / figure_name
+            self.display_info(">>> Re-applying thresholds to: " + str(figure_path))
+            captions = {
+                master_image.get("subfigure_label", {}).get("text"): {
+                    field: master_image[field]
+                    for field in repostprocess.CAPTION_FIELDS
+                    if field in master_image
+                }
+                for master_image in self.exsclaim_json[figure_name].get(
+                    "master_images", []
+                )
+            }
+            detections = np.zeros((0, 6), dtype=np.float32)
+            if "subfigures" in raw:
+                detections = repostprocess.select_subfigures(
+                    raw["subfigures"], self.thresholds["subfigure_confidence"]
+                )
+            self.raw_detections[figure_name] = raw
+            # subfigures that are no longer detected leave no crops behind
+            shutil.rmtree(
+                self.results_directory / "images" / figure_path.stem,
+                ignore_errors=True,
+            )
+            stages = self.stages
+            if "scale_objects" not in raw:
+                self.stages = self.stages - {"scale"}
+            try:
+                figure_json = self.extract_image_objects(
+                    figure_path, detections, names=raw.get("names", [])
+                )
+                for master_image in figure_json["master_images"]:
+                    label = master_image["subfigure_label"]["text"]
+                    master_image.update(captions.get(label, {}))
+                success = True
+            except Exception:
+                self.logger.exception(
+                    "Could not separate {} again".format(figure_path)
+                )
+                success = False
+            finally:
+                self.stages = stages
+                self.raw_detections.pop(figure_name, None)
+            separated.append((figure_name, success))
+            separated = self._commit_written(separated)
+            count += 1
+        self._commit_written(separated, wait=True)
+        self.store.export(
+            self.results_directory / "exsclaim.json",
+            compact=self.search_query.get("compact_geometry", False),
+        )
+        return count
+
     def get_figure_paths(self, search_query: dict) -> list:
         """
         Get a list of paths to figures extracted using the search_query
@@ -257,63 +837,113 @@ class FigureSeparator(ExsclaimTool):
         return (paths,)
     
 
-    def detect_subfigure_boundaries(self, figure_path):
-        """Detects the bounding boxes and labels of subfigures using YOLOv11"""
-        img_raw = Image.open(figure_path).convert("RGB")
-        width, height = img_raw.size
-        binary_img = np.zeros((height, width, 1))
-
-        results = self.yolo_model.predict(
-            source=figure_path,
-            imgsz=640,
-            conf=0.6,
-            iou=0.45,
-            max_det=100,
-            agnostic_nms=False,
+    def detect_subfigures(self, figures, conf=None):
+        """Detect the subfigures of many figures in batches
+
+        Figures are grouped by the shape YOLO letterboxes them to, so each
+        predict call runs on a rectangular batch of figures.
+
+        Args:
+            figures (list): paths to the figures to run on, or FigureImages
+            conf (float): minimum confidence of a detection. Defaults to the
+                "subfigure_confidence" threshold
+        Yields:
+            (figure_path, figure_image, detections): figure_image is the
+                decoded FigureImage and detections a Kx6 array of the most
+                confident x1, y1, x2, y2, confidence, class box of each
+                class. Both are None if the figure could not be read.
+                Figures are yielded in batch order, not in the order given
+        Modifies:
+            self.raw_detections, with raw detections on
+        """
+        if conf is None:
+            conf = self.thresholds["subfigure_confidence"]
+        if "subfigures" not in self.stages:
+            for figure in figures:
+                figure_path = getattr(figure, "path", figure)
+                yield figure_path, None, np.zeros((0, 6), dtype=np.float32)
+            return
+        if not figures:
+            return
+        raw_conf = None
+        if self.raw_thresholds is not None:
+            raw_conf = self.raw_thresholds["subfigure_confidence"]
+            names = np.array(
+                [self.yolo_model.names[i] for i in range(len(self.yolo_model.names))]
+            )
+        # an ONNX model has no stride attribute; YOLO's largest stride is 32
+        stride = getattr(self.yolo_model.model, "stride", None)
+        stride = 32 if stride is None else max(int(stride.max()), 32)
+        batches = batch.bucketed_batches(
+            figures,
+            imgsize=640,
+            stride=stride,
+            batch_size=self.batch_size,
+            prefetch=self.prefetch,
+            workers=self.decode_workers,
         )
+        for figure_images, images, infos in batches:
+            if images is None:
+                yield figure_images[0], None, None
+                continue
+            results = self.yolo_model.predict(
+                source=images,
+                imgsz=640,
+                conf=conf if raw_conf is None else min(conf, raw_conf),
+                iou=0.45,
+                max_det=100,
+                agnostic_nms=False,
+                verbose=False,
+            )
+            for figure_image, result, info in zip(figure_images, results, infos):
+                if raw_conf is None:
+                    detections = batch.best_box_per_class(result.boxes.data, info)
+                    yield figure_image.path, figure_image, detections
+                    continue
+                data = result.boxes.data
+                subfigures = batch.to_image_pixels(
+                    data[data[:, 4].argsort(descending=True)], info
+                )
+                self.raw_detections.setdefault(figure_image.path.name, {}).update(
+                    names=names, subfigures=subfigures
+                )
+                detections = repostprocess.select_subfigures(subfigures, conf)
+                yield figure_image.path, figure_image, detections
+
+    def detect_subfigure_boundaries(self, figure_path):
+        """Detects the bounding boxes and labels of subfigures using YOLOv11
+
+        Args:
+            figure_path (str or FigureImage): the article figure
+        Returns:
+            subfigure_info (list of tuples): (class_id, x, y, width, height)
+                of each subfigure
+            concate_img (np.ndarray): the figure with a mask of small
+                subfigures as a fourth channel, used in classify_subfigures
+        """
+        figure = FigureImage.open(figure_path)
+        binary_img = np.zeros((figure.height, figure.width, 1), dtype=np.uint8)
+        _, _, detections = next(self.detect_subfigures([figure], conf=0.6))
 
         subfigure_info = []
+        for x1, y1, x2, y2, _, cls_id in detections:
+            x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+            # Filter out extremely small boxes
+            if (x2 - x1 > 5 and y2 - y1 > 5):
+                # Add to binary mask for visualization
+                if (x2 - x1) < 64 and (y2 - y1) < 64:
+                    binary_img[y1:y2, x1:x2] = 255
 
-        for result in results:
-            # Process results to keep only one detection per class
-            detections_per_class = {}
-            for box in result.boxes:
-                cls_id = int(box.cls[0])
-                conf = box.conf[0]
-                if cls_id not in detections_per_class or conf > detections_per_class[cls_id].conf[0]:
-                    detections_per_class[cls_id] = box
-
-            # Process the final detections
-            for cls_id, box in detections_per_class.items():
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                conf = float(box.conf[0])
-                
-                # The cls_id is already the correct index since your classes are mapped 0->a, 1->b, etc.
-                label_idx = cls_id  # This will be used directly as the label index
-
-                # Ensure coordinates are within image bounds
-                x1 = int(min(max(x1, 0), width - 1))
-                y1 = int(min(max(y1, 0), height - 1))
-                x2 = int(min(max(x2, 0), width))
-                y2 = int(min(max(y2, 0), height))
-
-                # Filter out extremely small boxes
-                if (x2 - x1 > 5 and y2 - y1 > 5):
-                    # Add to binary mask for visualization
-                    if (x2 - x1) < 64 and (y2 - y1) < 64:
-                        binary_img[y1:y2, x1:x2] = 255
-                        
-                    subfigure_info.append(
-                        (label_idx,         # class_id (0 for 'a', 1 for 'b', etc.)
-                        float(x1),         # x coordinate
-                        float(y1),         # y coordinate
-                        float(x2 - x1),    # width
-                        float(y2 - y1))    # height
-                    )
+                subfigure_info.append(
+                    (int(cls_id),       # class_id (0 for 'a', 1 for 'b', etc.)
+                    float(x1),         # x coordinate
+                    float(y1),         # y coordinate
+                    float(x2 - x1),    # width
+                    float(y2 - y1))    # height
+                )
 
         # Create concatenated image needed for classify_subfigures
-        concate_img = np.concatenate((np.array(img_raw), binary_img), axis=2)
-        print('subfigure_info', subfigure_info)
+        concate_img = np.concatenate((figure.rgb, binary_img), axis=2)
         return subfigure_info, concate_img
 
 
@@ -391,8 +1021,8 @@ class FigureSeparator(ExsclaimTool):
             To get sensible results, should be run only after
             detect_subfigure_boundaries has been run
         Args:
-            figure_path (str): A path to the image (.png, .jpg, or .gif)
-                file containing the article figure
+            figure_path (str or FigureImage): A path to the image (.png,
+                .jpg, or .gif) file containing the article figure
             subfigure_info (list of lists): Details about bounding boxes
                 of each subfigure from detect_subfigure_boundaries(). Each
                 inner list has format [x1, y1, x2, y2, confidence] where
@@ -408,18 +1038,15 @@ class FigureSeparator(ExsclaimTool):
                 Used in classify_subfigures. Ideally this will be removed to
                 increase modularity.
         """
-        img_raw = Image.open(figure_path).convert("RGB")
-        img_raw = img_raw.copy()
-        width, height = img_raw.size
-        binary_img = np.zeros((height, width, 1))
+        figure = FigureImage.open(figure_path)
+        binary_img = np.zeros((figure.height, figure.width, 1), dtype=np.uint8)
 
         detected_labels = []
         detected_bboxes = []
         for subfigure in subfigure_info:
             # Preprocess the image for the model
             bbox = tuple(subfigure[:4])
-            img_patch = img_raw.crop(bbox)
-            img_patch = np.array(img_patch)[:, :, ::-1]
+            img_patch = figure.crop(*bbox)[:, :, ::-1]
             img_patch, _ = process.preprocess(img_patch, 28, jitter=0)
             img_patch = np.transpose(img_patch / 255.0, (2, 0, 1))
             img_patch = torch.from_numpy(img_patch).type(self.dtype).unsqueeze(0)
@@ -463,7 +1090,7 @@ class FigureSeparator(ExsclaimTool):
                     (label, float(x1), float(y1), float(x2 - x1), float(y2 - y1))
                 )
         # concate_img needed for classify_subfigures
-        concate_img = np.concatenate((np.array(img_raw), binary_img), axis=2)
+        concate_img = np.concatenate((figure.rgb, binary_img), axis=2)
         return subfigure_info, concate_img
 
     def classify_subfigures(self, figure_path, subfigure_labels, concate_img):
@@ -633,161 +1260,357 @@ class FigureSeparator(ExsclaimTool):
         Returns:
             label_text (string): The text of the scale bar label
         """
-        resize_transform = T.Compose(
-            [
-                T.Resize((128, 512)),
-                T.Lambda(convert_to_rgb),
-                T.ToTensor(),
-                T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+        return self.read_scale_bars([cropped_image])[0]
+
+    def _resize_scale_label(self, cropped_image):
+        """Resize a scale label crop to the CRNN's input height
+
+        With a "fixed" scale_label_width, crops are stretched to
+        SCALE_LABEL_HEIGHT x SCALE_LABEL_WIDTH, as in training. With
+        "dynamic", the aspect ratio is kept and the width rounded to a
+        multiple of 16 (one CRNN time step), at most SCALE_LABEL_WIDTH.
+        """
+        if self.scale_label_width == "fixed":
+            width = SCALE_LABEL_WIDTH
+        else:
+            width = cropped_image.width * SCALE_LABEL_HEIGHT / max(cropped_image.height, 1)
+            width = int(min(max(round(width / 16), 1) * 16, SCALE_LABEL_WIDTH))
+        return cropped_image.resize((width, SCALE_LABEL_HEIGHT), Image.BILINEAR)
+
+    def read_scale_bars(self, cropped_images):
+        """Read the text of many scale bar label crops in padded batches
+
+        Args:
+            cropped_images (list of Images): PIL images cropped to the
+                bounding boxes of scale bar labels
+        Returns:
+            labels (list of tuples): (magnitude, unit, confidence) of each
+                crop, in order
+        """
+        labels = []
+        for start in range(0, len(cropped_images), self.scale_label_batch_size):
+            chunk = cropped_images[start : start + self.scale_label_batch_size]
+            tensors = [
+                self.scale_label_normalize(self._resize_scale_label(image))
+                for image in chunk
             ]
-        )
-        classes = "0123456789mMcCuUnN .A"
-        image = resize_transform(cropped_image)
-        image = image.unsqueeze(0)
-        # run image on model
-        logps = self.scale_label_recognition_model(image.to(self.device))
-        probs = torch.exp(logps)
-        probs = probs.squeeze(0)
-        magnitude, unit, confidence = ctc.run_ctc(probs, classes)
-        return magnitude, unit, float(confidence)
-
-    def create_scale_bar_objects(self, scale_bar_lines, scale_bar_labels):
+            # pad on the right to the widest crop; every crop is as wide
+            # with a fixed width
+            width = max(tensor.shape[2] for tensor in tensors)
+            images = torch.zeros(len(tensors), 3, SCALE_LABEL_HEIGHT, width)
+            for i, tensor in enumerate(tensors):
+                images[i, :, :, : tensor.shape[2]] = tensor
+            # run images on model
+            with torch.no_grad():
+                logps = self.scale_label_recognition_model(images.to(self.device))
+            probs = torch.exp(logps).cpu().numpy()
+            # drop the time steps that only saw padding
+            trimmed = [
+                probs[i, : -(-probs.shape[1] * tensor.shape[2] // width)]
+                for i, tensor in enumerate(tensors)
+            ]
+            for magnitude, unit, confidence in ctc.run_ctc_batch(
+                trimmed, SCALE_LABEL_CLASSES, grammar=self.scale_label_grammar
+            ):
+                labels.append((magnitude, unit, float(confidence)))
+        return labels
+
+    def create_scale_bar_objects(self, line_boxes, lines, label_boxes, label_jsons):
         """Match scale bar lines with labels to create scale bar jsons
 
+        Each line is paired with the label whose center is closest to its
+        own, unless that label is over 5000 squared pixels away.
+
         Args:
-            scale_bar_lines (list of dicts): A list of dictionaries
-                representing predicted scale bars with 'geometry', 'length',
-                and 'confidence' attributes.
-            scale_bar_labels (list of dicts): A list of dictionaries
-                representing predicted scale bar labesl with 'geometry',
-                'text', 'confidence', 'box_confidence', 'nm' attributes.
+            line_boxes (BoxSet): boxes of the predicted scale bars
+            lines (np.ndarray): detect_scale_objects row of each scale bar,
+                [x1, y1, x2, y2, confidence, label]
+            label_boxes (BoxSet): boxes of the scale bar labels that were
+                read
+            label_jsons (list of dicts): the label JSON of each of
+                label_boxes, with 'geometry', 'text', 'label_confidence',
+                'box_confidence' and 'nm' attributes
         Returns:
             scale_bar_jsons (list of Scale Bar JSONS): Scale Bar JSONS that
                 were made from pairing scale labels and scale lines
-            unassigned_labels (list of dicts): List of dictionaries
-                representing scale bar labels that were not matched.
+            unassigned_labels (list of dicts): label JSONs that were not
+                matched
         """
+        matches, distances = line_boxes.nearest(label_boxes, max_distance=5000)
         scale_bar_jsons = []
-        paired_labels = set()
-        for line in scale_bar_lines:
-            x_line, y_line = boxes.find_box_center(line["geometry"])
-            best_distance = 1000000
-            best_label = None
-            for label_index, label in enumerate(scale_bar_labels):
-                x_label, y_label = boxes.find_box_center(label["geometry"])
-                distance = (x_label - x_line) ** 2 + (y_label - y_line) ** 2
-                if distance < best_distance:
-                    best_distance = distance
-                    best_index = label_index
-                    best_label = label
-            # If the best match is not very good, keep this line unassigned
-            if best_distance > 5000:
-                best_index = -1
-                best_label = None
-                best_distance = -1
-            paired_labels.add(best_index)
-            scale_bar_json = {
-                "label": best_label,
-                "geometry": line["geometry"],
-                "confidence": float(line.get("confidence", None)),
-                "length": line.get("length", None),
-                "label_line_distance": best_distance,
-            }
-            scale_bar_jsons.append(scale_bar_json)
+        for geometry, line, match, distance in zip(
+            line_boxes.to_geometries(), lines, matches, distances
+        ):
+            scale_bar_jsons.append(
+                {
+                    "label": label_jsons[match] if match >= 0 else None,
+                    "geometry": geometry,
+                    "confidence": float(line[4]),
+                    "length": int(line[2] - line[0]),
+                    "label_line_distance": float(distance) if match >= 0 else -1,
+                }
+            )
         # Check which labels were left unassigned
-        unassigned_labels = []
-        for i, label in enumerate(scale_bar_labels):
-            if i not in paired_labels:
-                unassigned_labels.append(label)
+        paired = set(matches.tolist())
+        unassigned_labels = [
+            label_json
+            for index, label_json in enumerate(label_jsons)
+            if index not in paired
+        ]
         return scale_bar_jsons, unassigned_labels
 
-    def assign_scale_objects_to_subfigures(self, master_image, scale_objects):
-        """Assign scale bar objects to master images
+    def assign_scale_objects_to_subfigures(
+        self, master_images, line_boxes, scale_objects
+    ):
+        """Assign each scale bar object to the first master image containing it
 
         Args:
-            master_image (Master Image Json): A Master Image JSON
+            master_images (list of Master Image JSON): the figure's master
+                images
+            line_boxes (BoxSet): box of each scale object
             scale_objects (list of Scale Object JSON): candidate scale objects
         Returns:
-            master_image (Master Image JSON): updated with scale objects
-            scale_objects: updated with assigned objects removed
+            master_images (list of Master Image JSON): updated with scale
+                objects
+            scale_objects: the scale objects in no master image
+        """
+        subfigure_boxes = BoxSet.from_geometries(
+            [master_image["geometry"] for master_image in master_images]
+        )
+        owners = line_boxes.first_container(subfigure_boxes)
+        for index, master_image in enumerate(master_images):
+            x1, y1, x2, y2 = subfigure_boxes.coords[index].tolist()
+            master_image["scale_bars"] = [
+                scale_object
+                for scale_object, owner in zip(scale_objects, owners)
+                if owner == index
+            ]
+            # find if there is one unique scale bar label
+            nm_to_pixel = 0
+            label = ""
+            scale_labels = set()
+            for scale_object in master_image["scale_bars"]:
+                if scale_object["label"]:
+                    scale_labels.add(scale_object["label"]["nm"])
+                    nm_to_pixel = scale_object["label"]["nm"] / float(
+                        scale_object["length"]
+                    )
+                    label = scale_object["label"]["text"]
+            if len(scale_labels) == 1:
+                master_image["nm_height"] = (
+                    int(nm_to_pixel * master_image.get("height", y2 - y1) * 10) / 10
+                )
+                master_image["nm_width"] = (
+                    int(nm_to_pixel * master_image.get("width", x2 - x1) * 10) / 10
+                )
+                master_image["scale_label"] = label
+        unassigned = [
+            scale_object
+            for scale_object, owner in zip(scale_objects, owners)
+            if owner < 0
+        ]
+        return master_images, unassigned
+
+    def detect_scale(self, separated_figures):
+        """Detect the scale objects of many figures in batches
+
+        Args:
+            separated_figures (iterable): (figure_path, figure_image,
+                detections) tuples, as yielded by detect_subfigures
+        Yields:
+            (figure_path, figure_image, detections, scale_objects):
+                scale_objects is the figure's detect_scale_objects array,
+                empty if the scale gate skips the figure, or None if it was
+                not detected here. determine_scale then detects them itself
         """
-        geomtery = master_image["geometry"]
-        x1, y1, x2, y2 = boxes.convert_labelbox_to_coords(geomtery)
-        unassigned_scale_objects = []
-        assigned_scale_objects = []
-        for scale_object in scale_objects:
-            if boxes.is_contained(scale_object["geometry"], geomtery):
-                assigned_scale_objects.append(scale_object)
+        if "scale" not in self.stages:
+            for figure_path, figure_image, detections in separated_figures:
+                yield figure_path, figure_image, detections, None
+            return
+        pending = []
+        for figure_path, figure_image, detections in separated_figures:
+            if figure_image is None:
+                yield figure_path, figure_image, detections, None
+                continue
+            figure_json = self.exsclaim_json.get(figure_path.name, {})
+            if not self.scale_gate.allows(figure_json, figure_image, detections):
+                yield figure_path, figure_image, detections, NO_SCALE_OBJECTS
+                continue
+            pending.append((figure_path, figure_image, detections))
+            if len(pending) == self.scale_batch_size:
+                yield from self._detect_scale_batch(pending)
+                pending = []
+        yield from self._detect_scale_batch(pending)
+
+    def _detect_scale_batch(self, pending):
+        """Run detect_scale_objects on one batch of detect_scale's figures"""
+        if not pending:
+            return []
+        images = [figure_image.tensor(self.device) for _, figure_image, _ in pending]
+        try:
+            if self.raw_thresholds is None:
+                scale_objects = self.detect_scale_objects(images)
             else:
-                unassigned_scale_objects.append(scale_object)
-        master_image["scale_bars"] = assigned_scale_objects
-        # find if there is one unique scale bar label
-        nm_to_pixel = 0
-        label = ""
-        scale_labels = set()
-        for scale_object in master_image["scale_bars"]:
-            if scale_object["label"]:
-                scale_labels.add(scale_object["label"]["nm"])
-                nm_to_pixel = scale_object["label"]["nm"] / float(
-                    scale_object["length"]
+                scale_objects = []
+                raw_objects = self.detect_raw_scale_objects(
+                    images, self.raw_thresholds["scale_confidence"]
                 )
-                label = scale_object["label"]["text"]
-        if len(scale_labels) == 1:
-            master_image["nm_height"] = (
-                int(nm_to_pixel * master_image.get("height", y2 - y1) * 10) / 10
-            )
-            master_image["nm_width"] = (
-                int(nm_to_pixel * master_image.get("width", x2 - x1) * 10) / 10
+                for (figure_path, _, _), raw in zip(pending, raw_objects):
+                    self.raw_detections.setdefault(figure_path.name, {})[
+                        "scale_objects"
+                    ] = raw
+                    scale_objects.append(
+                        repostprocess.select_scale_objects(
+                            raw,
+                            self.thresholds["scale_confidence"],
+                            self.thresholds["scale_nms"],
+                        )[0]
+                    )
+        except Exception:
+            # each figure is retried, and its failure logged, on its own
+            self.logger.exception("Could not detect scale objects in a batch")
+            scale_objects = [None] * len(pending)
+        return [
+            (figure_path, figure_image, detections, objects)
+            for (figure_path, figure_image, detections), objects in zip(
+                pending, scale_objects
             )
-            master_image["scale_label"] = label
-        return master_image, unassigned_scale_objects
+        ]
 
-    def detect_scale_objects(self, image):
-        """Detects bounding boxes of scale bars and scale bar labels
+    def detect_raw_scale_objects(self, images, confidence):
+        """Detects scale bars and scale bar labels above a confidence
+
+        All images are run through Faster R-CNN in one forward pass.
 
         Args:
-            image (PIL Image): A PIL image object
+            images (torch.Tensor or list): A 3xHxW float image tensor, or a
+                list of them
+            confidence (float): minimum confidence of a detection
         Returns:
-            scale_bar_info (list): A list of lists with the following
-                pattern: [[x1,y1,x2,y2, confidence, label],...] where
-                label is 1 for scale bars and 2 for scale bar labelss
+            scale_bar_info (np.ndarray): An array of rows with the pattern
+                [x1, y1, x2, y2, confidence, label], in the image's pixels,
+                where label is 1 for scale bars and 2 for scale bar labels,
+                before non maximum suppression. A list of them, one per
+                image, if given a list
         """
+        single = torch.is_tensor(images)
+        if single:
+            images = [images]
         # prediction
-        self.scale_bar_detection_model.eval()
         with torch.no_grad():
-            outputs = self.scale_bar_detection_model([image.to(self.device)])
-        # post-process
+            outputs = self.scale_bar_detection_model(
+                [image.to(self.device) for image in images]
+            )
         scale_bar_info = []
-        for i, box in enumerate(outputs[0]["boxes"]):
-            confidence = outputs[0]["scores"][i]
-            if confidence > 0.5:
-                x1, y1, x2, y2 = box
-                label = outputs[0]["labels"][i]
-                scale_bar_info.append(
-                    [
-                        x1.data.cpu(),
-                        y1.data.cpu(),
-                        x2.data.cpu(),
-                        y2.data.cpu(),
-                        confidence.data.cpu(),
-                        label.data.cpu(),
-                    ]
+        for output in outputs:
+            keep = output["scores"] > confidence
+            scale_objects = torch.cat(
+                [
+                    output["boxes"][keep],
+                    output["scores"][keep, None],
+                    output["labels"][keep, None].to(output["boxes"].dtype),
+                ],
+                dim=1,
+            )
+            scale_bar_info.append(scale_objects.cpu().numpy())
+        return scale_bar_info[0] if single else scale_bar_info
+
+    def detect_scale_objects(self, images):
+        """Detects bounding boxes of scale bars and scale bar labels
+
+        All images are run through Faster R-CNN in one forward pass.
+
+        Args:
+            images (torch.Tensor or list): A 3xHxW float image tensor, or a
+                list of them
+        Returns:
+            scale_bar_info (np.ndarray): An array of rows with the pattern
+                [x1, y1, x2, y2, confidence, label], in the image's pixels,
+                where label is 1 for scale bars and 2 for scale bar labels.
+                A list of them, one per image, if given a list
+        """
+        single = torch.is_tensor(images)
+        raw_objects = self.detect_raw_scale_objects(
+            [images] if single else images, self.thresholds["scale_confidence"]
+        )
+        # post-process
+        scale_bar_info = [
+            non_max_suppression_malisiewicz(scale_objects, self.thresholds["scale_nms"])
+            for scale_objects in raw_objects
+        ]
+        return scale_bar_info[0] if single else scale_bar_info
+
+    def _raw_scale_objects(self, figure, figure_name, scale_objects=None):
+        """Read every raw scale label of a figure and apply the thresholds
+
+        Raw scale objects are detected here if they were not detected in a
+        batch, and raw scale labels are read here if they were not read in
+        an earlier run.
+
+        Args:
+            figure (FigureImage): the decoded figure
+            figure_name (str): name of the figure
+            scale_objects (np.ndarray): the figure's scale objects from
+                detect_scale. Used as its raw scale objects if there are no
+                others, e.g. when the scale gate skipped the figure
+        Returns:
+            scale_objects (np.ndarray): the scale objects above the
+                thresholds, after non maximum suppression
+            label_texts (list of tuples): (magnitude, unit, confidence) of
+                each scale label in scale_objects, in order
+        Modifies:
+            self.raw_detections[figure_name]
+        """
+        raw = self.raw_detections.setdefault(figure_name, {})
+        if "scale_objects" not in raw:
+            if scale_objects is None:
+                scale_objects = self.detect_raw_scale_objects(
+                    figure.tensor(self.device), self.raw_thresholds["scale_confidence"]
                 )
-        scale_bar_info = non_max_suppression_malisiewicz(
-            np.asarray(scale_bar_info), 0.4
+            raw["scale_objects"] = scale_objects
+        raw_objects = raw["scale_objects"]
+        if "scale_label_magnitude" not in raw:
+            labels = np.flatnonzero(raw_objects[:, 5] == 2)
+            texts = self.read_scale_bars(
+                [figure.crop_image(*raw_objects[i, :4]) for i in labels]
+            )
+            raw["scale_label_magnitude"] = np.full(len(raw_objects), -1.0)
+            raw["scale_label_unit"] = np.full(len(raw_objects), "", dtype="<U2")
+            raw["scale_label_confidence"] = np.zeros(len(raw_objects))
+            for i, (magnitude, unit, confidence) in zip(labels, texts):
+                raw["scale_label_magnitude"][i] = magnitude
+                raw["scale_label_unit"][i] = unit
+                raw["scale_label_confidence"][i] = confidence
+        scale_objects, kept = repostprocess.select_scale_objects(
+            raw_objects,
+            self.thresholds["scale_confidence"],
+            self.thresholds["scale_nms"],
         )
-        return scale_bar_info
+        label_texts = [
+            (
+                float(raw["scale_label_magnitude"][i]),
+                str(raw["scale_label_unit"][i]),
+                float(raw["scale_label_confidence"][i]),
+            )
+            for i in kept
+            if raw_objects[i, 5] == 2
+        ]
+        return scale_objects, label_texts
 
-    def determine_scale(self, figure_path, figure_json):
+    def determine_scale(self, figure_path, figure_json, scale_objects=None):
         """Adds scale information to figure by reading and measuring scale bars
 
         Args:
-            figure_path (str): A path to the image (.png, .jpg, or .gif)
-                file containing the article figure
+            figure_path (str or FigureImage): A path to the image (.png,
+                .jpg, or .gif) file containing the article figure
             figure_json (dict): A Figure JSON
+            scale_objects (np.ndarray): the figure's detect_scale_objects
+                output, if already detected in a batch
         Returns:
             figure_json (dict): A dictionary with classified image_objects
                 extracted from figure
+        Modifies:
+            self.raw_detections, with raw detections on
         """
         convert_to_nm = {
             "a": 0.1,
@@ -800,51 +1623,53 @@ class FigureSeparator(ExsclaimTool):
         unassigned = figure_json.get("unassigned", {})
         unassigned_scale_labels = unassigned.get("scale_bar_labels", [])
         master_images = figure_json.get("master_images", [])
-        image = Image.open(figure_path).convert("RGB")
-        tensor_image = T.ToTensor()(image)
-        # Detect scale bar objects
-        scale_bar_info = self.detect_scale_objects(tensor_image)
-        label_names = ["background", "scale bar", "scale label"]
-        scale_bars = []
-        scale_labels = []
-        for scale_object in scale_bar_info:
-            x1, y1, x2, y2, confidence, classification = scale_object
-            geometry = boxes.convert_coords_to_labelbox(
-                [int(x1), int(y1), int(x2), int(y2)]
+        figure = FigureImage.open(figure_path)
+        label_texts = None
+        figure_name = figure_json.get("figure_name")
+        if self.raw_thresholds is not None or figure_name in self.raw_detections:
+            scale_objects, label_texts = self._raw_scale_objects(
+                figure, figure_name, scale_objects
             )
-            if label_names[int(classification)] == "scale bar":
-                scale_bar_json = {
-                    "geometry": geometry,
-                    "confidence": float(confidence),
-                    "length": int(x2 - x1),
-                }
-                scale_bars.append(scale_bar_json)
-            elif label_names[int(classification)] == "scale label":
-
-                scale_bar_label_image = image.crop((int(x1), int(y1), int(x2), int(y2)))
-                # Read Scale Text
-                magnitude, unit, label_confidence = self.read_scale_bar(
-                    scale_bar_label_image
-                )
-                # 0 is never correct and -1 is the error value
-                if magnitude > 0:
-                    length_in_nm = magnitude * convert_to_nm[unit.strip().lower()]
-                    label_json = {
+        # Detect scale bar objects if they were not detected in a batch
+        if scale_objects is None:
+            scale_objects = self.detect_scale_objects(figure.tensor(self.device))
+        scale_objects = np.asarray(scale_objects, dtype=np.float32).reshape(-1, 6)
+        # classes are 1 for scale bars and 2 for scale labels
+        lines = scale_objects[scale_objects[:, 5] == 1]
+        labels = scale_objects[scale_objects[:, 5] == 2]
+        # Read the text of every scale label in the figure in one batch
+        if label_texts is None:
+            label_texts = self.read_scale_bars(
+                [figure.crop_image(*label[:4]) for label in labels]
+            )
+        label_boxes = BoxSet(np.trunc(labels[:, :4]))
+        label_jsons = []
+        read = np.zeros(len(labels), dtype=bool)
+        for index, (geometry, label_text) in enumerate(
+            zip(label_boxes.to_geometries(), label_texts)
+        ):
+            magnitude, unit, label_confidence = label_text
+            # 0 is never correct and -1 is the error value
+            if magnitude > 0:
+                read[index] = True
+                length_in_nm = magnitude * convert_to_nm[unit.strip().lower()]
+                label_jsons.append(
+                    {
                         "geometry": geometry,
                         "text": str(magnitude) + " " + unit,
                         "label_confidence": float(label_confidence),
-                        "box_confidence": float(confidence),
+                        "box_confidence": float(labels[index, 4]),
                         "nm": int(length_in_nm * 100) / 100,
                     }
-                    scale_labels.append(label_json)
+                )
         # Match scale bars to labels and to subfigures (master images)
+        line_boxes = BoxSet(np.trunc(lines[:, :4]))
         scale_bar_jsons, unassigned_labels = self.create_scale_bar_objects(
-            scale_bars, scale_labels
+            line_boxes, lines, label_boxes[read], label_jsons
+        )
+        master_images, scale_bar_jsons = self.assign_scale_objects_to_subfigures(
+            master_images, line_boxes, scale_bar_jsons
         )
-        for master_image in master_images:
-            master_image, scale_bar_jsons = self.assign_scale_objects_to_subfigures(
-                master_image, scale_bar_jsons
-            )
 
         # Save info to JSON
         unassigned["scale_bar_labels"] = unassigned_scale_labels
@@ -918,28 +1743,41 @@ class FigureSeparator(ExsclaimTool):
 
     #     return figure_json
 
-    def extract_image_objects(self, figure_path=str) -> dict:
-        """Separate and classify subfigures in an article figure"""
+    def extract_image_objects(
+        self,
+        figure_path=str,
+        detections=None,
+        figure_image=None,
+        scale_objects=None,
+        names=None,
+    ) -> dict:
+        """Separate and classify subfigures in an article figure
+
+        The figure is decoded once and every stage reads that one buffer.
+
+        Args:
+            figure_path (pathlib.Path): path to the figure image
+            detections (np.ndarray): subfigure detections of the figure from
+                detect_subfigures. They are detected here if not given
+            figure_image (FigureImage): the decoded figure. Decoded here if
+                not given
+            scale_objects (np.ndarray): scale bar and label detections of the
+                figure from detect_scale. They are detected here if not given
+            names (sequence of str): subfigure label of each detection
+                class. Defaults to the YOLO model's
+        Returns:
+            figure_json (dict): the figure's EXSCLAIM JSON
+        """
         # Get full path to figure
         full_figure_path = self.results_directory.parent / figure_path
-        
-        # Get image for cropping
-        img_raw = Image.open(full_figure_path).convert("RGB")
-        width, height = img_raw.size
-        binary_img = np.zeros((height, width, 1))
 
-        # Get figure name without extension for directory naming
-        figure_base_name = pathlib.Path(figure_path).stem
+        # Decode the figure once for detection, cropping and scale reading
+        if figure_image is None:
+            figure_image = FigureImage(full_figure_path)
 
-        # Run YOLO detection with higher confidence threshold
-        results = self.yolo_model.predict(
-            source=full_figure_path,
-            imgsz=640,
-            conf=0.8,
-            iou=0.45,
-            max_det=100,
-            agnostic_nms=False,
-        )
+        # Run YOLO detection if it was not run in a batch
+        if detections is None:
+            _, _, detections = next(self.detect_subfigures([figure_image]))
 
         # Initialize variables
         figure_name = figure_path.name
@@ -947,37 +1785,18 @@ class FigureSeparator(ExsclaimTool):
         figure_json["figure_name"] = figure_name
         figure_json["master_images"] = []
 
-        # Process detections
-        detections_per_class = {}
-        
-        for result in results:
-            for box in result.boxes:
-                cls_id = int(box.cls[0])
-                conf = box.conf[0]
-                if cls_id not in detections_per_class or conf > detections_per_class[cls_id].conf[0]:
-                    detections_per_class[cls_id] = box
-
-        # Process each final detection
-        for cls_id, box in detections_per_class.items():
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-            conf = float(box.conf[0])
-            
-            # Ensure coordinates are within bounds and boxes aren't too small
-            x1 = int(min(max(x1, 0), width - 1))
-            y1 = int(min(max(y1, 0), height - 1))
-            x2 = int(min(max(x2, 0), width))
-            y2 = int(min(max(y2, 0), height))
-            
+        # Process each detection, the most confident one of each class
+        for x1, y1, x2, y2, conf, cls_id in detections:
+            x1, y1, x2, y2, cls_id = int(x1), int(y1), int(x2), int(y2), int(cls_id)
+
             if (x2 - x1 <= 5 or y2 - y1 <= 5):
                 continue
 
             # Get the label
-            label = self.yolo_model.names[cls_id]  # This will be 'a', 'b', 'c', etc.
+            if names is None:
+                names = self.yolo_model.names
+            label = str(names[cls_id])  # This will be 'a', 'b', 'c', etc.
             
-            # Add to binary mask for visualization if small enough
-            if (x2 - x1) < 64 and (y2 - y1) < 64:
-                binary_img[y1:y2, x1:x2] = 255
-
             # Create master_image_info
             master_image_info = {
                 "classification": "subfigure",
@@ -1001,15 +1820,7 @@ class FigureSeparator(ExsclaimTool):
                 }
             }
 
-            # Create output directory structure using figure_base_name (without extension)
-            base_dir = self.results_directory / "images" / figure_base_name
-            subfig_dir = base_dir / label
-            os.makedirs(subfig_dir, exist_ok=True)
-                            
-            # Crop and save using base name for output filename
-            cropped_img = img_raw.crop((x1, y1, x2, y2))
-            output_filename = f"{figure_base_name}_{label}.png"
-            cropped_img.save(subfig_dir / output_filename)
+            self._write_subfigure(figure_path, figure_image, master_image_info)
 
             figure_json["master_images"].append(master_image_info)
 
@@ -1017,8 +1828,14 @@ class FigureSeparator(ExsclaimTool):
         self.exsclaim_json[figure_name] = figure_json
 
         # Detect scale bar lines and labels if needed
-        if hasattr(self, 'determine_scale'):
-            figure_json = self.determine_scale(full_figure_path, figure_json)
+        if "scale" in self.stages:
+            if scale_objects is None and not self.scale_gate.allows(
+                figure_json, figure_image, detections
+            ):
+                scale_objects = NO_SCALE_OBJECTS
+            figure_json = self.determine_scale(
+                figure_image, figure_json, scale_objects
+            )
 
         return figure_json
     
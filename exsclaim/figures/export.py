@@ -0,0 +1,151 @@
+"""Export the figure separator's models to ONNX
+
+Writes the YOLO subfigure detector, the Faster R-CNN scale bar detector
+and the CRNN scale label reader to ONNX files, which FigureSeparator runs
+with ONNX Runtime when its "backend" is "onnx". Each model is loaded from
+its checkpoint the same way FigureSeparator loads it, so the query's
+"figure_separator" options, such as scale_min_size and scale_max_size,
+are fixed into the exported models.
+
+Usage:
+    python -m exsclaim.figures.export [--query query.json] [--output DIR]
+        [--models yolo_model scale_bar_detection_model ...]
+"""
+import argparse
+import json
+import pathlib
+import shutil
+import tempfile
+
+import torch
+
+from .onnx_backend import MODEL_FILES, ONNX_DIRECTORY
+
+OPSET = 17
+
+
+def export_scale_label_reader(model, path, height=128, width=512):
+    """Export a CRNN with a dynamic batch size and image width
+
+    Args:
+        model (CRNN): the scale label reader
+        path (pathlib.Path): path to write the .onnx file to
+        height (int): height of the label images
+        width (int): width of the example image used to trace the model
+    """
+    example = torch.zeros(1, 3, height, width)
+    torch.onnx.export(
+        model.cpu().eval(),
+        example,
+        str(path),
+        input_names=["images"],
+        output_names=["log_probabilities"],
+        dynamic_axes={
+            "images": {0: "batch", 3: "width"},
+            "log_probabilities": {0: "batch", 1: "steps"},
+        },
+        opset_version=OPSET,
+        dynamo=False,
+    )
+
+
+def export_scale_bar_detector(model, path, height=800, width=800):
+    """Export a torchvision Faster R-CNN that takes one image of any size
+
+    The model's resizing to its min_size and max_size, and the mapping of
+    boxes back to the image, are part of the exported graph.
+
+    Args:
+        model (FasterRCNN): the scale bar detector
+        path (pathlib.Path): path to write the .onnx file to
+        height (int): height of the example image used to trace the model
+        width (int): width of the example image used to trace the model
+    """
+    example = [torch.rand(3, height, width)]
+    torch.onnx.export(
+        model.cpu().eval(),
+        (example,),
+        str(path),
+        input_names=["image"],
+        output_names=["boxes", "labels", "scores"],
+        dynamic_axes={
+            "image": {1: "height", 2: "width"},
+            "boxes": {0: "detections"},
+            "labels": {0: "detections"},
+            "scores": {0: "detections"},
+        },
+        opset_version=OPSET,
+        dynamo=False,
+    )
+
+
+def export_yolo(model, path, imgsize=640):
+    """Export an ultralytics YOLO model with dynamic batch and image shapes
+
+    Args:
+        model (ultralytics.YOLO): the subfigure detector
+        path (pathlib.Path): path to write the .onnx file to
+        imgsize (int): length of the long side of the letterboxed figures
+    """
+    exported = model.export(
+        format="onnx", imgsz=imgsize, dynamic=True, opset=OPSET, verbose=False
+    )
+    shutil.move(exported, path)
+
+
+def export_models(figure_separator, output=ONNX_DIRECTORY, models=tuple(MODEL_FILES)):
+    """Export a FigureSeparator's PyTorch models to ONNX
+
+    Args:
+        figure_separator (FigureSeparator): separator using the "torch"
+            backend, whose models are exported
+        output (pathlib.Path): directory to write the .onnx files to
+        models (iterable of str): names of the models to export, from
+            MODEL_FILES
+    Returns:
+        paths (list of pathlib.Path): the exported files
+    """
+    exporters = {
+        "yolo_model": export_yolo,
+        "scale_bar_detection_model": export_scale_bar_detector,
+        "scale_label_recognition_model": export_scale_label_reader,
+    }
+    output = pathlib.Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name in models:
+        path = output / MODEL_FILES[name]
+        exporters[name](figure_separator.models.get(name), path)
+        paths.append(path)
+    return paths
+
+
+def main(args=None):
+    from ..figure import FigureSeparator
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--query", help="query JSON with figure_separator options")
+    parser.add_argument(
+        "--output", default=str(ONNX_DIRECTORY), help="directory to save models to"
+    )
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=list(MODEL_FILES),
+        choices=list(MODEL_FILES),
+        help="models to export",
+    )
+    args = parser.parse_args(args)
+    if args.query:
+        with open(args.query, "r") as f:
+            query = json.load(f)
+    else:
+        query = {"name": "onnx_export", "results_dirs": tempfile.mkdtemp()}
+    query.setdefault("figure_separator", {})["backend"] = "torch"
+    figure_separator = FigureSeparator(query)
+    for path in export_models(figure_separator, args.output, args.models):
+        print("Saved {}".format(path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""A figure decoded once and shared by every FigureSeparator stage"""
+import pathlib
+
+import numpy as np
+import torch
+from PIL import Image
+
+
+class FigureImage:
+    """RGB pixels of a figure, decoded once
+
+    Stages read the figure through views of one uint8 buffer instead of
+    reopening and converting the file.
+
+    Args:
+        path (str or pathlib.Path): path to the figure image
+        pixels (np.ndarray): HxWx3 uint8 RGB pixels. Decoded from path if
+            not given
+    """
+
+    def __init__(self, path, pixels=None):
+        self.path = pathlib.Path(path)
+        if pixels is None:
+            with Image.open(self.path) as image:
+                pixels = np.array(image.convert("RGB"))
+        self.rgb = pixels
+        self.height, self.width = pixels.shape[:2]
+
+    @classmethod
+    def open(cls, figure):
+        """Return figure if it is a FigureImage, otherwise decode it
+
+        Args:
+            figure (str, pathlib.Path or FigureImage): figure to open
+        Returns:
+            figure_image (FigureImage): the decoded figure
+        """
+        if isinstance(figure, cls):
+            return figure
+        return cls(figure)
+
+    @property
+    def size(self):
+        """(width, height), as in PIL"""
+        return self.width, self.height
+
+    def crop(self, x1, y1, x2, y2):
+        """View of the pixels in the box from (x1, y1) to (x2, y2)"""
+        return self.rgb[int(y1) : int(y2), int(x1) : int(x2)]
+
+    def crop_image(self, x1, y1, x2, y2):
+        """PIL image of the pixels in the box from (x1, y1) to (x2, y2)"""
+        return Image.fromarray(np.ascontiguousarray(self.crop(x1, y1, x2, y2)))
+
+    def tensor(self, device=None):
+        """3xHxW float tensor in [0, 1], the same as T.ToTensor()
+
+        The uint8 pixels are moved to device before they are converted, so
+        only a quarter of the bytes are copied to a GPU.
+        """
+        pixels = torch.from_numpy(self.rgb)
+        if device is not None:
+            pixels = pixels.to(device)
+        return pixels.permute(2, 0, 1).float().div_(255)
@@ -0,0 +1,107 @@
+"""Run the figure separator's models with ONNX Runtime
+
+Models exported by exsclaim.figures.export are wrapped so FigureSeparator
+calls them the same way as the PyTorch models they replace. onnxruntime
+is imported when a model is loaded, so it is only needed with the "onnx"
+backend.
+"""
+import pathlib
+
+import torch
+
+# Directory exported models are saved to and loaded from by default
+ONNX_DIRECTORY = pathlib.Path(__file__).resolve().parent / "checkpoints" / "onnx"
+# File name of each exported model
+MODEL_FILES = {
+    "yolo_model": "yolo_model.onnx",
+    "scale_bar_detection_model": "scale_bar_detection_model.onnx",
+    "scale_label_recognition_model": "scale_label_recognition_model.onnx",
+}
+
+
+def create_session(path, cuda=False):
+    """Open an ONNX Runtime session with every graph optimization
+
+    Args:
+        path (str or pathlib.Path): path to the .onnx model
+        cuda (bool): if True, run on the GPU when onnxruntime supports it
+    Returns:
+        session (onnxruntime.InferenceSession): the loaded model
+    """
+    import onnxruntime
+
+    providers = ["CPUExecutionProvider"]
+    if cuda and "CUDAExecutionProvider" in onnxruntime.get_available_providers():
+        providers.insert(0, "CUDAExecutionProvider")
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return onnxruntime.InferenceSession(str(path), options, providers=providers)
+
+
+class OnnxLabelReader:
+    """CRNN scale label reader run by ONNX Runtime
+
+    Called like CRNN, on an N x 3 x H x W image tensor, it returns the
+    N x T x C log probabilities as a tensor.
+
+    Args:
+        path (str or pathlib.Path): path to the exported CRNN
+        cuda (bool): if True, run on the GPU when onnxruntime supports it
+    """
+
+    def __init__(self, path, cuda=False):
+        self.session = create_session(path, cuda)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, images):
+        (log_probabilities,) = self.session.run(
+            None, {self.input_name: images.detach().cpu().numpy()}
+        )
+        return torch.from_numpy(log_probabilities)
+
+
+class OnnxScaleBarDetector:
+    """Faster R-CNN scale bar detector run by ONNX Runtime
+
+    Called like a torchvision detection model in eval mode, on a list of
+    3 x H x W image tensors, it returns a dict of "boxes", "labels" and
+    "scores" tensors for each image. The exported graph takes one image at
+    a time, so images are run one after another.
+
+    Args:
+        path (str or pathlib.Path): path to the exported Faster R-CNN
+        cuda (bool): if True, run on the GPU when onnxruntime supports it
+    """
+
+    def __init__(self, path, cuda=False):
+        self.session = create_session(path, cuda)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, images):
+        outputs = []
+        for image in images:
+            boxes, labels, scores = self.session.run(
+                None, {self.input_name: image.detach().cpu().numpy()}
+            )
+            outputs.append(
+                {
+                    "boxes": torch.from_numpy(boxes),
+                    "labels": torch.from_numpy(labels),
+                    "scores": torch.from_numpy(scores),
+                }
+            )
+        return outputs
+
+
+def load_yolo(path):
+    """YOLO subfigure detector run by ultralytics' ONNX Runtime backend
+
+    Args:
+        path (str or pathlib.Path): path to the exported YOLO model
+    Returns:
+        yolo_model (ultralytics.YOLO): model with the same predict() and
+            names as the PyTorch one
+    """
+    from ultralytics import YOLO
+
+    return YOLO(str(path), task="detect")
@@ -0,0 +1,198 @@
+"""INT8 quantization of the scale bar detector and label reader for CPUs
+
+Two modes are supported:
+    "dynamic": weights of Linear and LSTM layers are stored as int8 and
+        activations are quantized on the fly. No calibration is needed.
+    "static": as "dynamic", and the convolutional backbone (the ResNet
+        of Faster R-CNN, the CNN of the CRNN) also runs in int8, with
+        activation ranges calibrated on example images.
+
+Quantizing, and calibrating in particular, takes a while, so quantized
+models are cached next to their fp32 checkpoint as <name>.<mode>.int8.pt.
+A cache is rebuilt when its fp32 checkpoint changes.
+"""
+import copy
+import logging
+import pathlib
+import warnings
+
+import torch
+from torch import nn
+from torchvision.ops.misc import FrozenBatchNorm2d
+
+logger = logging.getLogger(__name__)
+
+MODES = ("dynamic", "static")
+
+# Images the static mode calibrates activation ranges on
+CALIBRATION_DIRECTORY = (
+    pathlib.Path(__file__).resolve().parent.parent / "tests" / "data" / "images"
+)
+
+
+def quantized_path(checkpoint, mode):
+    """Path a checkpoint's quantized model is cached at
+
+    Args:
+        checkpoint (pathlib.Path): path to the fp32 checkpoint
+        mode (str): quantization mode, from MODES
+    Returns:
+        path (pathlib.Path): e.g. scale_bar_detection_model.static.int8.pt
+    """
+    checkpoint = pathlib.Path(checkpoint)
+    return checkpoint.with_name("{}.{}.int8.pt".format(checkpoint.stem, mode))
+
+
+def fold_frozen_batch_norms(module):
+    """Fold FrozenBatchNorm2d layers into the convolutions before them
+
+    torchvision's detection backbones normalize with FrozenBatchNorm2d,
+    which the quantization fusion passes do not recognize. Each
+    convN/bnN pair of a ResNet block, and each Conv2d followed by a
+    FrozenBatchNorm2d in a Sequential, becomes one convolution with a bias.
+
+    Args:
+        module (nn.Module): module to fold, modified in place
+    Returns:
+        module (nn.Module): the folded module
+    """
+    for child in module.children():
+        fold_frozen_batch_norms(child)
+    children = dict(module.named_children())
+    names = list(children)
+    if isinstance(module, nn.Sequential):
+        pairs = list(zip(names, names[1:]))
+    else:
+        pairs = [
+            (name, "bn" + name[4:])
+            for name in names
+            if name.startswith("conv") and "bn" + name[4:] in children
+        ]
+    for conv_name, norm_name in pairs:
+        conv, norm = children[conv_name], children[norm_name]
+        if not isinstance(conv, nn.Conv2d) or not isinstance(norm, FrozenBatchNorm2d):
+            continue
+        with torch.no_grad():
+            scale = norm.weight * (norm.running_var + norm.eps).rsqrt()
+            bias = conv.bias if conv.bias is not None else torch.zeros_like(norm.bias)
+            conv.weight = nn.Parameter(conv.weight * scale[:, None, None, None])
+            conv.bias = nn.Parameter(norm.bias + (bias - norm.running_mean) * scale)
+        setattr(module, norm_name, nn.Identity())
+    return module
+
+
+def quantize_static(module, example, calibrate):
+    """Quantize a traceable module with calibrated activation ranges
+
+    Args:
+        module (nn.Module): module to quantize, e.g. a backbone
+        example (torch.Tensor): example input to trace the module with
+        calibrate (callable): runs the model containing module on the
+            calibration images. It is called with the prepared module
+            already in place of module
+    Returns:
+        quantized (torch.fx.GraphModule): the int8 module
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping, quantize_fx
+
+    with warnings.catch_warnings():
+        # FX graph mode quantization warns that it is in maintenance mode
+        warnings.simplefilter("ignore")
+        prepared = quantize_fx.prepare_fx(
+            module, get_default_qconfig_mapping("x86"), (example,)
+        )
+        with torch.no_grad():
+            calibrate(prepared)
+        return quantize_fx.convert_fx(prepared)
+
+
+def quantize_scale_bar_detector(model, mode, images=()):
+    """Quantize a Faster R-CNN scale bar detector
+
+    Args:
+        model (FasterRCNN): the fp32 detector, left unchanged
+        mode (str): "dynamic" or "static"
+        images (list of torch.Tensor): 3xHxW calibration images, for "static"
+    Returns:
+        quantized (FasterRCNN): the int8 detector
+    """
+    model = fold_frozen_batch_norms(copy.deepcopy(model).cpu().eval())
+    if mode == "static":
+        body = model.backbone.body
+
+        def calibrate(prepared):
+            model.backbone.body = prepared
+            for image in images:
+                model([image])
+
+        example = torch.rand(1, 3, 800, 800)
+        model.backbone.body = quantize_static(body, example, calibrate)
+    # the box head's fully connected layers hold most of the weights
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, torch.qint8)
+
+
+def quantize_scale_label_reader(model, mode, images=()):
+    """Quantize a CRNN scale label reader
+
+    Args:
+        model (CRNN): the fp32 reader, left unchanged
+        mode (str): "dynamic" or "static"
+        images (list of torch.Tensor): N x 3 x H x W batches of normalized
+            label images for calibration, for "static"
+    Returns:
+        quantized (CRNN): the int8 reader
+    """
+    model = copy.deepcopy(model).cpu().eval()
+    if mode == "static":
+        cnn = model.cnn
+
+        def calibrate(prepared):
+            model.cnn = prepared
+            for batch in images:
+                model(batch)
+
+        example = torch.rand(1, 3, 128, 512)
+        model.cnn = quantize_static(cnn, example, calibrate)
+    return torch.ao.quantization.quantize_dynamic(
+        model, {nn.Linear, nn.LSTM}, torch.qint8
+    )
+
+
+def load_quantized(checkpoint, mode, quantize, calibration=list):
+    """Load a cached quantized model, quantizing and caching it if needed
+
+    Only the quantized state dict is cached. To load it, the model is
+    quantized without calibration, which gives the quantized structure, and
+    the cached weights and activation ranges are loaded into it.
+
+    Args:
+        checkpoint (pathlib.Path): path to the fp32 checkpoint
+        mode (str): quantization mode, from MODES
+        quantize (callable): takes a list of calibration inputs and returns
+            the quantized model
+        calibration (callable): returns the calibration inputs. Only called
+            if there is no up to date cache
+    Returns:
+        model (nn.Module): the quantized model, in eval mode
+    """
+    if mode not in MODES:
+        raise ValueError(
+            "Unknown quantization mode {}. Choose from {}".format(mode, MODES)
+        )
+    path = quantized_path(checkpoint, mode)
+    stat = pathlib.Path(checkpoint).stat()
+    source = (stat.st_size, stat.st_mtime_ns)
+    if path.is_file():
+        # we wrote this file ourselves, so it is trusted to unpickle
+        cached = torch.load(path, map_location="cpu", weights_only=False)
+        if cached.get("source") == source:
+            with warnings.catch_warnings():
+                # observers that saw no calibration data warn
+                warnings.simplefilter("ignore")
+                model = quantize([])
+            model.load_state_dict(cached["state_dict"])
+            return model.eval()
+        logger.info("{} changed, quantizing it again".format(checkpoint))
+    model = quantize(calibration()).eval()
+    torch.save({"source": source, "state_dict": model.state_dict()}, path)
+    return model
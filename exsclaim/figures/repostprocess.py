@@ -0,0 +1,149 @@
+"""Re-apply the figure separator's thresholds to saved raw detections
+
+With "figure_separator": {"raw_detections": true} in the query,
+FigureSeparator saves each figure's detections from below its thresholds
+to results_dir/detections/<figure name>.npz: every YOLO subfigure box
+above a low confidence, every Faster R-CNN scale object above a low
+confidence before non maximum suppression, and the CRNN's reading of every
+one of those scale labels. Figures can then be separated again with other
+thresholds from these files alone, without running any model.
+
+Usage:
+    python -m exsclaim.figures.repostprocess --query query.json
+        [--subfigure-confidence 0.8] [--scale-confidence 0.5]
+        [--scale-nms 0.4]
+"""
+import argparse
+import json
+import os
+import pathlib
+
+import numpy as np
+
+from .scale.process import non_max_suppression_malisiewicz
+
+# Directory of a results directory the raw detections are saved in
+DIRECTORY = "detections"
+# Thresholds figures are separated with
+THRESHOLDS = {"subfigure_confidence": 0.8, "scale_confidence": 0.5, "scale_nms": 0.4}
+# Confidences raw detections are saved down to. Thresholds can be retuned
+# down to these values
+RAW_THRESHOLDS = {"subfigure_confidence": 0.05, "scale_confidence": 0.1}
+# Fields of a Master Image JSON added after figure separation, which are
+# kept when a figure is separated again
+CAPTION_FIELDS = ("caption", "keywords", "context", "materials_ner")
+
+
+def sidecar_path(results_directory, figure_name):
+    """Path a figure's raw detections are saved to"""
+    return pathlib.Path(results_directory) / DIRECTORY / (figure_name + ".npz")
+
+
+def save_raw_detections(path, raw):
+    """Save a figure's raw detections
+
+    Args:
+        path (pathlib.Path): path to save to, from sidecar_path
+        raw (dict): arrays of raw detections, see load_raw_detections
+    """
+    path = pathlib.Path(path)
+    os.makedirs(path.parent, exist_ok=True)
+    # write to a temporary file so a crash never leaves a partial file
+    temporary = path.with_name(path.name + ".tmp")
+    with open(temporary, "wb") as f:
+        np.savez_compressed(f, **raw)
+    os.replace(temporary, path)
+
+
+def load_raw_detections(path):
+    """Load a figure's raw detections
+
+    Args:
+        path (pathlib.Path): path to the .npz file
+    Returns:
+        raw (dict): with keys
+            "figure_name": the figure's name
+            "names": subfigure label of each YOLO class
+            "subfigures": Nx6 x1, y1, x2, y2, confidence, class array of
+                YOLO boxes in figure pixels, by decreasing confidence
+            "scale_objects": Mx6 array of Faster R-CNN boxes with the same
+                columns, class 1 for scale bars and 2 for scale labels
+            "scale_label_magnitude", "scale_label_unit" and
+                "scale_label_confidence": length M arrays of the CRNN's
+                reading of each scale label. -1, "" and 0 for scale bars
+        A stage that did not run has no arrays.
+    """
+    with np.load(path, allow_pickle=False) as arrays:
+        raw = {key: arrays[key] for key in arrays.files}
+    raw["figure_name"] = str(raw["figure_name"])
+    return raw
+
+
+def select_subfigures(subfigures, confidence):
+    """Keep the most confident subfigure box of each class
+
+    Non maximum suppression never removes the most confident box of a
+    class, so only the confidence threshold changes which box is kept.
+
+    Args:
+        subfigures (np.ndarray): raw Nx6 subfigure boxes, by decreasing
+            confidence
+        confidence (float): minimum confidence of a box
+    Returns:
+        detections (np.ndarray): Kx6 array with one row per class, by
+            decreasing confidence, as from batch.best_box_per_class
+    """
+    subfigures = subfigures[subfigures[:, 4] > confidence]
+    _, first = np.unique(subfigures[:, 5], return_index=True)
+    return subfigures[np.sort(first)]
+
+
+def select_scale_objects(scale_objects, confidence, nms):
+    """Apply the confidence threshold and non maximum suppression
+
+    Args:
+        scale_objects (np.ndarray): raw Mx6 scale objects
+        confidence (float): minimum confidence of a scale object
+        nms (float): overlap above which the less confident of two scale
+            objects is removed
+    Returns:
+        scale_objects (np.ndarray): the kept Kx6 scale objects
+        kept (np.ndarray): index of each kept scale object in the raw array
+    """
+    indices = np.flatnonzero(scale_objects[:, 4] > confidence)
+    if len(indices) == 0:
+        return np.zeros((0, 6), dtype=np.float32), indices
+    # carry each row's index through non_max_suppression_malisiewicz
+    rows = np.concatenate([scale_objects[indices], indices[:, None]], axis=1)
+    kept = non_max_suppression_malisiewicz(rows, nms)
+    return kept[:, :6].astype(scale_objects.dtype), kept[:, 6].astype(int)
+
+
+def main(args=None):
+    from ..figure import FigureSeparator
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--query", required=True, help="query JSON of the run to separate again"
+    )
+    for name, default in THRESHOLDS.items():
+        parser.add_argument(
+            "--" + name.replace("_", "-"),
+            type=float,
+            help="new {} (the query's, or {}, if not given)".format(name, default),
+        )
+    args = parser.parse_args(args)
+    with open(args.query, "r") as f:
+        query = json.load(f)
+    config = query.setdefault("figure_separator", {})
+    thresholds = config.setdefault("thresholds", {})
+    for name in THRESHOLDS:
+        if getattr(args, name) is not None:
+            thresholds[name] = getattr(args, name)
+    figure_separator = FigureSeparator(query)
+    count = figure_separator.repostprocess()
+    print("Separated {} figures again".format(count))
+
+
+if __name__ == "__main__":
+    main()
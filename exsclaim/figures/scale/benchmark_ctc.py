@@ -0,0 +1,80 @@
+"""Micro-benchmark of reading scale labels with run_ctc
+
+Compares building the language model from corpus.txt for every label, as
+run_ctc used to, with the cached language model, the vectorized beam search
+on one label at a time and on a whole batch of labels. Probability matrices
+are random, with the shape the scale label CRNN outputs.
+
+Usage:
+    python -m exsclaim.figures.scale.benchmark_ctc [--labels 20]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from . import ctc
+from .lm import CORPUS, LanguageModel, load_language_model
+
+CLASSES = "0123456789mMcCuUnN .A"
+
+
+def random_probabilities(labels, steps=32, seed=0):
+    """Random CTC outputs, each row a distribution over classes and blank"""
+    rng = np.random.default_rng(seed)
+    logits = rng.normal(scale=3.0, size=(labels, steps, len(CLASSES) + 1))
+    probabilities = np.exp(logits)
+    return probabilities / probabilities.sum(axis=2, keepdims=True)
+
+
+def time_labels(decode, matrices):
+    """Mean seconds decode takes per probability matrix"""
+    start = time.perf_counter()
+    for matrix in matrices:
+        decode(matrix)
+    return (time.perf_counter() - start) / len(matrices)
+
+
+def uncached(matrix):
+    language_model = LanguageModel(CORPUS, CLASSES)
+    top_results = ctc.ctcBeamSearch(matrix, CLASSES, lm=language_model, beamWidth=15)
+    return ctc.postprocess_ctc(top_results)
+
+
+def cached(matrix):
+    language_model = load_language_model(CLASSES)
+    top_results = ctc.ctcBeamSearch(matrix, CLASSES, lm=language_model, beamWidth=15)
+    return ctc.postprocess_ctc(top_results)
+
+
+def vectorized(matrix):
+    return ctc.run_ctc(matrix, CLASSES)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", type=int, default=20, help="labels to decode")
+    args = parser.parse_args(args)
+    matrices = random_probabilities(args.labels)
+
+    start = time.perf_counter()
+    load_language_model(CLASSES)
+    load_time = time.perf_counter() - start
+    before = time_labels(uncached, matrices)
+    after = time_labels(cached, matrices)
+    single = time_labels(vectorized, matrices)
+    start = time.perf_counter()
+    ctc.run_ctc_batch(list(matrices), CLASSES)
+    batched = (time.perf_counter() - start) / len(matrices)
+    print("language model load (once):  {:8.2f} ms".format(load_time * 1e3))
+    print("per label, uncached model:   {:8.2f} ms".format(before * 1e3))
+    print("per label, cached model:     {:8.2f} ms".format(after * 1e3))
+    print("per label, vectorized:       {:8.2f} ms".format(single * 1e3))
+    print("per label, vectorized batch: {:8.2f} ms".format(batched * 1e3))
+    print("speedup, cached model:       {:8.2f}x".format(before / after))
+    print("speedup, vectorized:         {:8.2f}x".format(after / single))
+    print("speedup, vectorized batch:   {:8.2f}x".format(after / batched))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,11 @@
 #  https://github.com/githubharald/CTCDecoder/blob/master/src/BeamSearch.py
 from __future__ import division, print_function
 
-import pathlib
+import functools
 
-from .lm import LanguageModel
+import numpy as np
+
+from .lm import load_language_model
 
 
 class BeamEntry:
@@ -43,14 +45,14 @@ class BeamState:
 def applyLM(parentBeam, childBeam, classes, lm):
     """Get LM score of child beam"""
     if lm and not childBeam.lmApplied:
-        c1 = classes[
+        c1 = (
             parentBeam.labeling[-1] if parentBeam.labeling else classes.index(" ")
-        ]  # first char
-        c2 = classes[childBeam.labeling[-1]]  # second char
+        )  # first char
+        c2 = childBeam.labeling[-1]  # second char
         lmFactor = 0.01  # influence of language model
-        bigramProb = (
-            lm.getCharBigram(c1, c2) ** lmFactor
-        )  # probability of seeing first and second char next to each other
+        bigramProb = lm.getBigramMatrix(lmFactor)[
+            c1, c2
+        ]  # probability of seeing first and second char next to each other
         childBeam.prText = (
             parentBeam.prText * bigramProb
         )  # probability of char sequence
@@ -271,6 +273,244 @@ def get_legal_next_characters(path, sequence_length=8):
         ]
 
 
+def _grammar_state(path):
+    """Features of a path that decide which labels may follow it
+
+    Mirrors the bookkeeping in get_legal_next_characters.
+    """
+    prefix = False
+    base_unit = False
+    decimals = 0
+    for label in path:
+        if label == 19:
+            decimals += 1
+        elif label in [10, 11, 12, 13, 14, 15, 16, 17] and not prefix:
+            prefix = True
+        elif label == 20:
+            prefix = True
+            base_unit = True
+        elif label in [10, 11] and prefix:
+            base_unit = True
+    last = path[-1] if path else None
+    return len(path), prefix, base_unit, min(decimals, 2), last
+
+
+@functools.lru_cache(maxsize=None)
+def compile_grammar(num_labels=21, sequence_length=8):
+    """Compile get_legal_next_characters into a transition table
+
+    Args:
+        num_labels (int): number of non-blank classes
+        sequence_length (int): longest labeling the grammar allows
+    Returns:
+        transitions (np.ndarray): S x num_labels array, the state reached by
+            appending each label to a labeling in each state, or -1 if the
+            label may not follow. State 0 is the empty labeling
+    """
+    states = {_grammar_state(()): 0}
+    paths = [()]
+    rows = []
+    for path in paths:
+        row = np.full(num_labels, -1, dtype=np.int64)
+        if len(path) < sequence_length:
+            for label in get_legal_next_characters(path, sequence_length):
+                if label >= num_labels:
+                    continue
+                child = path + (label,)
+                key = _grammar_state(child)
+                if key not in states:
+                    states[key] = len(paths)
+                    paths.append(child)
+                row[label] = states[key]
+        rows.append(row)
+    return np.stack(rows)
+
+
+# Fields of the float and int arrays _beam_search keeps for each beam
+BLANK, NON_BLANK, TOTAL, TEXT = range(4)
+ID, PARENT, LAST, LENGTH, STATE = range(5)
+
+
+def _beam_search(mats, bigrams, space, beam_width, transitions, top):
+    """Vectorized ctcBeamSearch on an N x T x C batch of probability matrices
+
+    Each matrix keeps beam_width beams, held in N x beam_width arrays.
+    Every beam is extended by every label at once, and the best candidates
+    of each matrix are selected with a stable sort by score, so ties are
+    broken in the insertion order of ctcBeamSearch.
+    """
+    num_mats, steps, num_classes = mats.shape
+    blank = num_classes - 1
+    labels = np.arange(blank)
+    rows = np.arange(num_mats)[:, None]
+    # labelings form a trie: labeling i is labeling trie_parent[i] followed
+    # by label trie_label[i]. Labeling n is the empty labeling of matrix n
+    trie_parent = [-1] * num_mats
+    trie_label = [-1] * num_mats
+    children = {}
+    # beams, one row per matrix. Rows have fewer than beam_width valid
+    # beams when there are fewer candidates
+    probabilities = np.zeros((num_mats, 1, 4))
+    probabilities[:, :, [BLANK, TOTAL, TEXT]] = 1
+    beams = np.zeros((num_mats, 1, 5), dtype=np.int64)
+    beams[:, 0, ID] = np.arange(num_mats)
+    beams[:, :, PARENT] = -1
+    beams[:, :, LAST] = -1
+    valid = np.ones((num_mats, 1), dtype=bool)
+
+    for t in range(steps):
+        num_beams = beams.shape[1]
+        row = mats[:, t]
+        last = beams[:, :, LAST]
+        pr_blank = probabilities[:, :, BLANK]
+        pr_total = probabilities[:, :, TOTAL]
+        pr_text = probabilities[:, :, TEXT]
+        non_empty = last >= 0
+
+        # keep the labeling: paths ending in a repeat of the last label or a blank
+        stay = probabilities.copy()
+        stay[:, :, NON_BLANK] *= np.where(non_empty, row[rows, last], 0)
+        stay[:, :, BLANK] = pr_total * row[:, blank, None]
+        stay[:, :, TOTAL] = stay[:, :, BLANK] + stay[:, :, NON_BLANK]
+
+        # extend the labeling: a repeated label must follow a blank
+        extend = np.zeros((num_mats, num_beams, blank, 4))
+        extend[..., NON_BLANK] = row[:, None, :blank] * np.where(
+            labels == last[:, :, None], pr_blank[:, :, None], pr_total[:, :, None]
+        )
+        extend[..., TOTAL] = extend[..., NON_BLANK]
+        if bigrams is None:
+            extend[..., TEXT] = 1
+        else:
+            previous = np.where(non_empty, last, space)
+            extend[..., TEXT] = pr_text[:, :, None] * bigrams[previous]
+        extend_beams = np.empty((num_mats, num_beams, blank, 5), dtype=np.int64)
+        extend_beams[..., ID] = -1
+        extend_beams[..., PARENT] = beams[:, :, ID, None]
+        extend_beams[..., LAST] = labels
+        extend_beams[..., LENGTH] = beams[:, :, LENGTH, None] + 1
+        legal = np.empty((num_mats, num_beams, blank), dtype=bool)
+        legal[...] = valid[:, :, None]
+        if transitions is None:
+            extend_beams[..., STATE] = 0
+        else:
+            extend_beams[..., STATE] = transitions[beams[:, :, STATE]]
+            legal &= extend_beams[..., STATE] >= 0
+
+        # insertion order of ctcBeamSearch, for ties
+        stay_positions = np.empty((num_mats, num_beams), dtype=np.int64)
+        stay_positions[...] = np.arange(num_beams) * num_classes
+        extend_positions = stay_positions[:, :, None] + 1 + labels
+
+        # an extension that makes another beam's labeling adds to that beam
+        same = beams[:, None, :, ID] == beams[:, :, PARENT, None]
+        same &= valid[:, None, :]
+        mat_index, beam_index = np.nonzero(same.any(axis=2) & valid)
+        if len(mat_index):
+            parent_index = same[mat_index, beam_index].argmax(axis=1)
+            label_index = last[mat_index, beam_index]
+            merge = legal[mat_index, parent_index, label_index]
+            mat_index, beam_index = mat_index[merge], beam_index[merge]
+            parent_index, label_index = parent_index[merge], label_index[merge]
+            merged = extend[mat_index, parent_index, label_index, NON_BLANK]
+            stay[mat_index, beam_index, NON_BLANK] += merged
+            stay[mat_index, beam_index, TOTAL] += merged
+            stay_positions[mat_index, beam_index] = np.minimum(
+                stay_positions[mat_index, beam_index],
+                extend_positions[mat_index, parent_index, label_index],
+            )
+            legal[mat_index, parent_index, label_index] = False
+
+        # candidates: every beam kept, then every beam extended by each label
+        candidate_probabilities = np.concatenate(
+            [stay, extend.reshape(num_mats, -1, 4)], axis=1
+        )
+        candidate_beams = np.concatenate(
+            [beams, extend_beams.reshape(num_mats, -1, 5)], axis=1
+        )
+        candidate_valid = np.concatenate([valid, legal.reshape(num_mats, -1)], axis=1)
+        positions = np.concatenate(
+            [stay_positions, extend_positions.reshape(num_mats, -1)], axis=1
+        )
+        if t == steps - 1:
+            break
+        scores = np.where(
+            candidate_valid,
+            candidate_probabilities[:, :, TOTAL] * candidate_probabilities[:, :, TEXT],
+            -1.0,
+        )
+        best = np.lexsort((positions, -scores), axis=1)[:, :beam_width]
+        probabilities = candidate_probabilities[rows, best]
+        beams = candidate_beams[rows, best]
+        valid = candidate_valid[rows, best]
+        # give the new labelings their ids in the trie
+        for n, b in zip(*np.nonzero(beams[:, :, ID] < 0)):
+            key = (int(beams[n, b, PARENT]), int(beams[n, b, LAST]))
+            if key not in children:
+                children[key] = len(trie_parent)
+                trie_parent.append(key[0])
+                trie_label.append(key[1])
+            beams[n, b, ID] = children[key]
+
+    # length-normalise LM score, with Python's pow as in BeamState.norm
+    texts = candidate_probabilities[:, :, TEXT].tolist()
+    lengths = candidate_beams[:, :, LENGTH].tolist()
+    normalised = np.array(
+        [
+            [text ** (1.0 / (length if length else 1.0)) for text, length in zip(*row)]
+            for row in zip(texts, lengths)
+        ]
+    )
+    scores = candidate_probabilities[:, :, TOTAL] * normalised
+    scores = np.where(candidate_valid, scores, -1.0)
+    best = np.lexsort((positions, -scores), axis=1)
+
+    def labeling(beam):
+        node = beam[PARENT] if beam[ID] < 0 else beam[ID]
+        labeling = [beam[LAST]] if beam[ID] < 0 else []
+        while node >= num_mats:
+            labeling.append(trie_label[node])
+            node = trie_parent[node]
+        return tuple(int(label) for label in reversed(labeling))
+
+    return [
+        [
+            (labeling(candidate_beams[n, i]), scores[n, i])
+            for i in best[n, :top]
+            if candidate_valid[n, i]
+        ]
+        for n in range(num_mats)
+    ]
+
+
+def ctc_beam_search(mats, classes, lm=None, beam_width=15, grammar=False, top=10):
+    """Vectorized CTC beam search with an optional scale label grammar
+
+    Gives the same results as ctcBeamSearch, with the beams held in arrays
+    and every label extended at once.
+
+    Args:
+        mats (np.ndarray): T x C matrix of class probabilities for each
+            time step, the blank last, or an N x T x C batch of them
+        classes (str): characters of the non-blank classes
+        lm (LanguageModel): character bigram model, or None
+        beam_width (int): beams kept at each time step
+        grammar (bool): if True, only extend labelings as allowed by
+            get_legal_next_characters
+        top (int): number of results to return
+    Returns:
+        results (list): (labeling, score) of the top results, best first.
+            A list of them for each matrix if given a batch
+    """
+    mats = np.asarray(mats, dtype=np.float64)
+    bigrams = lm.getBigramMatrix(0.01) if lm else None
+    transitions = compile_grammar(len(classes)) if grammar else None
+    space = classes.index(" ")
+    if mats.ndim == 2:
+        return _beam_search(mats[None], bigrams, space, beam_width, transitions, top)[0]
+    return _beam_search(mats, bigrams, space, beam_width, transitions, top)
+
+
 def postprocess_ctc(results):
     classes = "0123456789mMcCuUnN .A"
     idx_to_class = classes + "-"
@@ -297,10 +537,36 @@ def postprocess_ctc(results):
     return -1, "m", 0
 
 
-def run_ctc(probs, classes):
-    current_file = pathlib.Path(__file__).resolve(strict=True)
-    language_model_file = "corpus.txt"
-    language_model = LanguageModel(current_file.parent / language_model_file, classes)
-    top_results = ctcBeamSearch(probs, classes, lm=language_model, beamWidth=15)
+def run_ctc(probs, classes, grammar=False):
+    language_model = load_language_model(classes)
+    top_results = ctc_beam_search(
+        probs, classes, lm=language_model, beam_width=15, grammar=grammar
+    )
     magnitude, unit, confidence = postprocess_ctc(top_results)
     return magnitude, unit, confidence
+
+
+def run_ctc_batch(probs_list, classes, grammar=False):
+    """run_ctc on many probability matrices, decoding equal lengths together
+
+    Args:
+        probs_list (list of np.ndarray): T x C probability matrices, T may
+            differ between matrices
+        classes (str): characters of the non-blank classes
+        grammar (bool): if True, constrain labelings to the scale label grammar
+    Returns:
+        labels (list of tuples): (magnitude, unit, confidence) of each matrix
+    """
+    language_model = load_language_model(classes)
+    by_length = {}
+    for i, probs in enumerate(probs_list):
+        by_length.setdefault(len(probs), []).append(i)
+    labels = [None] * len(probs_list)
+    for indices in by_length.values():
+        mats = np.stack([probs_list[i] for i in indices])
+        results = ctc_beam_search(
+            mats, classes, lm=language_model, beam_width=15, grammar=grammar
+        )
+        for i, top_results in zip(indices, results):
+            labels[i] = postprocess_ctc(top_results)
+    return labels
@@ -15,8 +15,8 @@ from torchvision.models.detection.faster_rcnn import FastRCNNPredictor
 
 import exsclaim.utilities.boxes as boxes
 from exsclaim.figures.models.crnn import CRNN
-from exsclaim.figures.scale.ctc import ctcBeamSearch
-from exsclaim.figures.scale.lm import LanguageModel
+from exsclaim.figures.scale.ctc import ctc_beam_search
+from exsclaim.figures.scale.lm import load_language_model
 from exsclaim.figures.scale.process import non_max_suppression_malisiewicz
 from exsclaim.utilities.models import load_model_from_checkpoint
 
@@ -306,12 +306,10 @@ def read_scale_bar_label(scale_bar_model, scale_bar_label_image):
     # run image on model
     logps = scale_bar_model(image)
     probs = torch.exp(logps)
-    probs = probs.squeeze(0)
+    probs = probs.squeeze(0).detach().cpu().numpy()
     # postprocess
-    language_model_file = "corpus.txt"
-    current_file = pathlib.Path(__file__).resolve(strict=True)
-    language_model = LanguageModel(current_file.parent / language_model_file, classes)
-    top_results = ctcBeamSearch(probs, classes, lm=language_model, beamWidth=15)
+    language_model = load_language_model(classes)
+    top_results = ctc_beam_search(probs, classes, lm=language_model, beam_width=15)
 
     magnitude, unit, confidence = postprocess_ctc(top_results)
     convert_to_nm = {
@@ -0,0 +1,176 @@
+"""Decide cheaply whether a figure is worth running scale detection on
+
+Scale bars are found on micrographs, so plots, schematics and photos can
+skip Faster R-CNN and the CRNN. A figure is scored from 0 (surely no scale
+bar) to 1 from its caption, its pixels, or both, and scale detection runs
+only when the score reaches the threshold. A threshold of 0 runs every
+figure, and higher thresholds skip more figures at some cost to recall.
+"""
+import re
+
+import numpy as np
+
+MODES = ("off", "caption", "image", "both")
+
+# Caption words that name an imaging technique with scale bars
+KEYWORDS = (
+    "tem",
+    "hrtem",
+    "sem",
+    "stem",
+    "haadf",
+    "afm",
+    "stm",
+    "eels",
+    "edx",
+    "eds",
+    "saed",
+    "micrograph",
+    "microscopy",
+    "microscope",
+    "scale bar",
+    "scale bars",
+)
+# A length in a caption, e.g. "50 nm" or "2 µm", is weaker evidence as
+# wavelengths and thicknesses are written the same way
+LENGTH_PATTERN = re.compile(r"\d\s*(?:nm|µm|μm|um|mm|Å)\b", re.IGNORECASE)
+LENGTH_SCORE = 0.5
+
+# Pixels brighter than this count as page background
+WHITE_LEVEL = 235
+# Crops are subsampled to about this many pixels on their long side
+SAMPLE_SIZE = 128
+
+
+def caption_score(figure_json, keywords=KEYWORDS):
+    """Score a figure by the imaging techniques its captions mention
+
+    Args:
+        figure_json (dict): A Figure JSON. Its full caption is read, along
+            with subfigure captions and keywords from CaptionDistributor
+        keywords (iterable of str): words that name imaging techniques
+    Returns:
+        score (float): 1 if a keyword is mentioned, LENGTH_SCORE if only a
+            length is, otherwise 0
+    """
+    texts = [figure_json.get("full_caption", "")]
+    for caption in figure_json.get("unassigned", {}).get("captions", []):
+        texts.append(caption.get("description", ""))
+        texts += caption.get("keywords", [])
+    text = " ".join(text for text in texts if isinstance(text, str))
+    pattern = r"\b(?:{})\b".format("|".join(re.escape(word) for word in keywords))
+    if re.search(pattern, text, re.IGNORECASE):
+        return 1.0
+    if LENGTH_PATTERN.search(text):
+        return LENGTH_SCORE
+    return 0.0
+
+
+def image_score(pixels):
+    """Score a crop by how much it looks like a micrograph
+
+    Micrographs fill their frame with grey, finely varying intensities.
+    Plots and schematics are mostly white background, and photos and
+    charts are colourful.
+
+    Args:
+        pixels (np.ndarray): HxWx3 uint8 RGB pixels
+    Returns:
+        score (float): product of the fraction of non background pixels,
+            how grey they are and the entropy of their grey levels, from 0
+            to 1
+    """
+    if pixels.size == 0:
+        return 0.0
+    step = max(max(pixels.shape[:2]) // SAMPLE_SIZE, 1)
+    sample = pixels[::step, ::step].astype(np.int16)
+    grey = sample.mean(axis=2)
+    foreground = grey < WHITE_LEVEL
+    filled = foreground.mean()
+    if not filled:
+        return 0.0
+    saturation = (sample.max(axis=2) - sample.min(axis=2))[foreground]
+    greyness = 1 - min(saturation.mean() / 64, 1)
+    histogram = np.bincount(grey[foreground].astype(np.int64), minlength=256)
+    probabilities = histogram[histogram > 0] / foreground.sum()
+    entropy = -(probabilities * np.log2(probabilities)).sum() / 8
+    return float(filled * greyness * entropy)
+
+
+class ScaleGate:
+    """Decides which figures scale detection runs on and counts skips
+
+    Args:
+        mode (str): "off" runs every figure, "caption" and "image" score
+            figures from their captions or their pixels, and "both" takes
+            the higher of the two scores
+        threshold (float): lowest score that runs scale detection, from 0
+            (best recall) to 1 (fastest)
+        keywords (iterable of str): caption words that name imaging
+            techniques with scale bars
+    """
+
+    def __init__(self, mode="off", threshold=0.1, keywords=KEYWORDS):
+        if mode not in MODES:
+            raise ValueError(
+                "Unknown scale gate mode {}. Choose from {}".format(mode, MODES)
+            )
+        self.mode = mode
+        self.threshold = threshold
+        self.keywords = tuple(keywords)
+        self.checked = 0
+        self.skipped = 0
+        # decision for each figure name, so a figure is only counted once
+        self.decisions = {}
+
+    def score(self, figure_json, figure_image, detections=None):
+        """Score how likely a figure is to have a scale bar
+
+        Args:
+            figure_json (dict): the figure's Figure JSON
+            figure_image (FigureImage): the decoded figure
+            detections (np.ndarray): Kx6 subfigure boxes. Each subfigure is
+                scored on its own and the best one counts. The whole figure
+                is scored if there are none
+        Returns:
+            score (float): from 0 to 1
+        """
+        scores = []
+        if self.mode in ("caption", "both"):
+            scores.append(caption_score(figure_json, self.keywords))
+        if self.mode in ("image", "both"):
+            crops = [figure_image.crop(*box[:4]) for box in detections] or [
+                figure_image.rgb
+            ]
+            scores.append(max(image_score(crop) for crop in crops))
+        return max(scores, default=1.0)
+
+    def allows(self, figure_json, figure_image, detections=None):
+        """Check if scale detection should run on a figure, counting skips
+
+        A figure's decision is kept and reused if it is checked again.
+
+        Args:
+            figure_json (dict): the figure's Figure JSON
+            figure_image (FigureImage): the decoded figure
+            detections (np.ndarray): Kx6 subfigure boxes of the figure
+        Returns:
+            allowed (bool): True if scale detection should run
+        """
+        if self.mode == "off":
+            return True
+        figure_name = figure_image.path.name
+        if figure_name not in self.decisions:
+            if detections is None:
+                detections = []
+            score = self.score(figure_json, figure_image, detections)
+            self.decisions[figure_name] = score >= self.threshold
+            self.checked += 1
+            self.skipped += not self.decisions[figure_name]
+        return self.decisions[figure_name]
+
+    def summary(self):
+        """Line reporting how many figures were skipped"""
+        return ">>> Scale gate ({}, threshold {}) skipped {} of {} figures\n".format(
+            self.mode, self.threshold, self.skipped, self.checked
+        )
@@ -1,14 +1,27 @@
 from __future__ import division, print_function
 
 import codecs
+import functools
+import pathlib
 import re
 
+import numpy as np
+
+CORPUS = pathlib.Path(__file__).resolve().parent / "corpus.txt"
+
+
+@functools.lru_cache(maxsize=None)
+def load_language_model(classes, fn=CORPUS):
+    "language model for classes, read from fn once per process"
+    return LanguageModel(fn, classes)
+
 
 class LanguageModel:
     "simple language model: word list for token passing, char bigrams for beam search"
 
     def __init__(self, fn, classes):
         "read text from file to generate language model"
+        self.classes = classes
         self.initWordList(fn)
         self.initCharBigrams(fn, classes)
 
@@ -21,34 +34,47 @@ class LanguageModel:
 
     def initCharBigrams(self, fn, classes):
         "internal init of character bigrams"
-
-        # init bigrams with 0 values
-        self.bigram = {c: {d: 0 for d in classes} for c in classes}
-
-        # go through text and add each char bigram
         codec = codecs.open(fn, "r", "utf8")
         txt = codec.read()
         codec.close()
-        for i in range(len(txt) - 1):
-            first = txt[i]
-            second = txt[i + 1]
 
-            # ignore unknown chars
-            if first not in self.bigram or second not in self.bigram[first]:
-                continue
+        # class id of each char of the text, -1 for unknown chars
+        classIds = {c: i for i, c in enumerate(classes)}
+        ids = np.array([classIds.get(c, -1) for c in txt], dtype=np.int64)
+
+        # count each char bigram, ignoring unknown chars
+        first, second = ids[:-1], ids[1:]
+        known = (first >= 0) & (second >= 0)
+        numClasses = len(classes)
+        counts = np.bincount(
+            first[known] * numClasses + second[known], minlength=numClasses**2
+        ).reshape(numClasses, numClasses)
+        self.bigram = counts
 
-            self.bigram[first][second] += 1
+        # row normalised: probability of the second char given the first
+        numBigrams = counts.sum(axis=1, keepdims=True)
+        self.bigramMatrix = np.divide(
+            counts,
+            numBigrams,
+            out=np.zeros(counts.shape, dtype=np.float64),
+            where=numBigrams > 0,
+        )
+        self.weightedBigrams = {}
 
     def getCharBigram(self, first, second):
         "probability of seeing character 'first' next to 'second'"
         first = first if first else " "  # map start to word beginning
         second = second if second else " "  # map end to word end
+        return self.bigramMatrix[self.classes.index(first), self.classes.index(second)]
 
-        # number of bigrams starting with given char
-        numBigrams = sum(self.bigram[first].values())
-        if numBigrams == 0:
-            return 0
-        return self.bigram[first][second] / numBigrams
+    def getBigramMatrix(self, lmFactor=1.0):
+        "bigram probabilities indexed by class id, raised to the power lmFactor"
+        if lmFactor not in self.weightedBigrams:
+            # Python's pow, so scores match applying the factor per lookup
+            self.weightedBigrams[lmFactor] = np.array(
+                [[p**lmFactor for p in row] for row in self.bigramMatrix.tolist()]
+            )
+        return self.weightedBigrams[lmFactor]
 
     def getWordList(self):
         "get list of unique words"
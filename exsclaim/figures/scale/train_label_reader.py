@@ -8,7 +8,7 @@ from torch import nn, optim
 from torchvision import transforms
 
 from ..models.crnn import CRNN
-from .ctc import ctcBeamSearch
+from .ctc import ctc_beam_search
 from .dataset import ScaleLabelDataset
 
 
@@ -282,14 +282,15 @@ def ctc_decoders(beamWidth, constrict_search, lm, postprocess):
 
     def ctc_search(matrix):
         ctc_inputs = torch.exp(matrix)
-        ctc_inputs = ctc_inputs.squeeze(0)
-        results = ctcBeamSearch(
+        ctc_inputs = ctc_inputs.squeeze(0).detach().cpu().numpy()
+        top_results = ctc_beam_search(
             ctc_inputs,
             classes=classes,
             lm=lm,
-            beamWidth=beamWidth,
-            constrict_search=constrict_search,
+            beam_width=beamWidth,
+            grammar=constrict_search,
         )
+        results = [labeling for labeling, _ in top_results]
         if postprocess:
             word = postprocess_ctc(results)
         else:
@@ -0,0 +1,192 @@
+"""Batched subfigure detection with aspect-ratio buckets
+
+Figures are resized so their long side is imgsize and padded to the next
+multiple of the model stride, the same rectangular letterbox YOLO uses for a
+single image. Figures whose padded shapes match are put in the same bucket,
+so a whole bucket is one rectangular batch with no extra padding. Figures
+are decoded by a pool of threads and bucketed on a background thread while
+the model runs, and each decoded FigureImage is passed on so later stages
+reuse its pixels.
+"""
+import collections
+import concurrent.futures
+import logging
+import queue
+import threading
+
+import cv2
+import numpy as np
+import torch
+
+from ..image import FigureImage
+
+logger = logging.getLogger(__name__)
+
+# Value YOLO pads letterboxed images with
+PAD_VALUE = 114
+
+
+def letterbox(image, imgsize=640, stride=32, rgb_to_bgr=False):
+    """Resize an image to fit imgsize and pad it to a multiple of stride
+
+    Args:
+        image (np.ndarray): HxWx3 uint8 image
+        imgsize (int): length of the long side after resizing
+        stride (int): padded height and width are multiples of stride
+        rgb_to_bgr (bool): if True, reverse the channels while padding
+    Returns:
+        padded (np.ndarray): resized and padded image
+        info (tuple): (ratio, left, top, height, width) to map boxes in
+            padded back to the height x width original image
+    """
+    height, width = image.shape[:2]
+    ratio = min(imgsize / height, imgsize / width)
+    new_height = int(round(height * ratio))
+    new_width = int(round(width * ratio))
+    padded_height = -(-new_height // stride) * stride
+    padded_width = -(-new_width // stride) * stride
+    top = int(round((padded_height - new_height) / 2 - 0.1))
+    left = int(round((padded_width - new_width) / 2 - 0.1))
+    if (new_height, new_width) != (height, width):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    if rgb_to_bgr:
+        image = image[:, :, ::-1]
+    padded = np.full((padded_height, padded_width, 3), PAD_VALUE, dtype=np.uint8)
+    padded[top : top + new_height, left : left + new_width] = image
+    return padded, (ratio, left, top, height, width)
+
+
+def bucketed_batches(
+    figure_paths, imgsize=640, stride=32, batch_size=16, prefetch=2, workers=2
+):
+    """Decode figures in the background and group them into batches
+
+    Args:
+        figure_paths (iterable): paths of the figures to batch
+        imgsize (int): length of the long side of the letterboxed figures
+        stride (int): model stride
+        batch_size (int): maximum number of figures in a batch
+        prefetch (int): number of batches prepared ahead of the consumer
+        workers (int): number of threads decoding figures
+    Yields:
+        (figures, images, infos): a batch of decoded FigureImages, their
+            letterboxed BGR images, which all have the same shape, and their
+            letterbox info. Figures that could not be decoded are yielded
+            alone as ([path], None, None)
+    """
+    batches = queue.Queue(maxsize=max(prefetch, 1))
+    done = object()
+    stop = threading.Event()
+    # cap on the figures held in partially filled buckets
+    max_pending = 4 * batch_size
+
+    def put(batch):
+        while not stop.is_set():
+            try:
+                batches.put(batch, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def decode(figure_path):
+        figure = FigureImage.open(figure_path)
+        image, info = letterbox(figure.rgb, imgsize, stride, rgb_to_bgr=True)
+        return figure, image, info
+
+    def decoded():
+        """Decode figures on the pool, keeping a few ahead, in input order"""
+        window = collections.deque()
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(workers, 1), thread_name_prefix="figure-decoder"
+        ) as decoders:
+            for figure_path in figure_paths:
+                window.append((figure_path, decoders.submit(decode, figure_path)))
+                if len(window) > 2 * workers:
+                    yield window.popleft()
+            while window:
+                yield window.popleft()
+
+    def load():
+        buckets = {}
+        pending = 0
+        try:
+            for figure_path, decoding in decoded():
+                if stop.is_set():
+                    return
+                try:
+                    figure, image, info = decoding.result()
+                except Exception:
+                    logger.exception("Could not read figure {}".format(figure_path))
+                    put(([figure_path], None, None))
+                    continue
+                bucket = buckets.setdefault(image.shape, ([], [], []))
+                for items, item in zip(bucket, (figure, image, info)):
+                    items.append(item)
+                pending += 1
+                if len(bucket[0]) == batch_size:
+                    put(buckets.pop(image.shape))
+                    pending -= batch_size
+                elif pending >= max_pending:
+                    # release the fullest bucket to bound memory use
+                    shape = max(buckets, key=lambda shape: len(buckets[shape][0]))
+                    pending -= len(buckets[shape][0])
+                    put(buckets.pop(shape))
+            for bucket in buckets.values():
+                put(bucket)
+        finally:
+            put(done)
+
+    loader = threading.Thread(target=load, daemon=True)
+    loader.start()
+    try:
+        while True:
+            batch = batches.get()
+            if batch is done:
+                break
+            yield batch
+    finally:
+        stop.set()
+        loader.join()
+
+
+def to_image_pixels(detections, info):
+    """Map boxes from letterboxed to original image pixels
+
+    Args:
+        detections (torch.Tensor): Nx6 tensor of x1, y1, x2, y2, confidence,
+            class in letterboxed pixels, as in ultralytics Boxes.data
+        info (tuple): letterbox info of the image from letterbox()
+    Returns:
+        detections (np.ndarray): Nx6 float array in the same order.
+            Coordinates are truncated to integers and clipped to the image
+    """
+    ratio, left, top, height, width = info
+    detections = detections.clone()
+    offset = detections.new_tensor([left, top, left, top])
+    detections[:, :4] = ((detections[:, :4] - offset) / ratio).trunc()
+    low = detections.new_tensor([0, 0, 0, 0])
+    high = detections.new_tensor([width - 1, height - 1, width, height])
+    detections[:, :4] = torch.maximum(torch.minimum(detections[:, :4], high), low)
+    return detections.cpu().numpy()
+
+
+def best_box_per_class(detections, info):
+    """Keep the most confident box of each class, in original image pixels
+
+    Args:
+        detections (torch.Tensor): Nx6 tensor of x1, y1, x2, y2, confidence,
+            class in letterboxed pixels, as in ultralytics Boxes.data
+        info (tuple): letterbox info of the image from letterbox()
+    Returns:
+        best (np.ndarray): Kx6 float array with one row per class, ordered
+            by decreasing confidence. Coordinates are truncated to integers
+            and clipped to the image
+    """
+    if len(detections) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+    detections = detections[detections[:, 4].argsort(descending=True)]
+    classes, inverse = torch.unique(detections[:, 5], return_inverse=True)
+    positions = torch.arange(len(detections), device=detections.device)
+    first = torch.full_like(classes, len(detections), dtype=torch.long)
+    first = first.scatter_reduce(0, inverse, positions, reduce="amin")
+    return to_image_pixels(detections[first.sort().values], info)
@@ -0,0 +1,111 @@
+"""Encode and save subfigure crops on a pool of background threads"""
+import concurrent.futures
+import logging
+import threading
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# File extension of each supported crop format
+EXTENSIONS = {"png": ".png", "webp": ".webp"}
+
+
+class CropWriter:
+    """Pool of threads that encode and save crops
+
+    Crops are saved in the order they are submitted to each worker, and a
+    figure counts as written once every crop submitted for it is on disk.
+    The threads are started by the first write after the writer is created
+    or closed.
+
+    Args:
+        workers (int): number of writer threads
+        image_format (str): "png", or "webp" for lossless WebP
+        compress_level (int): PNG zlib compression level from 0 (fastest)
+            to 9 (smallest). For WebP, the effort from 0 to 6
+        max_pending (int): most crops waiting to be written before write
+            blocks, to bound memory use
+    """
+
+    def __init__(self, workers=2, image_format="png", compress_level=6, max_pending=64):
+        if image_format not in EXTENSIONS:
+            raise ValueError(
+                "Unknown crop format {}. Choose from {}".format(
+                    image_format, sorted(EXTENSIONS)
+                )
+            )
+        self.image_format = image_format
+        self.extension = EXTENSIONS[image_format]
+        self.compress_level = compress_level
+        self.workers = max(workers, 1)
+        self.executor = None
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def _save(self, pixels, path):
+        """Encode pixels and save them to path"""
+        try:
+            image = Image.fromarray(np.ascontiguousarray(pixels))
+            if self.image_format == "webp":
+                image.save(path, lossless=True, method=min(self.compress_level, 6))
+            else:
+                image.save(path, compress_level=self.compress_level)
+        finally:
+            self.slots.release()
+
+    def write(self, figure_name, pixels, path):
+        """Queue a crop to be saved
+
+        Args:
+            figure_name (str): figure the crop belongs to
+            pixels (np.ndarray): HxWx3 uint8 RGB crop. It must not be
+                modified until it is written
+            path (pathlib.Path): path to save to, its suffix is replaced by
+                the writer's extension
+        Returns:
+            path (pathlib.Path): the path the crop is saved to
+        """
+        path = path.with_suffix(self.extension)
+        self.slots.acquire()
+        with self.lock:
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="crop-writer"
+                )
+            future = self.executor.submit(self._save, pixels, path)
+            self.futures.setdefault(figure_name, []).append(future)
+        return path
+
+    def written(self, figure_name, wait=False):
+        """Check if every crop of a figure has been written
+
+        Args:
+            figure_name (str): name of the figure
+            wait (bool): if True, block until the figure's crops are written
+        Returns:
+            written (bool or None): True if all crops were saved, False if
+                any failed, or None if some are still being written
+        """
+        with self.lock:
+            futures = self.futures.get(figure_name, [])
+            if not wait and not all(future.done() for future in futures):
+                return None
+            self.futures.pop(figure_name, None)
+        written = True
+        for future in futures:
+            try:
+                future.result()
+            except Exception:
+                logger.exception("Could not save a crop of {}".format(figure_name))
+                written = False
+        return written
+
+    def close(self):
+        """Wait for queued crops to be written and stop the threads"""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
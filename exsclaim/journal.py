@@ -4,17 +4,10 @@ import logging
 import math
 import os
 import pathlib
-import random
-import shutil
-import time
-import urllib.request
+import re
 from abc import ABC, abstractmethod
 from datetime import datetime
-import cv2
-from PIL import Image
 import bs4
-import numpy as np
-import requests
 from dateutil.relativedelta import relativedelta
 
 try:
@@ -25,6 +18,7 @@ try:
     from selenium.webdriver.chrome.service import Service
     from selenium.webdriver.support.ui import WebDriverWait
     from selenium.webdriver.common.by import By
+    from selenium.common.exceptions import TimeoutException
     from selenium.webdriver.support import expected_conditions as EC
 
 except ImportError:
@@ -32,7 +26,18 @@ except ImportError:
 
 from bs4 import BeautifulSoup
 
-from .utilities import paths
+from .utilities import http, ledger, paths, shard
+
+# meta tags that hold an article's publication date, in order of preference
+PUBLICATION_DATE_TAGS = (
+    "citation_publication_date",
+    "citation_online_date",
+    "dc.date",
+    "prism.publicationDate",
+    "citation_date",
+)
+# most article names kept in a query's watermark
+MAX_WATERMARK_ARTICLES = 1000
 
 
 class JournalFamily(ABC):
@@ -64,6 +69,12 @@ class JournalFamily(ABC):
     efforts are not duplicated and submit a PR upon completion. Thanks!
     """
 
+    # whether several articles can be scraped at once by separate threads
+    concurrent_articles = True
+    # whether get_additional_url_arguments reads the first page of results.
+    # If not, that page is not fetched
+    additional_arguments_use_soup = True
+
     # journal attributes -- these must be defined for each journal
     # family based on the explanations provided here
     @property
@@ -169,24 +180,43 @@ class JournalFamily(ABC):
         self.search_query = search_query
         self.open = search_query.get("open", False)
         self.order = search_query.get("order", "relevant")
+        # incremental crawls read results newest first, where possible, and
+        # stop at the first page with an article seen before
+        self.incremental = search_query.get("incremental", False)
+        if self.incremental and "recent" in self.order_values:
+            self.order = "recent"
         self.logger = logging.getLogger(__name__)
+        # shared connection pools and download threads
+        self.fetch = http.get_engine(search_query)
         # Set up file structure
         base_results_dir = paths.initialize_results_dir(
             self.search_query.get("results_dirs", None)
         )
-        self.results_directory = base_results_dir / self.search_query["name"]
+        self.results_directory = base_results_dir / shard.shard_name(self.search_query)
         figures_directory = self.results_directory / "figures"
         os.makedirs(figures_directory, exist_ok=True)
 
-        # Check if any articles have already been scraped by checking
-        # results_dir/_articles
-        articles_visited = {}
-        articles_file = self.results_directory / "_articles"
-        if os.path.isfile(articles_file):
-            with open(articles_file, "r") as f:
-                contents = f.readlines()
-            articles_visited = {a.strip() for a in contents}
-        self.articles_visited = articles_visited
+        # Check if any articles have already been scraped
+        self.articles_visited = ledger.get_ledger(self.results_directory).completed(
+            ledger.JOURNAL_SCRAPER
+        )
+        # and, in incremental mode, which articles the last run saw
+        self.watermark_key = json.dumps(
+            {
+                "journal_family": search_query.get("journal_family"),
+                "query": search_query.get("query"),
+                "open": self.open,
+            },
+            sort_keys=True,
+        )
+        self.watermark = {"newest": None, "articles": []}
+        if self.incremental:
+            self.watermark = ledger.get_ledger(self.results_directory).watermark(
+                self.watermark_key
+            )
+            self.articles_visited |= set(self.watermark["articles"])
+        # publication dates of the articles scraped, by article name
+        self.publication_dates = {}
 
     # Helper Methods for retrieving relevant article URLS
 
@@ -275,22 +305,9 @@ class JournalFamily(ABC):
         Returns:
             A BeautifulSoup parse tree.
         """
-        headers = {
-            "Accept": (
-                "text/html,application/xhtml+xml,application/xml;"
-                "q=0.9,image/webp,*/*;q=0.8"
-            ),
-            "Accept-Language": "en-US,en;q=0.5",
-            "Upgrade-Insecure-Requests": "1",
-            "User-Agent": (
-                "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:82.0)"
-                " Gecko/20100101 Firefox/82.0"
-            ),
-        }
-        wait_time = float(random.randint(0, 50))
-        time.sleep(wait_time / float(10))
-        with requests.Session() as session:
-            r = session.get(url, headers=headers)
+        # search results change sooner than articles do
+        ttl = self.fetch.search_ttl if self.search_path in url else None
+        r = self.fetch.get(url, ttl=ttl)
         soup = BeautifulSoup(r.text, "lxml")
         return soup
 
@@ -305,7 +322,6 @@ class JournalFamily(ABC):
         """
         return figure_subtree.find_all("p")
 
-    @abstractmethod
     def save_figure(self, figure_name: str, image_url: str):
         """
         Saves figure at img_url to local machine
@@ -314,11 +330,14 @@ class JournalFamily(ABC):
             img_url: url to image
         """
         figures_directory = self.results_directory / "figures"
-        response = requests.get(image_url, stream=True)
-        figure_path = figures_directory / figure_name
-        with open(figure_path, "wb") as out_file:
-            shutil.copyfileobj(response.raw, out_file)
-        del response
+        self.fetch.download(image_url, figures_directory / figure_name)
+
+    def save_figures(self, figures: dict):
+        """Saves several figures at once on the fetch engine's threads
+        Args:
+            figures: names of figures mapped to their image urls
+        """
+        self.fetch.map(self.save_figure, figures.keys(), figures.values())
 
     @abstractmethod
     def get_figure_url(self, figure_subtree: BeautifulSoup) -> str:
@@ -332,10 +351,85 @@ class JournalFamily(ABC):
         image_url = image_tag.get("src")
         return self.prepend + image_url
 
-    def get_search_query_urls(self) -> list:
-        """Create list of search query urls based on input query json
+    def get_date_range(self, since: str) -> str:
+        """Value of date_range_param for results published since a date
+        Args:
+            since: a date as YYYY-MM-DD, or None for no limit
         Returns:
-            A list of urls (as strings)
+            the date range, or "" if the journal family cannot filter by date
+        """
+        return ""
+
+    def get_publication_date(self, soup: BeautifulSoup) -> str:
+        """Find an article's publication date in its meta tags
+        Args:
+            soup: the article's page
+        Returns:
+            the date as YYYY-MM-DD, or None if the page does not give it
+        """
+        for name in PUBLICATION_DATE_TAGS:
+            tag = soup.find("meta", attrs={"name": name, "content": True})
+            if tag is None:
+                continue
+            match = re.search(r"(\d{4})[-/](\d{1,2})[-/](\d{1,2})", tag["content"])
+            if match:
+                return "{}-{:0>2}-{:0>2}".format(*match.groups())
+        return None
+
+    def record_publication_date(self, url: str, soup: BeautifulSoup):
+        """Remember an article's publication date for its query's watermark
+        Args:
+            url: the url of the article
+            soup: the article's page
+        """
+        self.publication_dates[url.split("/")[-1]] = self.get_publication_date(soup)
+
+    def update_watermark(self, article_paths: list):
+        """Save the newest articles scraped, in incremental mode
+        Args:
+            article_paths: url paths of the articles scraped successfully
+        """
+        if not self.incremental:
+            return
+        dates = {
+            path.split("/")[-1]: self.publication_dates.get(path.split("/")[-1])
+            for path in article_paths
+        }
+        known = [date for date in dates.values() if date]
+        if self.watermark["newest"]:
+            known.append(self.watermark["newest"])
+        newest = max(known, default=None)
+        # newest first, then the articles of earlier runs
+        articles = sorted(dates, key=lambda name: dates[name] or "", reverse=True)
+        articles += [name for name in self.watermark["articles"] if name not in dates]
+        self.watermark = {
+            "newest": newest,
+            "articles": articles[:MAX_WATERMARK_ARTICLES],
+        }
+        ledger.get_ledger(self.results_directory).set_watermark(
+            self.watermark_key, newest, self.watermark["articles"]
+        )
+
+    def get_search_soup(self, search_url: str) -> BeautifulSoup:
+        """Get the first page of results of a search
+        Args:
+            search_url: url of the search, without additional arguments
+        Returns:
+            A BeautifulSoup parse tree, for get_additional_url_arguments
+        """
+        return self.get_soup_from_request(search_url)
+
+    def generate_search_query_urls(self):
+        """Lazily generate search query urls based on input query json
+
+        Urls are made one term combination at a time, as they are consumed,
+        and the first page of results of a combination is only fetched if
+        get_additional_url_arguments needs it. Urls with the same
+        parameters as an earlier url are skipped. Incremental crawls make
+        one url per term combination, for the newest results published
+        since the watermark.
+        Yields:
+            urls (as strings)
         """
         search_query = self.search_query
         # creates a list of search terms
@@ -344,37 +438,48 @@ class JournalFamily(ABC):
             + search_query["query"][key].get("synonyms", [])
             for key in search_query["query"]
         ]
-        search_product = list(itertools.product(*search_list))
-
-        search_urls = []
-        for term in search_product:
+        seen = set()
+        for term in itertools.product(*search_list):
             url_parameters = "&".join(
                 [self.term_param + self.join.join(term), self.max_page_size]
             )
             search_url = self.domain + self.search_path + self.pub_type + url_parameters
             if self.open:
                 search_url += "&" + self.open_param + "&"
-            soup = self.get_soup_from_request(search_url)
-            years, journal_codes, orderings = self.get_additional_url_arguments(soup)
-            search_url_args = []
-
-            for year_value in years:
-                year_param = self.date_range_param + year_value
-                for journal_value in journal_codes:
-                    for order_value in orderings:
-                        args = "&".join(
-                            [
-                                year_param,
-                                self.journal_param + journal_value,
-                                self.order_param + order_value,
-                            ]
-                        )
-                        search_url_args.append(args)
-            search_term_urls = [search_url + url_args for url_args in search_url_args]
-            search_urls += search_term_urls
-            # search_urls += 'https://www.nature.com/search?q=electrochromic%20polymer&date_range=&journal=&order=relevance&author=reynolds'
-        # print('search url', search_urls)
-        return search_urls
+            if self.incremental:
+                years = [self.get_date_range(self.watermark["newest"])]
+                journal_codes = [""]
+                orderings = [self.order_values.get(self.order, "")]
+            else:
+                soup = None
+                if self.additional_arguments_use_soup:
+                    soup = self.get_search_soup(search_url)
+                years, journal_codes, orderings = self.get_additional_url_arguments(
+                    soup
+                )
+            for year_value, journal_value, order_value in itertools.product(
+                years, journal_codes, orderings
+            ):
+                args = "&".join(
+                    [
+                        self.date_range_param + year_value,
+                        self.journal_param + journal_value,
+                        self.order_param + order_value,
+                    ]
+                )
+                url = search_url + args
+                canonical = http.canonical_url(url)
+                if canonical in seen:
+                    continue
+                seen.add(canonical)
+                yield url
+
+    def get_search_query_urls(self) -> list:
+        """Create list of search query urls based on input query json
+        Returns:
+            A list of urls (as strings)
+        """
+        return list(self.generate_search_query_urls())
 
     def get_articles_from_search_url(self, search_url: str) -> list:
         """Generates a list of articles from a single search term"""
@@ -383,6 +488,7 @@ class JournalFamily(ABC):
         soup = self.get_soup_from_request(search_url)
         start_page, stop_page, total_articles = self.get_page_info(soup)
         article_paths = set()
+        reached_known = False
         for page_number in range(start_page, stop_page + 1):
             for tag in soup.find_all("a", href=True):
                 url = tag.attrs["href"]
@@ -393,15 +499,20 @@ class JournalFamily(ABC):
                 ):
                     # The url does not point to an article
                     continue
-                if url.split("/")[-1] in self.articles_visited or (
-                    self.open and not self.is_link_to_open_article(tag)
-                ):
+                if url.split("/")[-1] in self.articles_visited:
+                    # It is an article we have already seen
+                    reached_known = True
+                    continue
+                if self.open and not self.is_link_to_open_article(tag):
                     # It is an article but we are not interested
                     continue
                 self.logger.debug("Candidate Article: PASS")
                 article_paths.add(url)
                 if len(article_paths) >= max_scraped:
                     return article_paths
+            if self.incremental and reached_known:
+                # results are newest first, so later pages were seen before
+                break
             # Get next page at end of loop since page 1 is obtained from
             # search_url
             soup = self.turn_page(search_url, page_number + 1)
@@ -410,10 +521,10 @@ class JournalFamily(ABC):
 
     def get_article_extensions(self) -> list:
         """Retrieves a list of article url paths from a search query"""
-        # This returns urls based on the combinations of desired search terms.
-        search_query_urls = self.get_search_query_urls()
+        # Search urls are only made, and searched, until enough articles
+        # are found
         article_paths = set()
-        for search_url in search_query_urls:
+        for search_url in self.generate_search_query_urls():
             new_article_paths = self.get_articles_from_search_url(search_url)
             article_paths.update(new_article_paths)
             if len(article_paths) >= self.search_query["maximum_scraped"]:
@@ -429,6 +540,7 @@ class JournalFamily(ABC):
         """
         soup = self.get_soup_from_request(url)
         is_open, license = self.get_license(soup)
+        self.record_publication_date(url, soup)
 
         # Uncomment to save html
         html_directory = self.results_directory / "html"
@@ -442,6 +554,7 @@ class JournalFamily(ABC):
         self.logger.info(len(figure_subtrees))
         figure_number = 1
         article_json = {}
+        figure_urls = {}
 
         for figure_subtree in figure_subtrees:
             captions = self.find_captions(figure_subtree)
@@ -489,13 +602,16 @@ class JournalFamily(ABC):
             }
             # add all results
             article_json[figure_name] = figure_json
-            self.save_figure(figure_name, image_url)
+            figure_urls[figure_name] = image_url
             # increment index
             figure_number += 1
+        self.save_figures(figure_urls)
         return article_json
 
 
 class JournalFamilyDynamic(JournalFamily):
+    # articles are loaded in one shared Selenium driver, one at a time
+    concurrent_articles = False
 
     def __init__(self, search_query: dict):        
         """creates an instance of a journal family search using a query
@@ -506,29 +622,7 @@ class JournalFamilyDynamic(JournalFamily):
             and the webdriver for dynamic webpages
         """
         super().__init__(search_query)
-        self.search_query = search_query
-        self.open = search_query.get("open", False)
-        self.order = search_query.get("order", "relevant")
-        self.logger = logging.getLogger(__name__)
-        # Set up file structure
-        base_results_dir = paths.initialize_results_dir(
-            self.search_query.get("results_dirs", None)
-        )
-        self.results_directory = base_results_dir / self.search_query["name"]
-        figures_directory = self.results_directory / "figures"
-        os.makedirs(figures_directory, exist_ok=True)
 
-        # Check if any articles have already been scraped by checking
-        # results_dir/_articles
-        articles_visited = {}
-        articles_file = self.results_directory / "_articles"
-        if os.path.isfile(articles_file):
-            with open(articles_file, "r") as f:
-                contents = f.readlines()
-            articles_visited = {a.strip() for a in contents}
-        self.articles_visited = articles_visited       
-        
-        
         # initiallize the selenium-stealth 
         options = Options()
         options.add_argument('--headless')
@@ -549,72 +643,59 @@ class JournalFamilyDynamic(JournalFamily):
                 )
 
 
-    def get_search_query_urls(self) -> list:
-        """Create list of search query urls based on input query json
+    def wait_for_new_page(self, page_source: str, timeout: float = 10):
+        """Wait until a click has changed the page loaded in the driver
+        Args:
+            page_source: the driver's page source before the click
+            timeout: seconds after which to stop waiting
+        """
+        try:
+            WebDriverWait(self.driver, timeout).until(
+                lambda driver: driver.page_source != page_source
+            )
+        except TimeoutException:
+            self.logger.warning("Page did not change after {} s".format(timeout))
 
+    def render_page(self, url: str, driver=None) -> BeautifulSoup:
+        """Load a page in a Selenium driver, through the fetch engine's cache
+        Args:
+            url: url of the page
+            driver: the driver to load it in, by default self.driver
         Returns:
-            A list of urls (as strings)
+            A BeautifulSoup parse tree of the page source. The driver is not
+            on the page if it came from the cache
         """
-        search_query = self.search_query
-        # creates a list of search terms
-        search_list = [
-            [search_query["query"][key]["term"]]
-            + search_query["query"][key].get("synonyms", [])
-            for key in search_query["query"]
-        ]
-        #print('search list',search_list)
-        search_product = list(itertools.product(*search_list))
-        # print('search_product',search_product)
-        
+        driver = driver or self.driver
 
-        search_urls = []
-        for term in search_product:
-            url_parameters = "&".join(
-                [self.term_param + self.join.join(term), self.max_page_size]
-            )
-            search_url = self.domain + self.search_path + self.pub_type + url_parameters
-            if self.open:
-                search_url += "&" + self.open_param + "&"
-            # print('search_url',search_url)
-            self.driver.get(search_url)
-            wait_time = float(random.randint(0, 50))
-            time.sleep(wait_time / float(10))
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-             
-            years, journal_codes, orderings = self.get_additional_url_arguments(soup)
-            search_url_args = []
-
-            for year_value in years:
-                year_param = self.date_range_param + year_value
-                for journal_value in journal_codes:
-                    for order_value in orderings:
-                        args = "&".join(
-                            [
-                                year_param,
-                                self.journal_param + journal_value,
-                                self.order_param + order_value,
-                            ]
-                        )
-                        search_url_args.append(args)
-            search_term_urls = [search_url + url_args for url_args in search_url_args]
-            search_urls += search_term_urls
-        
-        
-        return search_urls
+        def load(url):
+            driver.get(url)
+            return driver.page_source
+
+        return BeautifulSoup(self.fetch.render(url, load).text, 'html.parser')
+
+    def get_search_soup(self, search_url: str) -> BeautifulSoup:
+        """Get the first page of results of a search in the driver
+        Args:
+            search_url: url of the search, without additional arguments
+        Returns:
+            A BeautifulSoup parse tree, for get_additional_url_arguments
+        """
+        self.fetch.throttle(search_url)
+        self.driver.get(search_url)
+        return BeautifulSoup(self.driver.page_source, 'html.parser')
 
 
     def get_articles_from_search_url(self, search_url: str) -> list:
         """Generates a list of articles from a single search term"""
         max_scraped = self.search_query["maximum_scraped"]
         self.logger.info("GET request: {}".format(search_url))
+        self.fetch.throttle(search_url)
         self.driver.get(search_url)
-        
-        wait_time = float(random.randint(0, 50))
-        time.sleep(wait_time / float(10))
         #self.driver.close()
         start_page, stop_page, total_articles = self.get_page_info(search_url)
         #print('search url', search_url)
         article_paths = set()
+        reached_known = False
         soup = BeautifulSoup(self.driver.page_source, 'html.parser')
         #raise NameError(
         #        "journal family {0} is not defined"
@@ -636,9 +717,11 @@ class JournalFamilyDynamic(JournalFamily):
                 #):
                 #    # The url does not point to an article
                 #    continue
-                if url.split("/")[-1] in self.articles_visited or (
-                    self.open and not self.is_link_to_open_article(tag)
-                ):
+                if url.split("/")[-1] in self.articles_visited:
+                    # It is an article we have already seen
+                    reached_known = True
+                    continue
+                if self.open and not self.is_link_to_open_article(tag):
                     # It is an article but we are not interested
                     continue
                 #self.logger.debug("Candidate Article: PASS")
@@ -648,6 +731,9 @@ class JournalFamilyDynamic(JournalFamily):
                     article_paths.add(url)
                 if len(article_paths) >= max_scraped:
                     return article_paths
+            if self.incremental and reached_known:
+                # results are newest first, so later pages were seen before
+                break
             # Get next page at end of loop since page 1 is obtained from
             # search_url
             search_url = self.turn_page(search_url, page_number + 1)
@@ -655,19 +741,6 @@ class JournalFamilyDynamic(JournalFamily):
         #print(article_paths)
         return article_paths
 
-    def get_article_extensions(self) -> list:
-        """Retrieves a list of article url paths from a search query"""
-        # This returns urls based on the combinations of desired search terms.
-        search_query_urls = self.get_search_query_urls()
-        article_paths = set()
-        for search_url in search_query_urls:
-            new_article_paths = self.get_articles_from_search_url(search_url)
-            article_paths.update(new_article_paths)
-            if len(article_paths) >= self.search_query["maximum_scraped"]:
-                break
-        return list(article_paths)
-
-
     def get_article_figures(self, url: str) -> dict:
         """
         Get all figures from an article 
@@ -677,11 +750,9 @@ class JournalFamilyDynamic(JournalFamily):
             A dict of figure_jsons from an article
         """
 
-        self.driver.get(url)
-        wait_time = float(random.randint(0, 50))
-        time.sleep(wait_time / float(10))
-        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+        soup = self.render_page(url)
         is_open, license = self.get_license(soup)
+        self.record_publication_date(url, soup)
 
         html_directory = self.results_directory / "html"
         os.makedirs(html_directory, exist_ok=True)
@@ -691,6 +762,7 @@ class JournalFamilyDynamic(JournalFamily):
         figure_list = self.get_figure_list(url)
         figures = 1
         article_json = {}
+        figure_urls = {}
 
         # for figure in soup.find_all('figure'):
         for figure in figure_list:
@@ -737,7 +809,7 @@ class JournalFamilyDynamic(JournalFamily):
             figure_json["open"] = is_open
 
             # save figure as image
-            self.save_figure(figure_name, image_url)
+            figure_urls[figure_name] = image_url
             figure_path = (
                 pathlib.Path(self.search_query["name"]) / "figures" / figure_name
             )
@@ -756,6 +828,7 @@ class JournalFamilyDynamic(JournalFamily):
             article_json[figure_name] = figure_json
             # increment index
             figures += 1
+        self.save_figures(figure_urls)
         return article_json
 
     def get_figure_list(self, url):
@@ -767,10 +840,7 @@ class JournalFamilyDynamic(JournalFamily):
             A list of all figures in the article as BeaustifulSoup Tag objects
         """
 
-        self.driver.get(url)
-        wait_time = float(random.randint(0, 50))
-        time.sleep(wait_time / float(10))
-        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+        soup = self.render_page(url)
         figure_list = [a for a in soup.find_all('figure') if str(a).find(self.extra_key)>-1]
         return figure_list
 
@@ -809,8 +879,9 @@ class ACS(JournalFamilyDynamic):
     extra_key = "inline-fig internalNav"
     articles_path_length = 3
     max_query_results = 1000
-    
-        
+    # the search arguments do not depend on the results
+    additional_arguments_use_soup = False
+
     def get_page_info(self, url):
         options = Options()
         options.add_argument('--headless')
@@ -830,9 +901,8 @@ class ACS(JournalFamilyDynamic):
               renderer="Intel Iris OpenGL Engine",
               fix_hairline=True,
               )
+        self.fetch.throttle(url)
         driver.get(url)
-        wait_time = float(random.randint(0, 50))
-        time.sleep(wait_time / float(10))
       
         soup = BeautifulSoup(driver.page_source, 'html.parser')
         driver.close()
@@ -872,14 +942,14 @@ class ACS(JournalFamilyDynamic):
                   fix_hairline=True,
                   )
 
+            self.fetch.throttle(url)
             driver.get(url)
             soup = BeautifulSoup(driver.page_source, 'html.parser')
           
-            wait_time = float(random.randint(0, 50))
-            time.sleep(wait_time / float(10))
             start_page, stop_page, total_articles = self.get_page_info(url)
 
             article_paths = set()
+            reached_known = False
             
             #raise NameError(
             #        "journal family {0} is not defined"
@@ -901,9 +971,11 @@ class ACS(JournalFamilyDynamic):
                     #):
                     #    # The url does not point to an article
                     #    continue
-                    if url.split("/")[-1] in self.articles_visited or (
-                        self.open and not self.is_link_to_open_article(tag)
-                    ):
+                    if url.split("/")[-1] in self.articles_visited:
+                        # It is an article we have already seen
+                        reached_known = True
+                        continue
+                    if self.open and not self.is_link_to_open_article(tag):
                         # It is an article but we are not interested
                         continue
                     #self.logger.debug("Candidate Article: PASS")
@@ -913,9 +985,13 @@ class ACS(JournalFamilyDynamic):
                         article_paths.add(url)
                     if len(article_paths) >= max_scraped:
                         return article_paths
+                if self.incremental and reached_known:
+                    # results are newest first, so later pages were seen before
+                    break
                 # Get next page at end of loop since page 1 is obtained from
                 # search_url
                 search_url = self.turn_page(url, page_number + 1)
+                self.fetch.throttle(search_url)
                 driver.get(search_url)
                 soup = BeautifulSoup(driver.page_source, 'html.parser')
             return article_paths
@@ -929,6 +1005,10 @@ class ACS(JournalFamilyDynamic):
         Returns:
             A dict of figure_jsons from an article
         """
+        import cv2
+        import numpy as np
+        from PIL import Image
+
         options = webdriver.ChromeOptions() 
         options.add_argument("--no-sandbox") #bypass OS security model
         options.add_argument("--disable-dev-shm-usage") #overcome limited resource problems
@@ -945,12 +1025,10 @@ class ACS(JournalFamilyDynamic):
               fix_hairline=True,
               )
               
-        driver.get(url)
-        wait_time = float(random.randint(0, 50))
-        time.sleep(wait_time / float(10))
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
+        soup = self.render_page(url, driver)
         # print('soup', soup)
         is_open, license = self.get_license(soup)
+        self.record_publication_date(url, soup)
 
         html_directory = self.results_directory / "html"
         os.makedirs(html_directory, exist_ok=True)
@@ -1066,8 +1144,13 @@ class ACS(JournalFamilyDynamic):
             print('out_file', out_file)
             #urllib.request.urlretrieve(image_url, out_file)
             print('image_url', image_url)
-            driver.get(image_url)
-            driver.save_screenshot(out_file)
+
+            def screenshot(image_url):
+                driver.get(image_url)
+                return driver.get_screenshot_as_png()
+
+            with open(out_file, "wb") as file:
+                file.write(self.fetch.render(image_url, screenshot).content)
             # Load the image
             img = cv2.imread(figure_path, cv2.IMREAD_UNCHANGED)
 
@@ -1159,9 +1242,7 @@ class ACS(JournalFamilyDynamic):
               renderer="Intel Iris OpenGL Engine",
               fix_hairline=True,
               )
-        driver.get(url)
-        time.sleep(2)
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
+        soup = self.render_page(url, driver)
         figure_list = [a for a in soup.find_all('figure') if str(a).find(self.extra_key)>-1]
         return figure_list
 
@@ -1242,6 +1323,8 @@ class Nature(JournalFamily):
     prepend = ""
     extra_key = " "
     max_query_results = 1000
+    # the search arguments do not depend on the results
+    additional_arguments_use_soup = False
 
     def find_captions(self, figure_subtree: BeautifulSoup):
         return super().find_captions(figure_subtree)
@@ -1291,6 +1374,12 @@ class Nature(JournalFamily):
         except: 
             pass
 
+    def get_date_range(self, since):
+        if not since:
+            return ""
+        # nature filters by whole years
+        return "{}-{}".format(since[:4], datetime.now().year)
+
     def get_additional_url_arguments(self, soup):
         current_year = datetime.now().year
         earliest_year = 1845
@@ -1387,12 +1476,13 @@ class RSC(JournalFamilyDynamic):
         "recent": "Latest to oldest",
     }
     articles_path = "/doi/"
-
+    # the search arguments do not depend on the results
+    additional_arguments_use_soup = False
 
     def get_page_info(self, url):  
 
+        self.fetch.throttle(url)
         self.driver.get(url)
-        time.sleep(2)
         soup = BeautifulSoup(self.driver.page_source, 'html.parser')
         possible_entries = [a.strip("\n") for a in soup.find(class_="fixpadv--l pos--left pagination-summary").text.strip().split(" ") if a.strip("\n").isdigit()]
         #print(possible_entries)
@@ -1418,14 +1508,13 @@ class RSC(JournalFamilyDynamic):
         """Generates a list of articles from a single search term"""
         max_scraped = self.search_query["maximum_scraped"]
         #self.logger.info("GET request: {}".format(search_url))
+        self.fetch.throttle(search_url)
         self.driver.get(search_url)
-        
-        wait_time = float(random.randint(0, 50))
-        time.sleep(wait_time / float(10))
         #self.driver.close()
         start_page, stop_page, total_articles = self.get_page_info(search_url)
         #print('search url', search_url)
         article_paths = set()
+        reached_known = False
         soup = BeautifulSoup(self.driver.page_source, 'html.parser')
 
         for page_number in range(start_page, stop_page + 1):
@@ -1434,9 +1523,11 @@ class RSC(JournalFamilyDynamic):
             for tag in soup.find_all("a", href=True):
                 url = tag.attrs['href']
                 url = url.split('?page=search')[0]
-                if url.split("/")[-1] in self.articles_visited or (
-                    self.open and not self.is_link_to_open_article(tag)
-                ):
+                if url.split("/")[-1] in self.articles_visited:
+                    # It is an article we have already seen
+                    reached_known = True
+                    continue
+                if self.open and not self.is_link_to_open_article(tag):
                     # It is an article but we are not interested
                     continue
                 #self.logger.debug("Candidate Article: PASS")
@@ -1446,14 +1537,18 @@ class RSC(JournalFamilyDynamic):
                     article_paths.add(url)
                 if len(article_paths) >= max_scraped:
                     return article_paths
+            if self.incremental and reached_known:
+                # results are newest first, so later pages were seen before
+                break
             # Get next page at end of loop since page 1 is obtained from
             # search_url
             #search_url = self.turn_page(search_url, page_number + 1)
             #try:
             element = self.driver.find_element(By.CSS_SELECTOR, ".paging__btn.paging__btn--next")
-            time.sleep(10)            
+            self.fetch.throttle(search_url)
+            page_source = self.driver.page_source
             self.driver.execute_script("arguments[0].click();", element)
-            time.sleep(10)   
+            self.wait_for_new_page(page_source)
             soup = BeautifulSoup(self.driver.page_source, 'html.parser')
         return article_paths
 
@@ -1504,11 +1599,6 @@ class RSC(JournalFamilyDynamic):
     def find_captions(self, figure):
         return figure.find_all("span", class_="graphic_title")
 
-    def save_figure(self, figure_name, image_url):
-        figures_directory = self.results_directory / "figures"
-        out_file = figures_directory / figure_name
-        urllib.request.urlretrieve(image_url, out_file)
-
     def get_license(self, soup):
         """ Checks the article license and whether it is open access 
         Args:
@@ -1545,11 +1635,9 @@ class RSC(JournalFamilyDynamic):
             A dict of figure_jsons from an article
         """
 
-        self.driver.get(url)
-        wait_time = float(random.randint(0, 50))
-        time.sleep(wait_time / float(10))
-        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+        soup = self.render_page(url)
         is_open, license = self.get_license(soup)
+        self.record_publication_date(url, soup)
 
         html_directory = self.results_directory / "html"
         os.makedirs(html_directory, exist_ok=True)
@@ -1559,6 +1647,7 @@ class RSC(JournalFamilyDynamic):
         figure_list = self.get_figure_list(url)
         figures = 1
         article_json = {}
+        figure_urls = {}
 
         # for figure in soup.find_all('figure'):
         for figure in figure_list:
@@ -1604,7 +1693,7 @@ class RSC(JournalFamilyDynamic):
             figure_json["open"] = is_open
 
             # save figure as image
-            self.save_figure(figure_name, image_url)
+            figure_urls[figure_name] = image_url
             figure_path = (
                 pathlib.Path(self.search_query["name"]) / "figures" / figure_name
             )
@@ -1623,6 +1712,7 @@ class RSC(JournalFamilyDynamic):
             article_json[figure_name] = figure_json
             # increment index
             figures += 1
+        self.save_figures(figure_urls)
         return article_json    
 
 
@@ -1646,6 +1736,8 @@ class Wiley(JournalFamily):
     prepend = "https://onlinelibrary.wiley.com"
     extra_key = " "
     articles_path_length = 3
+    # the search arguments do not depend on the results
+    additional_arguments_use_soup = False
 
     def get_page_info(self, soup):
         totalResults = soup.find("span", {"class": "result__count"}).text
@@ -1708,11 +1800,6 @@ class Wiley(JournalFamily):
     def find_captions(self, figure):
         return figure.find_all("span", class_="graphic_title")
 
-    def save_figure(self, figure_name, image_url):
-        figures_directory = self.results_directory / "figures"
-        out_file = figures_directory / figure_name
-        urllib.request.urlretrieve(image_url, out_file)
-
     def get_license(self, soup):
         """ Checks the article license and whether it is open access 
         Args:
@@ -3,17 +3,15 @@ import json
 import logging
 import os
 import pathlib
+import queue
 import textwrap
+import threading
 
-import matplotlib.pyplot as plt
-import numpy as np
-from PIL import Image, ImageDraw, ImageFont
-import io
 from exsclaim.utilities.logging import Printer
 
-from .figure import FigureSeparator
 from .tool import CaptionDistributor, JournalScraper, HTMLScraper, PDFScraper
-from .utilities import boxes, paths
+from .utilities import boxes, paths, shard
+from .utilities.store import get_store
 
 
 class Pipeline:
@@ -47,7 +45,7 @@ class Pipeline:
         base_results_dir = paths.initialize_results_dir(
             self.query_dict.get("results_dir", None)
         )
-        self.results_directory = base_results_dir / self.query_dict["name"]
+        self.results_directory = base_results_dir / shard.shard_name(self.query_dict)
         os.makedirs(self.results_directory, exist_ok=True)
         # Set up logging
         self.print = False
@@ -59,16 +57,13 @@ class Pipeline:
                 logging.basicConfig(
                     filename=log_output, filemode="w+", level=logging.INFO, style="{"
                 )
-        # Check for an existing exsclaim json
-        try:
-            self.exsclaim_path = self.results_directory / "exsclaim.json"
-            with open(self.exsclaim_path, "r") as f:
-                # Load configuration file values
-                self.exsclaim_dict = json.load(f)
-        except Exception:
+        # Check for existing results. The figure store imports an existing
+        # exsclaim.json the first time it is opened
+        self.exsclaim_path = self.results_directory / "exsclaim.json"
+        self.store = get_store(self.results_directory)
+        self.exsclaim_dict = self.store.load()
+        if not self.exsclaim_dict:
             self.logger.info("No exsclaim.json file found, starting a new one.")
-            # Keep preset values
-            self.exsclaim_dict = {}
 
     def display_info(self, info):
         """Display information to the user as the specified in the query
@@ -88,7 +83,8 @@ class Pipeline:
         journal_scraper=True,
         pdf_scraper=False,
         html_scraper=False,
-        driver = None
+        driver = None,
+        streaming=None,
     ):
         """Run EXSCLAIM pipeline on Pipeline instance's query path
 
@@ -103,6 +99,9 @@ class Pipeline:
                 be included in tools list. Overriden by a tools argument
             figure_separator (boolean): true if FigureSeparator should
                 be included in tools list. Overriden by a tools argument
+            streaming (boolean): true if tools should run concurrently,
+                passing each article to the next tool as soon as it is
+                done. Defaults to the query's "streaming" value
         Returns:
             exsclaim_dict (dict): an exsclaim json
         Modifies:
@@ -149,10 +148,19 @@ class Pipeline:
             if caption_distributor:
                 tools.append(CaptionDistributor(self.query_dict))
             if figure_separator:
+                from .figure import FigureSeparator
+
                 tools.append(FigureSeparator(self.query_dict))
+        if streaming is None:
+            streaming = self.query_dict.get("streaming", False)
+            # a dict of streaming options also turns streaming on
+            streaming = isinstance(streaming, dict) or bool(streaming)
         # run each ExsclaimTool on search query
-        for tool in tools:
-            self.exsclaim_dict = tool.run(self.query_dict, self.exsclaim_dict)
+        if streaming:
+            self._run_streaming(tools)
+        else:
+            for tool in tools:
+                self.exsclaim_dict = tool.run(self.query_dict, self.exsclaim_dict)
 
         # group unassigned objects
         self.group_objects()
@@ -187,6 +195,79 @@ class Pipeline:
 
         return self.exsclaim_dict
 
+    def _split_by_article(self):
+        """Split self.exsclaim_dict into one EXSCLAIM JSON per article
+
+        Returns:
+            articles (list of dicts): EXSCLAIM JSONs, one per article
+        """
+        articles = {}
+        for figure_name, figure_json in self.exsclaim_dict.items():
+            article_name = figure_json.get("article_name", figure_name)
+            articles.setdefault(article_name, {})[figure_name] = figure_json
+        return list(articles.values())
+
+    def _run_streaming(self, tools):
+        """Run tools concurrently, streaming articles between them
+
+        Each tool runs in its own thread and hands every finished article
+        to the next tool through a bounded queue, so figure separation of
+        the first articles overlaps with scraping of later ones. A tool
+        that fails stops producing but keeps consuming its input, so the
+        tools before it are never blocked.
+
+        Args:
+            tools (list of ExsclaimTools): tools to run, in order
+        Modifies:
+            self.exsclaim_dict
+        """
+        options = self.query_dict.get("streaming")
+        if not isinstance(options, dict):
+            options = {}
+        queue_size = options.get("queue_size", self.query_dict.get("queue_size", 8))
+        done = object()
+
+        def consume(inbound):
+            while True:
+                item = inbound.get()
+                if item is done:
+                    return
+                yield item
+
+        def work(tool, inbound, outbound):
+            try:
+                for article_json in tool.stream(self.query_dict, inbound):
+                    outbound.put(article_json)
+            except Exception:
+                self.logger.exception(
+                    "<!> ERROR: {} stopped streaming".format(type(tool).__name__)
+                )
+            finally:
+                for _ in inbound:
+                    pass
+                outbound.put(done)
+
+        inbound = iter(self._split_by_article())
+        threads = []
+        for tool in tools:
+            outbound = queue.Queue(maxsize=queue_size)
+            thread = threading.Thread(
+                target=work, args=(tool, inbound, outbound), daemon=True
+            )
+            thread.start()
+            threads.append(thread)
+            inbound = consume(outbound)
+
+        for article_json in inbound:
+            for figure_json in article_json.values():
+                masters, unassigned = self.assign_captions(figure_json)
+                figure_json["master_images"] = masters
+                figure_json["unassigned"] = unassigned
+            self.exsclaim_dict.update(article_json)
+            self.store.put(article_json)
+        for thread in threads:
+            thread.join()
+
     def assign_captions(self, figure):
             """Assigns all captions to master_images JSONs for single figure
 
@@ -265,9 +346,15 @@ class Pipeline:
             return masters, unassigned
 
     def group_objects(self):
-        """Pair captions with subfigures for each figure in exsclaim json"""
+        """Pair captions with subfigures for each figure in exsclaim json
+
+        Only the figures whose pairing changed are written to the store, so
+        figures of earlier runs, and figures already paired while streaming,
+        are not written again.
+        """
         self.display_info("Matching Image Objects to Caption Text\n")
         counter = 1
+        changed = {}
         for figure in self.exsclaim_dict:
             self.display_info(
                 ">>> ({0} of {1}) ".format(counter, +len(self.exsclaim_dict))
@@ -276,15 +363,24 @@ class Pipeline:
             )
 
             figure_json = self.exsclaim_dict[figure]
+            before = json.dumps(
+                [figure_json.get("master_images"), figure_json.get("unassigned")],
+                sort_keys=True,
+            )
             masters, unassigned = self.assign_captions(figure_json)
 
             figure_json["master_images"] = masters
             figure_json["unassigned"] = unassigned
+            after = json.dumps([masters, unassigned], sort_keys=True)
+            if after != before:
+                changed[figure] = figure_json
 
             counter += 1
         self.display_info(">>> SUCCESS!\n")
-        with open(self.results_directory / "exsclaim.json", "w") as f:
-            json.dump(self.exsclaim_dict, f, indent=3)
+        compact_geometry = self.query_dict.get("compact_geometry", False)
+        self.store.put(changed)
+        self.store.compact(compact_geometry)
+        self.store.export(self.exsclaim_path, compact=compact_geometry)
 
         return self.exsclaim_dict
 
@@ -296,6 +392,9 @@ class Pipeline:
         Modifies:
             Creates directories to save each subfigure
         """
+        import matplotlib.pyplot as plt
+        import numpy as np
+
         search_query = self.query_dict
         self.display_info(
             ("Printing Master Image Objects to: {}/images\n".format(
@@ -402,6 +501,8 @@ class Pipeline:
             Creates images and text files in <save_path>/extractions folders
             showing details about each subfigure
         """
+        from PIL import Image, ImageDraw, ImageFont
+
         os.makedirs(self.results_directory / "extractions", exist_ok=True)
         figure_json = self.exsclaim_dict[figure_name]
         master_images = figure_json.get("master_images", [])
@@ -493,6 +594,8 @@ class Pipeline:
             Creates images and text files in <save_path>/boxes folders
             showing details about each subfigure
         """
+        from PIL import Image, ImageDraw
+
         os.makedirs(self.results_directory / "boxes", exist_ok=True)
         figure_json = self.exsclaim_dict[figure_name]
         master_images = figure_json.get("master_images", [])
@@ -9,17 +9,40 @@ import torchvision.transforms as T
 from PIL import Image
 
 from .. import figure
+from ..figures.image import FigureImage
 from ..figures.scale.dataset import ScaleBarDataset
 from ..figures.scale.engine import evaluate
 from ..figures.scale.utils import collate_fn
 
+# Run the accuracy tests on quantized models with, e.g.,
+# EXSCLAIM_QUANTIZATION=static python -m pytest exsclaim/tests/accuarcy_test.py
+QUANTIZATION = os.environ.get("EXSCLAIM_QUANTIZATION")
+
+
+def load_query():
+    """The test query, set to use QUANTIZATION if it is set"""
+    nature_json = pathlib.Path(__file__).parent / "data" / "nature_test.json"
+    with open(nature_json, "r") as f:
+        query = json.load(f)
+    if QUANTIZATION:
+        query.setdefault("figure_separator", {})["quantization"] = QUANTIZATION
+    return query
+
+
+def intersection_over_union(first, second):
+    """IoU of two x1, y1, x2, y2 boxes"""
+    width = min(first[2], second[2]) - max(first[0], second[0])
+    height = min(first[3], second[3]) - max(first[1], second[1])
+    intersection = max(width, 0) * max(height, 0)
+    area = (first[2] - first[0]) * (first[3] - first[1])
+    other_area = (second[2] - second[0]) * (second[3] - second[1])
+    return intersection / (area + other_area - intersection)
+
 
 class TestScaleDetection(unittest.TestCase):
     def setUp(self):
         """Instantiates a test search query and FigureSeparator to test"""
-        nature_json = pathlib.Path(__file__).parent / "data" / "nature_test.json"
-        with open(nature_json, "r") as f:
-            query = json.load(f)
+        query = load_query()
 
         self.query = query
         self.figure_separator = figure.FigureSeparator(query)
@@ -72,7 +95,10 @@ class TestScaleDetection(unittest.TestCase):
             scale_label_image = Image.open(
                 scale_label_data / label / image_file
             ).convert("RGB")
-            result, confidence = self.figure_separator.read_scale_bar(scale_label_image)
+            magnitude, unit, confidence = self.figure_separator.read_scale_bar(
+                scale_label_image
+            )
+            result = "{} {}".format(magnitude, unit)
 
             if confidence < low_confidence_threshold:
                 continue
@@ -137,9 +163,7 @@ class TestScaleDetection(unittest.TestCase):
 class TestSubfigureDetection(unittest.TestCase):
     def setUp(self):
         """Instantiates a test search query and FigureSeparator to test"""
-        nature_json = pathlib.Path(__file__).parent / "data" / "nature_test.json"
-        with open(nature_json, "r") as f:
-            query = json.load(f)
+        query = load_query()
         self.query = query
         self.figure_separator = figure.FigureSeparator(query)
 
@@ -156,5 +180,45 @@ class TestSubfigureDetection(unittest.TestCase):
         pass
 
 
+@unittest.skipUnless(QUANTIZATION, "EXSCLAIM_QUANTIZATION is not set")
+class TestQuantizedRecall(unittest.TestCase):
+    def setUp(self):
+        """FigureSeparators with fp32 and quantized models"""
+        self.quantized = figure.FigureSeparator(load_query())
+        query = load_query()
+        query["figure_separator"].pop("quantization")
+        self.full_precision = figure.FigureSeparator(query)
+        self.images = pathlib.Path(__file__).parent / "data" / "images"
+        self.minimum_recall = 0.9
+
+    def test_scale_object_recall(self):
+        """Tests quantized detection finds the scale objects fp32 finds"""
+        found = 0
+        total = 0
+        for path in sorted((self.images / "scale_bar_test_images").iterdir()):
+            image = FigureImage(path).tensor()
+            expected = self.full_precision.detect_scale_objects(image)
+            actual = self.quantized.detect_scale_objects(image)
+            for scale_object in expected:
+                total += 1
+                found += any(
+                    other[5] == scale_object[5]
+                    and intersection_over_union(other, scale_object) > 0.5
+                    for other in actual
+                )
+        self.assertGreaterEqual(found, self.minimum_recall * total)
+
+    def test_scale_label_agreement(self):
+        """Tests quantized label reading agrees with fp32 reading"""
+        labels = [
+            Image.open(path).convert("RGB")
+            for path in sorted((self.images / "scale_label_test_images").iterdir())
+        ]
+        expected = self.full_precision.read_scale_bars(labels)
+        actual = self.quantized.read_scale_bars(labels)
+        agree = sum(a[:2] == e[:2] for a, e in zip(actual, expected))
+        self.assertGreaterEqual(agree, self.minimum_recall * len(labels))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+import numpy as np
+
+from exsclaim.utilities import boxes
+from exsclaim.utilities.box_set import BoxSet
+
+
+class TestBoxSet(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        corners = rng.integers(0, 400, (20, 2))
+        self.coords = np.concatenate(
+            [corners, corners + rng.integers(1, 200, (20, 2))], axis=1
+        )
+        self.geometries = [
+            boxes.convert_coords_to_labelbox(box.tolist()) for box in self.coords
+        ]
+        self.boxes = BoxSet.from_geometries(self.geometries)
+
+    def test_geometry_round_trip(self):
+        """tests boxes convert to and from Geometry JSON unchanged"""
+        np.testing.assert_array_equal(self.boxes.coords, self.coords)
+        self.assertEqual(self.boxes.coords.dtype, np.float32)
+        self.assertEqual(self.boxes.to_geometries(), self.geometries)
+        self.assertEqual(len(BoxSet.from_geometries([])), 0)
+
+    def test_matches_geometry_functions(self):
+        """tests centers and containment agree with the Geometry JSON helpers"""
+        np.testing.assert_array_equal(
+            self.boxes.centers(),
+            [boxes.find_box_center(geometry) for geometry in self.geometries],
+        )
+        for padding in [0, 10]:
+            contained = self.boxes.contained_in(self.boxes, padding)
+            expected = [
+                [boxes.is_contained(inner, outer, padding) for outer in self.geometries]
+                for inner in self.geometries
+            ]
+            np.testing.assert_array_equal(contained, expected)
+
+    def test_iou(self):
+        """tests intersection over union of overlapping and disjoint boxes"""
+        first = BoxSet([[0, 0, 10, 10], [0, 0, 0, 0]])
+        second = BoxSet([[5, 0, 15, 10], [20, 20, 30, 30], [0, 0, 10, 10]])
+        np.testing.assert_allclose(
+            first.iou(second), [[1 / 3, 0, 1], [0, 0, 0]], rtol=1e-6
+        )
+
+    def test_nearest_and_first_container(self):
+        """tests matching by center distance and assignment to containers"""
+        lines = BoxSet([[0, 0, 10, 2], [100, 100, 110, 102], [500, 0, 510, 2]])
+        labels = BoxSet([[0, 4, 10, 8], [90, 90, 120, 96]])
+        matches, distances = lines.nearest(labels, max_distance=5000)
+        np.testing.assert_array_equal(matches, [0, 1, -1])
+        np.testing.assert_array_equal(distances, [25, 64, -1])
+        matches, _ = lines.nearest(BoxSet())
+        np.testing.assert_array_equal(matches, [-1, -1, -1])
+
+        subfigures = BoxSet([[-5, -5, 200, 200], [-10, -10, 50, 50]])
+        np.testing.assert_array_equal(lines.first_container(subfigures), [0, 0, -1])
+        np.testing.assert_array_equal(lines.first_container(BoxSet()), [-1, -1, -1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+
+import numpy as np
+
+from exsclaim.figures.scale import ctc
+from exsclaim.figures.scale.lm import CORPUS, load_language_model
+
+CLASSES = "0123456789mMcCuUnN .A"
+
+
+class TestLanguageModel(unittest.TestCase):
+    def test_language_model_is_cached(self):
+        """tests the language model is built once and rows are normalised"""
+        language_model = load_language_model(CLASSES)
+        self.assertIs(load_language_model(CLASSES), language_model)
+        bigrams = language_model.getBigramMatrix()
+        self.assertEqual(bigrams.shape, (len(CLASSES), len(CLASSES)))
+        rows = bigrams.sum(axis=1)
+        np.testing.assert_allclose(rows[rows > 0], 1.0)
+
+    def test_bigram_probabilities(self):
+        """tests bigram probabilities match counting the corpus directly"""
+        with open(CORPUS, "r", encoding="utf8") as f:
+            text = f.read()
+        pairs = [
+            (a, b) for a, b in zip(text, text[1:]) if a in CLASSES and b in CLASSES
+        ]
+        language_model = load_language_model(CLASSES)
+        for first, second in [("1", "0"), (" ", "n"), ("n", "m"), ("u", "m")]:
+            starting = [pair for pair in pairs if pair[0] == first]
+            expected = starting.count((first, second)) / len(starting)
+            self.assertAlmostEqual(
+                language_model.getCharBigram(first, second), expected
+            )
+
+
+def random_probabilities(labels, steps=16, seed=0):
+    rng = np.random.default_rng(seed)
+    logits = rng.normal(scale=3.0, size=(labels, steps, len(CLASSES) + 1))
+    probabilities = np.exp(logits)
+    return probabilities / probabilities.sum(axis=2, keepdims=True)
+
+
+class TestBeamSearch(unittest.TestCase):
+    def test_matches_reference(self):
+        """tests the vectorized beam search matches ctcBeamSearch"""
+        language_model = load_language_model(CLASSES)
+        for lm in [language_model, None]:
+            for matrix in random_probabilities(3):
+                expected = ctc.ctcBeamSearch(matrix, CLASSES, lm, beamWidth=15)
+                results = ctc.ctc_beam_search(matrix, CLASSES, lm, beam_width=15)
+                self.assertEqual(
+                    [labeling for labeling, _ in results],
+                    [labeling for labeling, _ in expected],
+                )
+                np.testing.assert_allclose(
+                    [score for _, score in results],
+                    [score for _, score in expected],
+                    rtol=1e-12,
+                )
+
+    def test_batch_matches_single(self):
+        """tests decoding a batch gives each matrix's own results"""
+        language_model = load_language_model(CLASSES)
+        matrices = random_probabilities(5, seed=1)
+        for grammar in [False, True]:
+            batch = ctc.ctc_beam_search(
+                matrices, CLASSES, language_model, grammar=grammar
+            )
+            for matrix, results in zip(matrices, batch):
+                single = ctc.ctc_beam_search(
+                    matrix, CLASSES, language_model, grammar=grammar
+                )
+                self.assertEqual(results, single)
+
+    def test_grammar(self):
+        """tests the grammar only yields labelings it allows"""
+        for matrix in random_probabilities(3, seed=2):
+            results = ctc.ctc_beam_search(matrix, CLASSES, grammar=True)
+            self.assertTrue(results)
+            for labeling, _ in results:
+                self.assertLessEqual(len(labeling), 8)
+                for i, label in enumerate(labeling):
+                    legal = ctc.get_legal_next_characters(labeling[:i])
+                    self.assertIn(label, legal)
+
+
+if __name__ == "__main__":
+    unittest.main()
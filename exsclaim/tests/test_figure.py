@@ -1,13 +1,24 @@
 import json
 import os
 import pathlib
+import shutil
+import tempfile
+import types
 import unittest
 
 import numpy as np
+import torch
 import torchvision.transforms as T
 from PIL import Image
 
 from exsclaim import figure
+from exsclaim.figures import repostprocess
+from exsclaim.figures.image import FigureImage
+from exsclaim.figures.models.crnn import CRNN
+from exsclaim.figures.scale.gate import ScaleGate, caption_score
+from exsclaim.figures.separator import batch
+from exsclaim.figures.writer import CropWriter
+from exsclaim.utilities import result_cache
 
 
 class TestScaleDetection(unittest.TestCase):
@@ -101,5 +112,432 @@ class TestSubfigureDetection(unittest.TestCase):
         pass
 
 
+class TestBatchedDetection(unittest.TestCase):
+    def setUp(self):
+        self.images = pathlib.Path(__file__).parent / "data" / "images" / "pipeline"
+
+    def test_bucketed_batches(self):
+        """tests figures are batched by their letterboxed shape"""
+        figure_paths = sorted(self.images.iterdir())
+        batched = []
+        for figures, images, infos in batch.bucketed_batches(figure_paths, batch_size=4):
+            self.assertLessEqual(len(figures), 4)
+            self.assertEqual(len({image.shape for image in images}), 1)
+            for figure_image, image, info in zip(figures, images, infos):
+                height, width = image.shape[:2]
+                self.assertEqual(max(height, width), 640)
+                self.assertEqual((height % 32, width % 32), (0, 0))
+                self.assertEqual(info[3:], (figure_image.height, figure_image.width))
+            batched += [figure_image.path for figure_image in figures]
+        self.assertEqual(sorted(batched), figure_paths)
+
+    def test_figure_image(self):
+        """tests views of a decoded figure match decoding it with PIL"""
+        figure_path = self.images / "ncomms5946_fig1.jpg"
+        figure_image = FigureImage(figure_path)
+        self.assertIs(FigureImage.open(figure_image), figure_image)
+        self.assertEqual(figure_image.rgb.dtype, np.uint8)
+        image = Image.open(figure_path).convert("RGB")
+        self.assertTrue(torch.equal(figure_image.tensor(), T.ToTensor()(image)))
+        crop = figure_image.crop(10, 20, 110, 70)
+        self.assertTrue(np.shares_memory(crop, figure_image.rgb))
+        np.testing.assert_array_equal(crop, np.array(image.crop((10, 20, 110, 70))))
+
+    def test_best_box_per_class(self):
+        """tests the most confident box of each class is kept and rescaled"""
+        # 200x100 image letterboxed to 640x320: ratio 3.2, no padding
+        info = (3.2, 0, 0, 100, 200)
+        detections = torch.tensor(
+            [
+                [32.0, 32.0, 320.0, 160.0, 0.85, 1.0],
+                [0.0, 0.0, 64.0, 64.0, 0.95, 0.0],
+                [64.0, 64.0, 700.0, 400.0, 0.90, 1.0],
+                [0.0, 0.0, 32.0, 32.0, 0.81, 0.0],
+            ]
+        )
+        best = batch.best_box_per_class(detections, info)
+        np.testing.assert_allclose(
+            best,
+            [[0, 0, 20, 20, 0.95, 0], [20, 20, 200, 100, 0.90, 1]],
+            rtol=1e-6,
+        )
+        self.assertEqual(batch.best_box_per_class(detections[:0], info).shape, (0, 6))
+
+
+class TestBatchedScaleDetection(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.results_directory = tempfile.mkdtemp()
+        self.figure_separator = figure.FigureSeparator(
+            {
+                "name": "test",
+                "results_dirs": self.results_directory,
+                "figure_separator": {"scale_min_size": 128, "scale_max_size": 256},
+            }
+        )
+        model = self.figure_separator._build_scale_bar_detection_model().eval()
+        # make every box a confident scale bar so there is output to compare
+        with torch.no_grad():
+            model.roi_heads.box_predictor.cls_score.bias.copy_(
+                torch.tensor([0.0, 20.0, 0.0])
+            )
+        self.model = model
+        self.figure_separator.models.register(
+            "scale_bar_detection_model", lambda: model
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.results_directory)
+
+    def test_batch_matches_single(self):
+        """tests a batched forward pass gives each figure's own scale objects"""
+        self.assertEqual(self.model.transform.min_size, (128,))
+        self.assertEqual(self.model.transform.max_size, 256)
+        images = [torch.rand(3, 200, 600) for _ in range(3)]
+        batched = self.figure_separator.detect_scale_objects(images)
+        self.assertEqual(len(batched), len(images))
+        for image, scale_objects in zip(images, batched):
+            single = self.figure_separator.detect_scale_objects(image)
+            self.assertGreater(len(scale_objects), 0)
+            self.assertEqual(scale_objects.shape[1], 6)
+            np.testing.assert_allclose(scale_objects, single, rtol=1e-4, atol=1e-2)
+            # boxes are mapped back to the 200x600 figure, not the 85x256 input
+            self.assertLessEqual(scale_objects[:, [0, 2]].max(), 600)
+            self.assertGreater(scale_objects[:, 2].max(), 256)
+            self.assertTrue(set(scale_objects[:, 5]) <= {1, 2})
+
+    def test_detect_scale(self):
+        """tests figures are detected in batches and unread figures pass through"""
+        self.figure_separator.scale_batch_size = 2
+        rng = np.random.default_rng(0)
+        figures = [
+            (
+                pathlib.Path("fig{}.png".format(i)),
+                FigureImage(
+                    "fig{}.png".format(i),
+                    rng.integers(0, 256, (150, 100), np.uint8)[..., None].repeat(3, 2),
+                ),
+                None,
+            )
+            for i in range(3)
+        ]
+        figures.insert(1, (pathlib.Path("unread.png"), None, None))
+        detected = list(self.figure_separator.detect_scale(iter(figures)))
+        self.assertEqual(
+            sorted(str(figure_path) for figure_path, _, _, _ in detected),
+            sorted(str(figure_path) for figure_path, _, _ in figures),
+        )
+        for figure_path, figure_image, _, scale_objects in detected:
+            if figure_image is None:
+                self.assertIsNone(scale_objects)
+            else:
+                self.assertEqual(scale_objects.shape[1], 6)
+
+
+class TestScaleLabelBatching(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        configuration_file = (
+            pathlib.Path(figure.__file__).parent
+            / "figures"
+            / "config"
+            / "scale_label_reader.json"
+        )
+        with open(configuration_file, "r") as f:
+            configuration = json.load(f)["theta"]
+        model = CRNN(configuration=configuration).eval()
+        self.results_directory = tempfile.mkdtemp()
+        self.figure_separator = figure.FigureSeparator(
+            {"name": "test", "results_dirs": self.results_directory}
+        )
+        self.figure_separator.models.register(
+            "scale_label_recognition_model", lambda: model
+        )
+        images = pathlib.Path(__file__).parent / "data" / "images"
+        self.labels = [
+            Image.open(path).convert("RGB")
+            for path in sorted((images / "scale_label_test_images").iterdir())[:2]
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.results_directory)
+
+    def test_batch_matches_single_reads(self):
+        """tests reading labels in a batch gives the same results as one by one"""
+        batched = self.figure_separator.read_scale_bars(self.labels)
+        single = [self.figure_separator.read_scale_bar(label) for label in self.labels]
+        self.assertEqual(len(batched), len(self.labels))
+        for (magnitude, unit, confidence), expected in zip(batched, single):
+            self.assertEqual((magnitude, unit), expected[:2])
+            self.assertAlmostEqual(confidence, expected[2], places=5)
+
+
+class TestScaleGate(unittest.TestCase):
+    def setUp(self):
+        self.images = pathlib.Path(__file__).parent / "data" / "images"
+
+    def test_caption_score(self):
+        """tests captions naming microscopy outrank those with only lengths"""
+        tem = {"full_caption": "(a) TEM image of the nanowires."}
+        length = {"full_caption": "Absorbance at 520 nm."}
+        plot = {"full_caption": "(a) Current against voltage."}
+        keywords = {
+            "full_caption": "",
+            "unassigned": {"captions": [{"description": "", "keywords": ["SEM"]}]},
+        }
+        self.assertEqual(caption_score(tem), 1.0)
+        self.assertEqual(caption_score(keywords), 1.0)
+        self.assertGreater(caption_score(length), caption_score(plot))
+        self.assertEqual(caption_score({"full_caption": "ecosystem"}), 0.0)
+
+    def test_gate_skips_figures_without_micrographs(self):
+        """tests the image gate keeps micrographs, skips plots and counts skips"""
+        scale_bar_images = self.images / "scale_bar_test_images"
+        micrograph = FigureImage(scale_bar_images / "white_and_black_scale_objects.png")
+        no_scale = FigureImage(scale_bar_images / "no_scale_objects.jpg")
+        gate = ScaleGate(mode="image")
+        self.assertTrue(gate.allows({}, micrograph))
+        self.assertFalse(gate.allows({}, no_scale))
+        self.assertFalse(gate.allows({}, no_scale))
+        self.assertEqual((gate.checked, gate.skipped), (2, 1))
+        # a threshold of 0 runs every figure
+        self.assertTrue(ScaleGate(mode="image", threshold=0).allows({}, no_scale))
+        self.assertTrue(ScaleGate().allows({}, no_scale))
+        with self.assertRaises(ValueError):
+            ScaleGate(mode="sometimes")
+
+
+class TestCropWriter(unittest.TestCase):
+    def setUp(self):
+        self.directory = pathlib.Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_crops_are_written_losslessly(self):
+        """tests crops are saved in the background in each format"""
+        pixels = np.random.default_rng(0).integers(0, 256, (40, 60, 3), np.uint8)
+        for image_format in ["png", "webp"]:
+            with self.subTest(image_format=image_format):
+                writer = CropWriter(image_format=image_format, compress_level=1)
+                path = writer.write("fig1.jpg", pixels, self.directory / "fig1_a.png")
+                self.assertEqual(path.suffix, "." + image_format)
+                self.assertTrue(writer.written("fig1.jpg", wait=True))
+                self.assertTrue(writer.written("no_crops.jpg"))
+                np.testing.assert_array_equal(np.array(Image.open(path)), pixels)
+                writer.write("fig2.jpg", pixels, self.directory / "missing" / "a.png")
+                self.assertFalse(writer.written("fig2.jpg", wait=True))
+                writer.close()
+
+    def test_close_stops_threads(self):
+        """tests closing stops the writer threads, and a new write restarts them"""
+        pixels = np.zeros((4, 4, 3), np.uint8)
+        writer = CropWriter()
+        writer.write("fig1.jpg", pixels, self.directory / "fig1_a.png")
+        executor = writer.executor
+        writer.close()
+        self.assertIsNone(writer.executor)
+        self.assertTrue(executor._shutdown)
+        writer.write("fig2.jpg", pixels, self.directory / "fig2_a.png")
+        self.assertTrue(writer.written("fig2.jpg", wait=True))
+        writer.close()
+
+
+class TestResultCacheHits(unittest.TestCase):
+    def setUp(self):
+        self.directory = pathlib.Path(tempfile.mkdtemp())
+        self.figure_separator = figure.FigureSeparator(
+            {
+                "name": "test",
+                "results_dirs": str(self.directory),
+                "figure_separator": {
+                    "stages": ["subfigures"],
+                    "result_cache": {"path": str(self.directory / "cache.sqlite3")},
+                },
+            }
+        )
+
+        def unused():
+            raise AssertionError("a cached figure ran a model")
+
+        self.figure_separator.models.register("yolo_model", unused)
+        figures = self.figure_separator.results_directory / "figures"
+        figures.mkdir(parents=True)
+        self.pixels = np.random.default_rng(0).integers(0, 256, (60, 80, 3), np.uint8)
+        Image.fromarray(self.pixels).save(figures / "fig1.png")
+        self.figure_path = figures / "fig1.png"
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_hits_skip_inference(self):
+        """tests a cached figure gets its geometry and crops without any model"""
+        master_image = {
+            "classification": "subfigure",
+            "geometry": [
+                {"x": 10, "y": 5},
+                {"x": 40, "y": 5},
+                {"x": 10, "y": 25},
+                {"x": 40, "y": 25},
+            ],
+            "subfigure_label": {"text": "a", "geometry": []},
+        }
+        key = result_cache.make_key(
+            result_cache.file_digest(self.figure_path),
+            self.figure_separator._result_settings(),
+        )
+        self.figure_separator.result_cache.put(key, {"master_images": [master_image]})
+        exsclaim_json = {"fig1.png": {"figure_name": "fig1.png", "master_images": []}}
+        exsclaim_json = self.figure_separator.run({}, exsclaim_json)
+
+        self.assertEqual(exsclaim_json["fig1.png"]["master_images"], [master_image])
+        crop = (
+            self.figure_separator.results_directory
+            / "images"
+            / "fig1"
+            / "a"
+            / "fig1_a.png"
+        )
+        np.testing.assert_array_equal(
+            np.array(Image.open(crop)), self.pixels[5:25, 10:40]
+        )
+        self.assertEqual(self.figure_separator.result_cache.stats()["hits"], 1)
+        self.assertIsNone(self.figure_separator.crop_writer.executor)
+        # other settings make other keys
+        self.figure_separator.scale_min_size = 400
+        self.assertNotEqual(
+            key,
+            result_cache.make_key(
+                result_cache.file_digest(self.figure_path),
+                self.figure_separator._result_settings(),
+            ),
+        )
+
+    def test_keys_follow_captions_read_by_the_scale_gate(self):
+        """tests a caption scale gate's decision is part of a figure's key"""
+        settings = self.figure_separator._result_settings()
+        self.figure_separator.exsclaim_json = {
+            "tem.png": {"full_caption": "TEM image of Ag nanoparticles"},
+            "plot.png": {"full_caption": "Absorbance spectra"},
+        }
+        tem = self.figure_separator._figure_settings(settings, "tem.png")
+        plot = self.figure_separator._figure_settings(settings, "plot.png")
+        self.assertEqual(tem, plot)
+        self.figure_separator.stages = {"subfigures", "scale"}
+        self.figure_separator.scale_gate = ScaleGate(mode="caption")
+        settings = self.figure_separator._result_settings()
+        tem = self.figure_separator._figure_settings(settings, "tem.png")
+        plot = self.figure_separator._figure_settings(settings, "plot.png")
+        self.assertNotEqual(
+            result_cache.make_key("digest", tem), result_cache.make_key("digest", plot)
+        )
+
+
+class FixedDetections:
+    """Stands in for YOLO, detecting the same boxes in every figure"""
+
+    names = {0: "a", 1: "b"}
+    model = types.SimpleNamespace(stride=torch.tensor([32.0]))
+    boxes = torch.tensor(
+        [
+            [10.0, 10.0, 300.0, 300.0, 0.9, 0.0],
+            [20.0, 20.0, 200.0, 200.0, 0.5, 1.0],
+            [15.0, 15.0, 250.0, 250.0, 0.3, 0.0],
+        ]
+    )
+
+    def predict(self, source, conf, **kwargs):
+        boxes = self.boxes[self.boxes[:, 4] > conf]
+        return [
+            types.SimpleNamespace(boxes=types.SimpleNamespace(data=boxes))
+            for _ in source
+        ]
+
+
+class TestRawDetections(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.directory = pathlib.Path(tempfile.mkdtemp())
+        self.query = {
+            "name": "test",
+            "results_dirs": str(self.directory),
+            "figure_separator": {"scale_min_size": 128, "scale_max_size": 256},
+        }
+        model = figure.FigureSeparator(self.query)._build_scale_bar_detection_model()
+        # make every box a confident scale bar so there is output to compare
+        with torch.no_grad():
+            model.roi_heads.box_predictor.cls_score.bias.copy_(
+                torch.tensor([0.0, 20.0, 0.0])
+            )
+        self.model = model.eval()
+        self.pixels = np.random.default_rng(0).integers(0, 256, (320, 400, 3), np.uint8)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def separate(self, raw_detections):
+        """Run a separator on one figure in a results directory of its own"""
+        query = dict(self.query, name="raw" if raw_detections else "plain")
+        query["figure_separator"] = dict(
+            query["figure_separator"], raw_detections=raw_detections
+        )
+        figure_separator = figure.FigureSeparator(query)
+        figure_separator.models.register("yolo_model", FixedDetections)
+        figure_separator.models.register(
+            "scale_bar_detection_model", lambda: self.model
+        )
+        figures = figure_separator.results_directory / "figures"
+        figures.mkdir(parents=True)
+        Image.fromarray(self.pixels).save(figures / "fig1.png")
+        exsclaim_json = {"fig1.png": {"figure_name": "fig1.png", "master_images": []}}
+        exsclaim_json = figure_separator.run(query, exsclaim_json)
+        return query, figure_separator, json.loads(json.dumps(exsclaim_json))
+
+    def test_raw_detections_match_and_repostprocess(self):
+        """tests raw detections change nothing and thresholds are reapplied"""
+        _, _, plain = self.separate(False)
+        query, figure_separator, raw = self.separate(True)
+        self.assertEqual(plain, raw)
+        sidecar = repostprocess.sidecar_path(
+            figure_separator.results_directory, "fig1.png"
+        )
+        saved = repostprocess.load_raw_detections(sidecar)
+        self.assertEqual(saved["figure_name"], "fig1.png")
+        self.assertEqual(len(saved["subfigures"]), 3)
+        self.assertGreater(len(saved["scale_objects"]), 0)
+
+        def unused():
+            raise AssertionError("re-postprocessing ran a model")
+
+        query["figure_separator"]["thresholds"] = {"subfigure_confidence": 0.4}
+        figure_separator = figure.FigureSeparator(query)
+        for model_name in ["yolo_model", "scale_bar_detection_model"]:
+            figure_separator.models.register(model_name, unused)
+        self.assertEqual(figure_separator.repostprocess(), 1)
+        with open(figure_separator.results_directory / "exsclaim.json") as f:
+            figure_json = json.load(f)["fig1.png"]
+        labels = [
+            master_image["subfigure_label"]["text"]
+            for master_image in figure_json["master_images"]
+        ]
+        self.assertEqual(labels, ["a", "b"])
+        crops = figure_separator.results_directory / "images" / "fig1"
+        self.assertTrue((crops / "b" / "fig1_b.png").is_file())
+
+    def test_select_scale_objects(self):
+        """tests selected scale objects match detect_scale_objects"""
+        figure_separator = figure.FigureSeparator(self.query)
+        figure_separator.models.register(
+            "scale_bar_detection_model", lambda: self.model
+        )
+        image = torch.rand(3, 200, 300)
+        raw = figure_separator.detect_raw_scale_objects(image, 0.1)
+        selected, kept = repostprocess.select_scale_objects(raw, 0.5, 0.4)
+        np.testing.assert_array_equal(
+            selected, figure_separator.detect_scale_objects(image)
+        )
+        np.testing.assert_array_equal(selected, raw[kept])
+
+
 if __name__ == "__main__":
     unittest.main()
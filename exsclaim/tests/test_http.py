@@ -0,0 +1,111 @@
+import pathlib
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import requests
+import responses
+
+from exsclaim.utilities import http
+
+
+class Concurrency:
+    """Callable that records how many calls run at once"""
+
+    def __init__(self, seconds=0.05):
+        self.seconds = seconds
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most = 0
+
+    def __call__(self, *args):
+        with self.lock:
+            self.running += 1
+            self.most = max(self.most, self.running)
+        time.sleep(self.seconds)
+        with self.lock:
+            self.running -= 1
+        return args
+
+
+class TestFetchEngine(unittest.TestCase):
+    def setUp(self):
+        self.directory = pathlib.Path(tempfile.mkdtemp())
+        self.engine = http.FetchEngine(max_workers=8, max_per_domain=2, rate=None)
+
+    def tearDown(self):
+        self.engine.close()
+        shutil.rmtree(self.directory)
+
+    @responses.activate
+    def test_sessions_are_shared_per_domain(self):
+        """tests requests to a domain reuse its session and headers"""
+        responses.add(responses.GET, "https://a.org/1", body="one")
+        responses.add(responses.GET, "https://a.org/2", body="two")
+        responses.add(responses.GET, "https://b.org/1", body="three")
+        texts = [
+            self.engine.get(url).text
+            for url in ["https://a.org/1", "https://a.org/2", "https://b.org/1"]
+        ]
+        self.assertEqual(texts, ["one", "two", "three"])
+        self.assertEqual(sorted(self.engine.sessions), ["a.org", "b.org"])
+        user_agent = responses.calls[0].request.headers["User-Agent"]
+        self.assertEqual(user_agent, http.HEADERS["User-Agent"])
+
+    @responses.activate
+    def test_requests_per_domain_are_bounded(self):
+        """tests no more than max_per_domain requests to a domain run at once"""
+        concurrency = Concurrency()
+
+        def respond(request):
+            concurrency(request)
+            return 200, {}, "ok"
+
+        for domain in ["a.org", "b.org"]:
+            responses.add_callback(
+                responses.GET, "https://{}/figure".format(domain), callback=respond
+            )
+        urls = ["https://a.org/figure"] * 6
+        self.engine.map(self.engine.get, urls)
+        self.assertEqual(concurrency.most, 2)
+        # another domain has its own slots
+        concurrency.most = 0
+        self.engine.map(self.engine.get, urls[:2] + ["https://b.org/figure"] * 2)
+        self.assertEqual(concurrency.most, 4)
+
+    @responses.activate
+    def test_download(self):
+        """tests downloads are saved whole, and failures save nothing"""
+        responses.add(responses.GET, "https://a.org/fig1.jpg", body=b"\xff\xd8jpeg")
+        responses.add(responses.GET, "https://a.org/fig2.jpg", status=404)
+        with self.assertRaises(requests.HTTPError):
+            self.engine.map(
+                self.engine.download,
+                ["https://a.org/fig1.jpg", "https://a.org/fig2.jpg"],
+                [self.directory / "fig1.jpg", self.directory / "fig2.jpg"],
+            )
+        self.assertEqual((self.directory / "fig1.jpg").read_bytes(), b"\xff\xd8jpeg")
+        self.assertEqual(sorted(p.name for p in self.directory.iterdir()), ["fig1.jpg"])
+
+    def test_imap(self):
+        """tests imap yields in order with a bounded number of items running"""
+        concurrency = Concurrency()
+        results = [
+            (item, future.result())
+            for item, future in http.imap(concurrency, range(10), 3)
+        ]
+        self.assertEqual(results, [(i, (i,)) for i in range(10)])
+        self.assertEqual(concurrency.most, 3)
+
+    def test_engines_are_shared_by_configuration(self):
+        """tests queries with the same "http" options share an engine"""
+        engine = http.get_engine({"http": {"max_per_domain": 3}})
+        self.assertIs(engine, http.get_engine({"http": {"max_per_domain": 3}}))
+        self.assertIsNot(engine, http.get_engine({}))
+        self.assertEqual(engine.max_per_domain, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+import responses
+
+from exsclaim.utilities import http
+from exsclaim.utilities.http_cache import HTTPCache
+
+URL = "https://a.org/articles/a1"
+
+
+class TestHTTPCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = pathlib.Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def engine(self, **cache):
+        engine = http.FetchEngine(rate=None, cache={"path": self.directory, **cache})
+        self.addCleanup(engine.close)
+        return engine
+
+    @responses.activate
+    def test_fresh_responses_need_no_request(self):
+        """tests a fresh response is served from disk, across engines"""
+        responses.add(responses.GET, URL, body="<html>a1</html>")
+        self.assertEqual(self.engine().get(URL).text, "<html>a1</html>")
+        # a new engine, as in a rerun, reads the same cache
+        response = self.engine().get(URL)
+        self.assertEqual(response.text, "<html>a1</html>")
+        self.assertTrue(response.from_cache)
+        self.assertEqual(len(responses.calls), 1)
+
+    @responses.activate
+    def test_stale_responses_are_revalidated(self):
+        """tests stale responses are revalidated with their ETag"""
+        engine = self.engine(ttl=0)
+        headers = {"ETag": '"v1"', "Last-Modified": "Mon, 05 Oct 2026 10:00:00 GMT"}
+        responses.add(responses.GET, URL, body="v1", headers=headers)
+        responses.add(responses.GET, URL, status=304)
+        responses.add(responses.GET, URL, body="v2", headers={"ETag": '"v2"'})
+        self.assertEqual(engine.get(URL).text, "v1")
+        self.assertEqual(engine.get(URL).text, "v1")
+        request = responses.calls[1].request
+        self.assertEqual(request.headers["If-None-Match"], '"v1"')
+        self.assertEqual(request.headers["If-Modified-Since"], headers["Last-Modified"])
+        # a changed page replaces the cached one
+        self.assertEqual(engine.get(URL).text, "v2")
+        self.assertEqual(responses.calls[2].request.headers["If-None-Match"], '"v1"')
+        stats = engine.cache.stats()
+        self.assertEqual((stats["revalidated"], stats["misses"]), (1, 2))
+
+    @responses.activate
+    def test_ttl_per_request(self):
+        """tests a request can ask for a shorter time to live"""
+        engine = self.engine()
+        responses.add(responses.GET, URL, body="page 1")
+        responses.add(responses.GET, URL, body="page 1, updated")
+        engine.get(URL)
+        self.assertEqual(engine.get(URL, ttl=0).text, "page 1, updated")
+
+    @responses.activate
+    def test_only_storable_responses_are_cached(self):
+        """tests errors and no-store responses are not cached"""
+        engine = self.engine()
+        responses.add(responses.GET, URL, status=404)
+        responses.add(
+            responses.GET, URL + "/private", headers={"Cache-Control": "no-store"}
+        )
+        engine.get(URL)
+        engine.get(URL + "/private")
+        self.assertEqual(engine.cache.stats()["entries"], 0)
+
+    @responses.activate
+    def test_bodies_are_content_addressed(self):
+        """tests identical bodies are stored once and evicted when unused"""
+        cache = HTTPCache(self.directory, max_bytes=150)
+        self.addCleanup(cache.close)
+        engine = self.engine()
+        for name, body in [("a", b"x" * 100), ("b", b"x" * 100), ("c", b"y" * 100)]:
+            url = "https://a.org/{}.jpg".format(name)
+            responses.add(responses.GET, url, body=body)
+            cache.store(url, engine._request(url))
+            bodies = [p for p in (self.directory / "bodies").rglob("*") if p.is_file()]
+            self.assertEqual(len(bodies), 1)
+        self.assertIsNone(cache.lookup("https://a.org/a.jpg"))
+        kept = cache.lookup("https://a.org/c.jpg")["response"]
+        self.assertEqual(kept.content, b"y" * 100)
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+    @responses.activate
+    def test_downloads_are_cached(self):
+        """tests figures are saved from the cache on a rerun"""
+        url = "https://a.org/fig1.jpg"
+        responses.add(responses.GET, url, body=b"\xff\xd8jpeg")
+        self.engine().download(url, self.directory / "fig1.jpg")
+        (self.directory / "fig1.jpg").unlink()
+        self.engine().download(url, self.directory / "fig1.jpg")
+        self.assertEqual((self.directory / "fig1.jpg").read_bytes(), b"\xff\xd8jpeg")
+        self.assertEqual(len(responses.calls), 1)
+
+    def test_rendered_pages_are_cached(self):
+        """tests pages loaded in a browser are only loaded once"""
+        loaded = []
+
+        def load(url):
+            loaded.append(url)
+            return "<html>rendered {}</html>".format(len(loaded))
+
+        self.assertEqual(self.engine().render(URL, load).text, "<html>rendered 1</html>")
+        response = self.engine().render(URL, load)
+        self.assertEqual(response.text, "<html>rendered 1</html>")
+        self.assertTrue(response.from_cache)
+        self.assertEqual(loaded, [URL])
+        # stale pages are loaded again, and screenshots are kept as bytes
+        self.engine(ttl=0).render(URL, load)
+        self.assertEqual(len(loaded), 2)
+        screenshot = self.engine().render(URL + ".png", lambda url: b"\x89PNG")
+        self.assertEqual(screenshot.content, b"\x89PNG")
+        # a browser's page is not mistaken for the server's response
+        self.assertIsNone(self.engine().cache.lookup(URL))
+
+
+if __name__ == "__main__":
+    unittest.main()
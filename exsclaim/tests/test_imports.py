@@ -0,0 +1,76 @@
+import json
+import subprocess
+import sys
+import unittest
+
+# Modules that must not be imported until a tool that needs them runs
+HEAVY_MODULES = [
+    "torch",
+    "torchvision",
+    "ultralytics",
+    "langchain",
+    "transformers",
+    "chromadb",
+    "openai",
+    "cv2",
+    "fitz",
+    "selenium",
+    "matplotlib",
+    "PIL",
+    "numpy",
+]
+
+# Maximum time (in seconds) that importing exsclaim.pipeline may take
+IMPORT_BUDGET = 1.0
+
+
+def import_in_subprocess(module):
+    """Import module in a fresh interpreter
+
+    Returns:
+        (modules, seconds): names of every module loaded by the import and
+            the cumulative import time of module reported by -X importtime
+    """
+    code = "import json, sys, {0}; print(json.dumps(sorted(sys.modules)))".format(
+        module
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seconds = None
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            seconds = int(fields[1]) / 1e6
+    return set(json.loads(result.stdout.splitlines()[-1])), seconds
+
+
+class TestImportTime(unittest.TestCase):
+    def test_pipeline_import_is_light(self):
+        """tests importing the pipeline does not load heavy dependencies"""
+        modules, seconds = import_in_subprocess("exsclaim.pipeline")
+        loaded = [
+            heavy
+            for heavy in HEAVY_MODULES
+            if heavy in modules
+            or any(name.startswith(heavy + ".") for name in modules)
+        ]
+        self.assertEqual(loaded, [], "exsclaim.pipeline imported {}".format(loaded))
+        self.assertLess(
+            seconds,
+            IMPORT_BUDGET,
+            "importing exsclaim.pipeline took {:.2f} s".format(seconds),
+        )
+
+    def test_tool_import_is_light(self):
+        """tests importing the tools does not load heavy dependencies"""
+        modules, _ = import_in_subprocess("exsclaim.tool")
+        for heavy in HEAVY_MODULES:
+            self.assertNotIn(heavy, modules)
+
+
+if __name__ == "__main__":
+    unittest.main()
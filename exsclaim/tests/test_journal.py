@@ -1,5 +1,7 @@
 import json
 import pathlib
+import shutil
+import tempfile
 import unittest
 
 import bs4
@@ -7,6 +9,7 @@ import responses
 from bs4 import BeautifulSoup
 
 from exsclaim import journal
+from exsclaim.utilities import http
 
 
 class TestNature(unittest.TestCase):
@@ -53,6 +56,31 @@ class TestNature(unittest.TestCase):
         for article_path in article_paths:
             self.assertIsInstance(article_path, str)
 
+    def test_search_urls_are_lazy(self):
+        """tests searching stops, with no extra requests, at maximum_scraped"""
+        requested = []
+        self.jfamily.get_soup_from_request = requested.append
+        searched = []
+
+        def get_articles_from_search_url(search_url):
+            searched.append(search_url)
+            return {"/articles/{}_{}".format(len(searched), i) for i in range(2)}
+
+        self.jfamily.get_articles_from_search_url = get_articles_from_search_url
+        article_paths = self.jfamily.get_article_extensions()
+        self.assertEqual(len(article_paths), self.query["maximum_scraped"])
+        self.assertEqual(len(searched), 1)
+        self.assertEqual(requested, [])
+
+    def test_search_urls_are_deduplicated(self):
+        """tests repeated synonyms do not repeat searches"""
+        self.query["query"]["search_field_1"]["synonyms"] = ["Ag nanoparticle"]
+        search_urls = list(self.jfamily.generate_search_query_urls())
+        canonical_urls = {http.canonical_url(url) for url in search_urls}
+        self.assertEqual(len(search_urls), len(canonical_urls))
+        del self.query["query"]["search_field_1"]["synonyms"]
+        self.assertEqual(search_urls, self.jfamily.get_search_query_urls())
+
     @responses.activate
     def test_get_soup_from_request(self):
         # set up expected soup from request
@@ -72,6 +100,22 @@ class TestNature(unittest.TestCase):
         result_soup = self.jfamily.get_soup_from_request(mock_url)
         self.assertEqual(expected_soup, result_soup)
 
+    @responses.activate
+    def test_save_figures(self):
+        """tests an article's figures are downloaded to the figures directory"""
+        figures = {
+            "test_fig{}.jpg".format(i): "http://www.test_exsclaim.com/fig{}.jpg".format(i)
+            for i in range(1, 4)
+        }
+        for i, image_url in enumerate(figures.values()):
+            responses.add(responses.GET, image_url, body=bytes([i]) * 10)
+        self.jfamily.save_figures(figures)
+        figures_directory = self.jfamily.results_directory / "figures"
+        for i, figure_name in enumerate(figures):
+            figure_path = figures_directory / figure_name
+            self.assertEqual(figure_path.read_bytes(), bytes([i]) * 10)
+            figure_path.unlink()
+
     @responses.activate
     def test_get_figure_list(self):
         """tests that get_figure_list gets the correct figures from test article"""
@@ -96,5 +140,71 @@ class TestNature(unittest.TestCase):
             self.assertIsInstance(figure, bs4.element.Tag)
 
 
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        """Instantiates an incremental Nature search in a new results directory"""
+        nature_json = pathlib.Path(__file__).parent / "data" / "nature_test.json"
+        with open(nature_json, "r") as f:
+            self.query = json.load(f)
+        self.results_dirs = tempfile.mkdtemp()
+        self.query["results_dirs"] = self.results_dirs
+        self.query["incremental"] = True
+        self.query["maximum_scraped"] = 100
+        self.jfamily = journal.Nature(self.query)
+
+    def tearDown(self):
+        shutil.rmtree(self.results_dirs)
+
+    def search_page(self, *articles):
+        links = "".join('<a href="/articles/{}">a</a>'.format(a) for a in articles)
+        return BeautifulSoup("<html>{}</html>".format(links), "lxml")
+
+    def test_search_urls_are_newest_first(self):
+        """tests an incremental search is one url, newest first, since the watermark"""
+        search_urls = self.jfamily.get_search_query_urls()
+        self.assertEqual(len(search_urls), 1)
+        self.assertIn("order=date_desc", search_urls[0])
+        self.jfamily.watermark["newest"] = "2024-05-01"
+        (search_url,) = self.jfamily.get_search_query_urls()
+        self.assertIn("date_range=2024-", search_url)
+
+    def test_paging_stops_at_known_articles(self):
+        """tests no page after the first one with a known article is read"""
+        self.jfamily.articles_visited.add("a3")
+        pages = [
+            self.search_page("a1", "a2"),
+            self.search_page("a3", "a4"),
+            self.search_page("a5"),
+        ]
+        self.jfamily.get_soup_from_request = lambda url: pages[0]
+        self.jfamily.get_page_info = lambda soup: (1, 3, 5)
+        self.jfamily.turn_page = lambda url, page_number: pages[page_number - 1]
+        article_paths = self.jfamily.get_articles_from_search_url("search")
+        self.assertEqual(
+            article_paths, {"/articles/a1", "/articles/a2", "/articles/a4"}
+        )
+
+    def test_watermark(self):
+        """tests the newest articles scraped are remembered by the next run"""
+        test_html = (
+            pathlib.Path(__file__).parent
+            / "data"
+            / "nature_articles"
+            / "ncomms1737.html"
+        )
+        with open(test_html, "r", encoding="utf-8") as f:
+            soup = BeautifulSoup(f.read(), "lxml")
+        self.assertEqual(self.jfamily.get_publication_date(soup), "2012-03-13")
+        self.jfamily.record_publication_date("/articles/ncomms1737", soup)
+        self.jfamily.update_watermark(["/articles/ncomms1737", "/articles/a1"])
+
+        rerun = journal.Nature(self.query)
+        self.assertEqual(
+            rerun.watermark,
+            {"newest": "2012-03-13", "articles": ["ncomms1737", "a1"]},
+        )
+        self.assertIn("a1", rerun.articles_visited)
+
+
 if __name__ == "__main__":
     unittest.main()
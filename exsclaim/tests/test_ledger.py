@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from exsclaim.utilities import ledger
+from exsclaim.utilities.ledger import Ledger
+
+
+class TestLedger(unittest.TestCase):
+    def setUp(self):
+        self.results_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.results_directory)
+
+    def test_records_survive_restart(self):
+        """tests finished items are read back by a new ledger"""
+        run = Ledger(self.results_directory)
+        run.record(ledger.JOURNAL_SCRAPER, "/articles/s41467-018-06211-3")
+        run.record(ledger.FIGURE_SEPARATOR, "s41467-018-06211-3", "fig1.jpg")
+        run.record(
+            ledger.FIGURE_SEPARATOR, "s41467-018-06211-3", "fig2.jpg", ledger.FAILED
+        )
+        run.close()
+
+        restart = Ledger(self.results_directory)
+        self.assertEqual(
+            restart.completed(ledger.JOURNAL_SCRAPER), {"s41467-018-06211-3"}
+        )
+        self.assertEqual(restart.completed(ledger.FIGURE_SEPARATOR), {"fig1.jpg"})
+        self.assertEqual(restart.completed(ledger.CAPTION_DISTRIBUTOR), set())
+
+        restart.record(ledger.FIGURE_SEPARATOR, "s41467-018-06211-3", "fig2.jpg")
+        self.assertEqual(
+            restart.completed(ledger.FIGURE_SEPARATOR), {"fig1.jpg", "fig2.jpg"}
+        )
+
+    def test_imports_legacy_files(self):
+        """tests _articles, _captions and _figures seed a new ledger"""
+        legacy = {
+            "_articles": ["article1", "article2"],
+            "_captions": ["fig1.jpg"],
+            "_figures": ["fig1.jpg", "fig2.jpg"],
+        }
+        for filename, items in legacy.items():
+            with open(os.path.join(self.results_directory, filename), "w") as f:
+                f.write("\n".join(items) + "\n")
+
+        run = Ledger(self.results_directory)
+        self.assertEqual(
+            run.completed(ledger.JOURNAL_SCRAPER), {"article1", "article2"}
+        )
+        self.assertEqual(run.completed(ledger.CAPTION_DISTRIBUTOR), {"fig1.jpg"})
+        self.assertEqual(
+            run.completed(ledger.FIGURE_SEPARATOR), {"fig1.jpg", "fig2.jpg"}
+        )
+
+    def test_watermarks(self):
+        """tests a query's watermark is kept across runs"""
+        run = Ledger(self.results_directory)
+        self.assertEqual(run.watermark("q"), {"newest": None, "articles": []})
+        run.set_watermark("q", "2026-10-01", ["article2", "article1"])
+        run.close()
+
+        restart = Ledger(self.results_directory)
+        self.assertEqual(
+            restart.watermark("q"),
+            {"newest": "2026-10-01", "articles": ["article2", "article1"]},
+        )
+        self.assertEqual(restart.watermark("other")["articles"], [])
+
+    def test_merge_watermarks(self):
+        """tests merged ledgers keep the newest watermark and every article"""
+        shard_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, shard_directory)
+        shard = Ledger(shard_directory)
+        shard.set_watermark("q", "2026-10-01", ["article3", "article2"])
+        shard.set_watermark("only in shard", "2025-01-01", ["article9"])
+        shard.close()
+
+        merged = Ledger(self.results_directory)
+        merged.set_watermark("q", "2026-09-01", ["article2", "article1"])
+        merged.merge(os.path.join(shard_directory, "ledger.sqlite3"))
+        self.assertEqual(
+            merged.watermark("q"),
+            {"newest": "2026-10-01", "articles": ["article3", "article2", "article1"]},
+        )
+        self.assertEqual(merged.watermark("only in shard")["articles"], ["article9"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import json
+import pathlib
+import shutil
+import tempfile
+import threading
+import unittest
+
+import torch
+from torch import nn
+from torchvision.ops.misc import FrozenBatchNorm2d
+
+from exsclaim.figures import quantize
+from exsclaim.figures.models.crnn import CRNN
+from exsclaim.utilities.models import ModelRegistry
+
+
+class TestModelRegistry(unittest.TestCase):
+    def test_models_load_once_on_first_use(self):
+        """tests a model is loaded on first use and only once"""
+        calls = []
+
+        def load():
+            calls.append(1)
+            return object()
+
+        registry = ModelRegistry({"detector": load, "reader": lambda: 1 / 0})
+        self.assertEqual(registry.loaded(), [])
+
+        models = []
+        threads = [
+            threading.Thread(target=lambda: models.append(registry.get("detector")))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(model is models[0] for model in models))
+        # the reader is never used, so its (failing) loader never runs
+        self.assertEqual(registry.loaded(), ["detector"])
+
+        registry.unload("detector")
+        self.assertFalse(registry.is_loaded("detector"))
+        registry.get("detector")
+        self.assertEqual(len(calls), 2)
+
+
+class TestQuantization(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.directory = pathlib.Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_fold_frozen_batch_norms(self):
+        """tests folding frozen batch norms into convolutions keeps outputs"""
+        norm = FrozenBatchNorm2d(4)
+        norm.weight.uniform_(0.5, 1.5)
+        norm.bias.normal_()
+        norm.running_mean.normal_()
+        norm.running_var.uniform_(0.5, 2.0)
+        model = nn.Sequential(nn.Conv2d(3, 4, 3), norm, nn.ReLU())
+        images = torch.rand(2, 3, 16, 16)
+        with torch.no_grad():
+            expected = model(images)
+            quantize.fold_frozen_batch_norms(model)
+            folded = model(images)
+        self.assertIsInstance(model[1], nn.Identity)
+        torch.testing.assert_close(folded, expected, rtol=1e-4, atol=1e-5)
+
+    def test_quantized_label_reader_is_cached(self):
+        """tests the quantized CRNN tracks the fp32 one and is cached"""
+        configuration_file = (
+            pathlib.Path(quantize.__file__).parent
+            / "config"
+            / "scale_label_reader.json"
+        )
+        with open(configuration_file, "r") as f:
+            configuration = json.load(f)["theta"]
+        model = CRNN(configuration=configuration).eval()
+        checkpoint = self.directory / "scale_label_recognition_model.pt"
+        torch.save(model.state_dict(), checkpoint)
+        images = torch.randn(2, 3, 128, 512)
+        with torch.no_grad():
+            expected = model(images)
+        for mode in quantize.MODES:
+            calls = []
+
+            def calibration():
+                calls.append(mode)
+                return [images]
+
+            def quantize_model(calibration_images):
+                return quantize.quantize_scale_label_reader(
+                    model, mode, calibration_images
+                )
+
+            quantized = quantize.load_quantized(
+                checkpoint, mode, quantize_model, calibration
+            )
+            self.assertTrue(quantize.quantized_path(checkpoint, mode).is_file())
+            cached = quantize.load_quantized(
+                checkpoint, mode, quantize_model, calibration
+            )
+            self.assertEqual(calls, [mode])
+            with torch.no_grad():
+                actual = quantized(images)
+                torch.testing.assert_close(cached(images), actual)
+            self.assertEqual(actual.shape, expected.shape)
+            # int8 rounding moves probabilities a little
+            difference = (actual.exp() - expected.exp()).abs().max()
+            self.assertLess(float(difference), 0.1)
+        with self.assertRaises(ValueError):
+            quantize.load_quantized(checkpoint, "int4", quantize_model)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import importlib.util
+import json
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+from PIL import Image
+
+from exsclaim import figure
+from exsclaim.figures import export, onnx_backend
+from exsclaim.figures.image import FigureImage
+from exsclaim.figures.models.crnn import CRNN
+from exsclaim.figures.separator import batch
+
+HAS_ONNX = all(
+    importlib.util.find_spec(module) is not None for module in ("onnx", "onnxruntime")
+)
+
+
+@unittest.skipUnless(HAS_ONNX, "onnx and onnxruntime are not installed")
+class TestOnnxParity(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.directory = pathlib.Path(tempfile.mkdtemp())
+        self.figure_separator = figure.FigureSeparator(
+            {
+                "name": "test",
+                "results_dirs": str(self.directory),
+                "figure_separator": {"scale_min_size": 256, "scale_max_size": 512},
+            }
+        )
+        self.images = pathlib.Path(__file__).parent / "data" / "images"
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_scale_label_reader(self):
+        """tests the exported CRNN matches PyTorch at any batch size and width"""
+        configuration_file = (
+            pathlib.Path(figure.__file__).parent
+            / "figures"
+            / "config"
+            / "scale_label_reader.json"
+        )
+        with open(configuration_file, "r") as f:
+            configuration = json.load(f)["theta"]
+        model = CRNN(configuration=configuration).eval()
+        path = self.directory / "scale_label_recognition_model.onnx"
+        export.export_scale_label_reader(model, path)
+        reader = onnx_backend.OnnxLabelReader(path)
+        for width in [512, 256]:
+            labels = sorted((self.images / "scale_label_test_images").iterdir())[:3]
+            images = torch.stack(
+                [
+                    self.figure_separator.scale_label_normalize(
+                        Image.open(label).resize((width, figure.SCALE_LABEL_HEIGHT))
+                    )
+                    for label in labels
+                ]
+            )
+            with torch.no_grad():
+                expected = model(images).numpy()
+            np.testing.assert_allclose(reader(images).numpy(), expected, atol=1e-4)
+
+    def test_scale_bar_detector(self):
+        """tests the exported Faster R-CNN matches PyTorch on a test figure"""
+        model = self.figure_separator._build_scale_bar_detection_model().eval()
+        path = self.directory / "scale_bar_detection_model.onnx"
+        export.export_scale_bar_detector(model, path)
+        detector = onnx_backend.OnnxScaleBarDetector(path)
+        figure_image = FigureImage(
+            self.images / "scale_bar_test_images" / "basic_figure.jpg"
+        )
+        image = figure_image.tensor()
+        with torch.no_grad():
+            expected = model([image])[0]
+        actual = detector([image])[0]
+        top = min(10, len(expected["scores"]))
+        self.assertGreater(top, 0)
+        for key in ["scores", "boxes"]:
+            np.testing.assert_allclose(
+                actual[key][:top].numpy(),
+                expected[key][:top].numpy(),
+                rtol=1e-3,
+                atol=1e-2,
+            )
+        np.testing.assert_array_equal(
+            actual["labels"][:top].numpy(), expected["labels"][:top].numpy()
+        )
+
+    def test_yolo(self):
+        """tests the exported YOLO matches PyTorch on a letterboxed batch"""
+        from ultralytics import YOLO
+
+        model = YOLO("yolo11n.yaml")
+        path = self.directory / "yolo_model.onnx"
+        export.export_yolo(model, path)
+        onnx_model = onnx_backend.load_yolo(path)
+        figure_paths = sorted((self.images / "pipeline").iterdir())[:4]
+        for _, images, _ in batch.bucketed_batches(figure_paths, batch_size=4):
+            settings = dict(imgsz=640, conf=0.001, max_det=5, verbose=False)
+            expected = model.predict(source=images, **settings)
+            actual = onnx_model.predict(source=images, **settings)
+            for expected_result, actual_result in zip(expected, actual):
+                # compare confidences, as near ties may swap boxes' order
+                np.testing.assert_allclose(
+                    actual_result.boxes.conf.cpu().numpy(),
+                    expected_result.boxes.conf.cpu().numpy(),
+                    atol=1e-3,
+                )
+
+
+class TestOnnxBackend(unittest.TestCase):
+    def test_backend_option(self):
+        """tests the backend is checked and missing exports are reported"""
+        directory = tempfile.mkdtemp()
+        try:
+            query = {"name": "test", "results_dirs": directory}
+            query["figure_separator"] = {"backend": "tflite"}
+            with self.assertRaises(ValueError):
+                figure.FigureSeparator(query)
+            query["figure_separator"] = {"backend": "onnx", "onnx_dir": directory}
+            figure_separator = figure.FigureSeparator(query)
+            with self.assertRaises(FileNotFoundError):
+                figure_separator.scale_label_recognition_model
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,17 @@
 import json
 import os
 import pathlib
+import queue
 import shutil
+import tempfile
 import unittest
+import unittest.mock
 
 import responses
 from deepdiff import DeepDiff
 
 from exsclaim.pipeline import Pipeline
+from exsclaim.tool import ExsclaimTool
 
 
 class TestNatureFull(unittest.TestCase):
@@ -129,5 +133,144 @@ class TestNatureFull(unittest.TestCase):
         )
 
 
+class FakeSource(ExsclaimTool):
+    """Produces one figure for each of a few fake articles"""
+
+    def __init__(self, search_query, n_articles=20):
+        super().__init__(search_query)
+        self.n_articles = n_articles
+
+    def _load_model(self):
+        pass
+
+    def _update_exsclaim(self, exsclaim_json, article_json):
+        exsclaim_json.update(article_json)
+        return exsclaim_json
+
+    def _articles(self):
+        for i in range(self.n_articles):
+            figure_name = "article{}_fig1.jpg".format(i)
+            yield {
+                figure_name: {
+                    "figure_name": figure_name,
+                    "article_name": "article{}".format(i),
+                    "master_images": [],
+                    "unassigned": {"captions": []},
+                }
+            }
+
+    def run(self, search_query, exsclaim_json):
+        for article_json in self._articles():
+            exsclaim_json = self._update_exsclaim(exsclaim_json, article_json)
+        return exsclaim_json
+
+    def stream(self, search_query, articles):
+        yield from articles
+        yield from self._articles()
+
+
+class FakeTagger(ExsclaimTool):
+    """Tags every figure, optionally failing after a few articles"""
+
+    def __init__(self, search_query, fail_after=None):
+        super().__init__(search_query)
+        self.fail_after = fail_after
+
+    def _load_model(self):
+        pass
+
+    def _update_exsclaim(self, exsclaim_json):
+        for figure_json in exsclaim_json.values():
+            figure_json["tagged"] = True
+        return exsclaim_json
+
+    def run(self, search_query, exsclaim_json):
+        return self._update_exsclaim(exsclaim_json)
+
+    def stream(self, search_query, articles):
+        for counter, article_json in enumerate(articles):
+            if counter == self.fail_after:
+                raise RuntimeError("tagger failed")
+            yield self._update_exsclaim(article_json)
+
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self):
+        self.results_dir = tempfile.mkdtemp()
+        self.query = {
+            "name": "streaming_test",
+            "results_dir": self.results_dir,
+            "results_dirs": self.results_dir,
+            "queue_size": 2,
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.results_dir)
+
+    def run_pipeline(self, tools, streaming):
+        pipeline = Pipeline(dict(self.query))
+        pipeline.group_objects = lambda: pipeline.exsclaim_dict
+        return pipeline.run(tools=tools, streaming=streaming)
+
+    def test_streaming_matches_sequential(self):
+        """tests streaming and sequential runs give the same exsclaim json"""
+        tools = [FakeSource(self.query), FakeTagger(self.query)]
+        sequential = self.run_pipeline(tools, streaming=False)
+        shutil.rmtree(self.results_dir)
+        os.makedirs(self.results_dir)
+        tools = [FakeSource(self.query), FakeTagger(self.query)]
+        streamed = self.run_pipeline(tools, streaming=True)
+        self.assertEqual(len(streamed), 20)
+        self.assertEqual(DeepDiff(sequential, streamed), {})
+
+    def test_failed_tool_does_not_block(self):
+        """tests a failing tool drains its input instead of deadlocking"""
+        tools = [FakeSource(self.query), FakeTagger(self.query, fail_after=3)]
+        streamed = self.run_pipeline(tools, streaming=True)
+        self.assertEqual(len(streamed), 3)
+
+    def test_streaming_options(self):
+        """tests a dict of streaming options turns streaming on with its queue size"""
+        self.query["streaming"] = {"queue_size": 1}
+        del self.query["queue_size"]
+        pipeline = Pipeline(dict(self.query))
+        pipeline.group_objects = lambda: pipeline.exsclaim_dict
+        sizes = []
+        original = queue.Queue
+
+        def recording_queue(maxsize=0):
+            sizes.append(maxsize)
+            return original(maxsize)
+
+        with unittest.mock.patch("exsclaim.pipeline.queue.Queue", recording_queue):
+            streamed = pipeline.run(tools=[FakeSource(self.query)])
+        self.assertEqual(len(streamed), 20)
+        self.assertEqual(sizes, [1])
+
+    def test_group_objects_writes_changed_figures(self):
+        """tests only figures whose captions were paired are stored again"""
+        pipeline = Pipeline(dict(self.query))
+        master_image = {"subfigure_label": {"text": "a"}}
+        caption = {"label": "a", "description": "silver", "keywords": []}
+        pipeline.exsclaim_dict = {
+            "new.jpg": {
+                "master_images": [dict(master_image)],
+                "unassigned": {"captions": [caption]},
+            },
+            "paired.jpg": {
+                "master_images": [
+                    dict(master_image, caption="gold", keywords=["Au"])
+                ],
+                "unassigned": {"captions": []},
+            },
+        }
+        written = []
+        pipeline.store.put = lambda figures: written.extend(figures)
+        pipeline.group_objects()
+        self.assertEqual(written, ["new.jpg"])
+        master_image = pipeline.exsclaim_dict["new.jpg"]["master_images"][0]
+        self.assertEqual(master_image["caption"], "silver")
+
+
 if __name__ == "__main__":
     unittest.main()
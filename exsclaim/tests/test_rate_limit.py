@@ -0,0 +1,118 @@
+import email.utils
+import time
+import unittest
+
+import responses
+
+from exsclaim.utilities import http
+from exsclaim.utilities.rate_limit import RateLimiter, TokenBucket, retry_after
+
+
+class FakeClock:
+    """Clock that only moves when slept on"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(
+            2.0, burst=3, clock=self.clock, sleep=self.clock.sleep
+        )
+
+    def test_waits_only_when_budget_is_spent(self):
+        """tests a burst is free and later requests run at exactly rate"""
+        waits = [self.bucket.acquire() for _ in range(7)]
+        self.assertEqual(waits, [0, 0, 0, 0.5, 0.5, 0.5, 0.5])
+        # an idle domain refills up to burst
+        self.clock.now += 10
+        waits = [self.bucket.acquire() for _ in range(4)]
+        self.assertEqual(waits, [0, 0, 0, 0.5])
+        self.assertEqual(self.bucket.waited, 2.5)
+
+    def test_pause(self):
+        """tests a pause delays every request and restarts without a burst"""
+        self.bucket.pause(5)
+        self.assertEqual(self.bucket.acquire(), 5)
+        self.assertEqual(self.bucket.acquire(), 0.5)
+
+    def test_no_limit(self):
+        """tests a bucket without a rate only waits out pauses"""
+        bucket = TokenBucket(None, clock=self.clock, sleep=self.clock.sleep)
+        self.assertEqual([bucket.acquire() for _ in range(100)], [0] * 100)
+        bucket.pause(3)
+        self.assertEqual(bucket.acquire(), 3)
+
+
+class TestRetryAfter(unittest.TestCase):
+    def test_retry_after(self):
+        """tests Retry-After is read as seconds or as an HTTP date"""
+        self.assertEqual(retry_after(FakeResponse(429, {"Retry-After": "7"}), 1), 7)
+        self.assertEqual(retry_after(FakeResponse(429), 1.5), 1.5)
+        self.assertEqual(retry_after(FakeResponse(429, {"Retry-After": "soon"}), 2), 2)
+        date = email.utils.formatdate(time.time() + 60, usegmt=True)
+        seconds = retry_after(FakeResponse(503, {"Retry-After": date}), 1)
+        self.assertAlmostEqual(seconds, 60, delta=2)
+
+    def test_throttled(self):
+        """tests only 429 and 503 pause a domain, within max_retry_after"""
+        limiter = RateLimiter(rate=1.0, max_retry_after=30)
+        self.assertFalse(limiter.throttled("a.org", FakeResponse(200), 0))
+        self.assertFalse(limiter.throttled("a.org", FakeResponse(404), 0))
+        too_long = FakeResponse(429, {"Retry-After": "3600"})
+        self.assertFalse(limiter.throttled("a.org", too_long, 0))
+        self.assertTrue(limiter.throttled("a.org", FakeResponse(503), 0))
+        self.assertGreater(limiter.bucket("a.org").paused_until, 0)
+
+
+class TestFetchEngineRateLimit(unittest.TestCase):
+    def setUp(self):
+        self.engine = http.FetchEngine(
+            rate=None, retries=2, domain_rates={"slow.org": 0.5}
+        )
+
+    def tearDown(self):
+        self.engine.close()
+
+    def test_domain_rates(self):
+        """tests domains can be given their own rate"""
+        self.assertEqual(self.engine.limiter.bucket("slow.org").rate, 0.5)
+        self.assertIsNone(self.engine.limiter.bucket("a.org").rate)
+
+    @responses.activate
+    def test_too_many_requests_are_retried(self):
+        """tests a 429 pauses the domain for Retry-After, then retries"""
+        url = "https://a.org/search"
+        responses.add(responses.GET, url, status=429, headers={"Retry-After": "0"})
+        responses.add(responses.GET, url, body="results")
+        response = self.engine.get(url)
+        self.assertEqual((response.status_code, response.text), (200, "results"))
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_retries_are_bounded(self):
+        """tests a domain that keeps throttling is given up on"""
+        url = "https://a.org/search"
+        responses.add(responses.GET, url, status=429, headers={"Retry-After": "0"})
+        self.assertEqual(self.engine.get(url).status_code, 429)
+        self.assertEqual(len(responses.calls), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
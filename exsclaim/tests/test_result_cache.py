@@ -0,0 +1,70 @@
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+from exsclaim.utilities.result_cache import ResultCache, file_digest, make_key
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = pathlib.Path(tempfile.mkdtemp())
+        self.path = self.directory / "results.sqlite3"
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_results_survive_restart(self):
+        """tests results are read back by a new cache and counted"""
+        cache = ResultCache(self.path)
+        key = make_key("abc", {"conf": 0.8})
+        self.assertIsNone(cache.get(key))
+        cache.put(key, {"master_images": [{"classification": "subfigure"}]})
+        cache.close()
+
+        restart = ResultCache(self.path)
+        self.assertEqual(
+            restart.get(key), {"master_images": [{"classification": "subfigure"}]}
+        )
+        self.assertIsNone(restart.get(make_key("abc", {"conf": 0.5})))
+        stats = restart.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["entries"], 1)
+        restart.close()
+
+    def test_least_recently_used_are_evicted(self):
+        """tests the cache stays under its size by dropping unused results"""
+        value = {"master_images": ["x" * 100]}
+        cache = ResultCache(self.path, max_bytes=400)
+        for key in ["a", "b", "c"]:
+            cache.put(key, value)
+        cache.get("a")
+        cache.put("d", value)
+        self.assertIsNone(cache.get("b"))
+        for key in ["a", "c", "d"]:
+            self.assertEqual(cache.get(key), value)
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["evictions"]), (3, 1))
+        self.assertLessEqual(stats["bytes"], 400)
+        cache.close()
+
+    def test_keys_depend_on_content(self):
+        """tests a figure's key follows its bytes, not its name"""
+        for name, content in [("fig1.png", b"one"), ("fig2.png", b"one")]:
+            (self.directory / name).write_bytes(content)
+        self.assertEqual(
+            file_digest(self.directory / "fig1.png"),
+            file_digest(self.directory / "fig2.png"),
+        )
+        (self.directory / "fig2.png").write_bytes(b"two")
+        self.assertNotEqual(
+            file_digest(self.directory / "fig1.png"),
+            file_digest(self.directory / "fig2.png"),
+        )
+        self.assertEqual(
+            make_key("d", {"a": 1, "b": 2}), make_key("d", {"b": 2, "a": 1})
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from exsclaim.utilities import ledger, shard
+from exsclaim.utilities.ledger import Ledger
+from exsclaim.utilities.merge import find_shards, merge_shards
+from exsclaim.utilities.store import FigureStore
+
+
+class TestSharding(unittest.TestCase):
+    def test_partition_is_deterministic_and_complete(self):
+        """tests every article is in exactly one shard"""
+        articles = ["/articles/s41467-018-{:05d}-3".format(i) for i in range(200)]
+        shards = [
+            {
+                article
+                for article in articles
+                if shard.in_shard(article, {"shard": {"index": i, "count": 4}})
+            }
+            for i in range(4)
+        ]
+        self.assertEqual(sum(len(s) for s in shards), len(articles))
+        self.assertEqual(set().union(*shards), set(articles))
+        for s in shards:
+            self.assertGreater(len(s), 0)
+        # the url and the bare article name are in the same shard
+        self.assertEqual(
+            shard.shard_of(articles[0], 4), shard.shard_of(articles[0].split("/")[-1], 4)
+        )
+
+    def test_slurm_array(self):
+        """tests the shard is read from SLURM array job variables"""
+        environment = {
+            "SLURM_ARRAY_TASK_ID": "3",
+            "SLURM_ARRAY_TASK_MIN": "1",
+            "SLURM_ARRAY_TASK_COUNT": "4",
+        }
+        with mock.patch.dict(os.environ, environment):
+            self.assertEqual(shard.get_shard({"name": "test"}), (2, 4))
+            self.assertEqual(
+                shard.shard_name({"name": "test"}),
+                os.path.join("test", "shard_002_of_004"),
+            )
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(shard.get_shard({"name": "test"}), (0, 1))
+            self.assertEqual(shard.shard_name({"name": "test"}), "test")
+
+
+class TestMerge(unittest.TestCase):
+    def setUp(self):
+        self.results_directory = tempfile.mkdtemp()
+        self.expected = {}
+        for index in range(3):
+            shard_directory = os.path.join(
+                self.results_directory, "shard_{:03d}_of_003".format(index)
+            )
+            store = FigureStore(shard_directory)
+            run = Ledger(shard_directory)
+            for i in range(index, 30, 3):
+                name = "article{}_fig1.jpg".format(i)
+                figure_json = {"figure_name": name, "shard": index}
+                store.put({name: figure_json})
+                run.record(ledger.FIGURE_SEPARATOR, "article{}".format(i), name)
+                self.expected[name] = figure_json
+            store.close()
+            run.close()
+            os.makedirs(os.path.join(shard_directory, "figures"))
+            with open(os.path.join(shard_directory, "figures", "f{}.jpg".format(index)), "w"):
+                pass
+
+    def tearDown(self):
+        shutil.rmtree(self.results_directory)
+
+    def test_merge_shards(self):
+        """tests shards merge into one sorted store, exsclaim.json and ledger"""
+        shards = find_shards(self.results_directory)
+        self.assertEqual(len(shards), 3)
+        count = merge_shards(shards, self.results_directory)
+        self.assertEqual(count, 30)
+
+        with open(os.path.join(self.results_directory, "exsclaim.json")) as f:
+            exported = f.read()
+        self.assertEqual(json.loads(exported), self.expected)
+        self.assertEqual(
+            exported, json.dumps(dict(sorted(self.expected.items())), indent=3)
+        )
+        self.assertEqual(FigureStore(self.results_directory).load(), self.expected)
+        self.assertEqual(
+            Ledger(self.results_directory).completed(ledger.FIGURE_SEPARATOR),
+            set(self.expected),
+        )
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.results_directory, "figures"))),
+            ["f0.jpg", "f1.jpg", "f2.jpg"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
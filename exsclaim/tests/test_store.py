@@ -0,0 +1,127 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from exsclaim.utilities import boxes, schema
+from exsclaim.utilities.store import COMPACTED, FigureStore
+
+
+class TestFigureStore(unittest.TestCase):
+    def setUp(self):
+        self.results_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.results_directory)
+
+    def test_last_write_wins(self):
+        """tests the most recent record of a figure is the one loaded"""
+        store = FigureStore(self.results_directory)
+        store.put({"a.jpg": {"figure_name": "a.jpg", "version": 1}})
+        store.put({"b.jpg": {"figure_name": "b.jpg", "version": 1}})
+        store.put({"a.jpg": {"figure_name": "a.jpg", "version": 2}})
+        store.close()
+        loaded = FigureStore(self.results_directory).load()
+        self.assertEqual(loaded["a.jpg"]["version"], 2)
+        self.assertEqual(loaded["b.jpg"]["version"], 1)
+
+    def test_truncated_record_is_skipped(self):
+        """tests a line cut off by a crash does not lose other figures"""
+        store = FigureStore(self.results_directory)
+        store.put({"a.jpg": {"figure_name": "a.jpg"}})
+        store.segment.write('{"figure_name": "b.jpg", "fig')
+        store.close()
+        store = FigureStore(self.results_directory)
+        store.put({"c.jpg": {"figure_name": "c.jpg"}})
+        self.assertEqual(set(store.load()), {"a.jpg", "c.jpg"})
+
+    def test_compact_and_export(self):
+        """tests compaction merges segments and export writes exsclaim.json"""
+        store = FigureStore(self.results_directory, segment_size=1)
+        for name in ["c.jpg", "a.jpg", "b.jpg", "a.jpg"]:
+            store.put({name: {"figure_name": name}})
+        expected = store.load()
+        store.compact()
+        self.assertEqual(os.listdir(store.directory), [COMPACTED])
+        with open(store.directory / COMPACTED) as f:
+            names = [json.loads(line)["figure_name"] for line in f]
+        self.assertEqual(names, ["a.jpg", "b.jpg", "c.jpg"])
+        store.put({"d.jpg": {"figure_name": "d.jpg"}})
+        expected["d.jpg"] = {"figure_name": "d.jpg"}
+        exported = store.export()
+        with open(os.path.join(self.results_directory, "exsclaim.json")) as f:
+            self.assertEqual(json.load(f), expected)
+        self.assertEqual(exported, expected)
+
+    def test_compaction_streams_segments(self):
+        """tests compaction keeps the latest records without loading the store"""
+        store = FigureStore(self.results_directory, segment_size=1)
+        store.put({"b.jpg": {"version": 1}, "a.jpg": {"version": 1}})
+        store.compact()
+        store.put({"b.jpg": {"version": 2}, "c.jpg": {"version": 1}})
+        store.put({"b.jpg": {"version": 3}})
+        store.load = None
+        self.assertEqual(store.compact(), 3)
+        self.assertEqual(
+            list(store.sorted_records()),
+            [
+                ("a.jpg", {"version": 1}),
+                ("b.jpg", {"version": 3}),
+                ("c.jpg", {"version": 1}),
+            ],
+        )
+        self.assertEqual(os.listdir(store.directory), [COMPACTED])
+
+    def test_imports_existing_exsclaim_json(self):
+        """tests an exsclaim.json from an older run seeds a new store"""
+        exsclaim_json = {"a.jpg": {"figure_name": "a.jpg"}}
+        with open(os.path.join(self.results_directory, "exsclaim.json"), "w") as f:
+            json.dump(exsclaim_json, f)
+        self.assertEqual(FigureStore(self.results_directory).load(), exsclaim_json)
+
+
+    def test_compact_geometry(self):
+        """tests compact exsclaim.json files round trip and seed a new store"""
+        geometry = boxes.convert_coords_to_labelbox([1, 2, 30, 40])
+        figure_json = {
+            "figure_name": "a.jpg",
+            "master_images": [
+                {
+                    "geometry": geometry,
+                    "subfigure_label": {"text": "a", "geometry": []},
+                    "scale_bars": [{"geometry": geometry, "label": None}],
+                }
+            ],
+        }
+        store = FigureStore(self.results_directory)
+        store.put({"a.jpg": figure_json})
+        store.compact(compact_geometry=True)
+        store.export(compact=True)
+        path = os.path.join(self.results_directory, "exsclaim.json")
+        with open(path) as f:
+            document = json.load(f)
+        self.assertEqual((document["schema"], document["version"]), (schema.SCHEMA, 1))
+        master_image = document["figures"]["a.jpg"]["master_images"][0]
+        self.assertEqual(master_image["geometry"], [1, 2, 30, 40])
+        self.assertEqual(master_image["scale_bars"][0]["geometry"], [1, 2, 30, 40])
+        self.assertEqual(master_image["subfigure_label"]["geometry"], [])
+        self.assertEqual(schema.load(path, expand=True), {"a.jpg": figure_json})
+        self.assertEqual(boxes.convert_labelbox_to_coords(geometry), (1, 2, 30, 40))
+        self.assertEqual(
+            boxes.convert_labelbox_to_coords(master_image["geometry"]), (1, 2, 30, 40)
+        )
+        # the store reads back either form, and exports either form
+        store.close()
+        shutil.rmtree(store.directory)
+        store = FigureStore(self.results_directory)
+        self.assertEqual(schema.expand_figures(store.load()), {"a.jpg": figure_json})
+        store.export()
+        with open(path) as f:
+            self.assertEqual(json.load(f), {"a.jpg": figure_json})
+        document["version"] = 2
+        with self.assertRaises(ValueError):
+            schema.figures(document)
+
+if __name__ == "__main__":
+    unittest.main()
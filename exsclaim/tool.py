@@ -12,39 +12,20 @@ import logging
 import os
 import time
 from abc import ABC, abstractmethod
-from . import caption, journal
-from .utilities import paths
+from .utilities import paths, shard
+from .utilities import ledger
 from .utilities.logging import Printer
+from .utilities.store import get_store
 import glob
-import requests
-from bs4 import BeautifulSoup
 import shutil
 import pathlib
-import shutil
-import cv2
-import numpy as np
-from PIL import Image
-import numpy as np
-from bs4 import BeautifulSoup
-from langchain.embeddings import OpenAIEmbeddings
-import fitz  # PyMuPDF
 import base64 
 import io
 import hashlib
-try:
-    from selenium_stealth import stealth
-    from selenium import webdriver
-    from selenium.common.exceptions import TimeoutException
-    from selenium.webdriver.common.by import By
-    from selenium.webdriver.support import expected_conditions as EC
-    from selenium.webdriver.support.ui import WebDriverWait
-    from webdriver_manager.chrome import ChromeDriverManager
-    from selenium.webdriver.chrome.options import Options
-    from selenium.webdriver.chrome.service import Service
-    from selenium.webdriver.common.action_chains import ActionChains
-    from selenium.webdriver.common.keys import Keys
-except:
-    pass
+
+# Heavy dependencies (langchain, cv2, fitz, selenium, ...) are
+# imported by the methods that use them, so that importing this module
+# only costs what the selected tools need.
 
 class ExsclaimTool(ABC):
     def __init__(self, search_query):
@@ -70,10 +51,42 @@ class ExsclaimTool(ABC):
         base_results_dir = paths.initialize_results_dir(
             self.search_query.get("results_dirs", None)
         )
-        self.results_directory = base_results_dir / self.search_query["name"]
+        self.results_directory = base_results_dir / shard.shard_name(self.search_query)
         # set up logging / printing
         self.print = "print" in self.search_query.get("logging", [])
 
+    @property
+    def store(self):
+        """FigureStore that figures from this tool are written to"""
+        return get_store(self.results_directory)
+
+    @property
+    def ledger(self):
+        """Ledger recording the articles and figures this tool has finished"""
+        return ledger.get_ledger(self.results_directory)
+
+    def _commit_figure(self, stage, exsclaim_json, figure_name, success=True):
+        """Save one processed figure and record it in the ledger
+
+        The figure is written to the store before the ledger records it as
+        done, so a crash in between repeats the work instead of losing it.
+
+        Args:
+            stage (str): name of the stage, e.g. ledger.FIGURE_SEPARATOR
+            exsclaim_json (dict): An EXSCLAIM JSON containing figure_name
+            figure_name (str): name of the figure that was processed
+            success (bool): False if processing the figure failed
+        """
+        figure_json = exsclaim_json[figure_name]
+        if success:
+            self.store.put({figure_name: figure_json})
+        self.ledger.record(
+            stage,
+            figure_json.get("article_name", ""),
+            figure_name,
+            ledger.DONE if success else ledger.FAILED,
+        )
+
     @abstractmethod
     def _load_model(self):
         pass
@@ -86,6 +99,26 @@ class ExsclaimTool(ABC):
     def run(self):
         pass
 
+    def stream(self, search_query, articles):
+        """Run the tool on a stream of articles instead of a whole corpus
+
+        Tools that can work on one article at a time override this so that
+        Pipeline can overlap them. The default collects every incoming
+        article, runs the tool once, and yields the result as a single
+        batch, so the tool acts as a barrier in a streaming pipeline.
+
+        Args:
+            search_query (dict): A Search Query JSON to guide search
+            articles (iterable of dicts): EXSCLAIM JSONs, one per article,
+                from the previous tool in the pipeline
+        Yields:
+            exsclaim_json (dict): An EXSCLAIM JSON the tool has finished with
+        """
+        exsclaim_json = {}
+        for article_json in articles:
+            exsclaim_json.update(article_json)
+        yield self.run(search_query, exsclaim_json)
+
     def display_info(self, info):
         """Display information to the user as the specified in the query
 
@@ -107,10 +140,10 @@ class JournalScraper(ExsclaimTool):
     """
 
     journals = {
-        "acs": journal.ACS,
-        "nature": journal.Nature,
-        "rsc": journal.RSC,
-        "wiley": journal.Wiley,
+        "acs": "ACS",
+        "nature": "Nature",
+        "rsc": "RSC",
+        "wiley": "Wiley",
     }
 
     def __init__(self, search_query):
@@ -134,30 +167,14 @@ class JournalScraper(ExsclaimTool):
         exsclaim_dict.update(article_dict)
         return exsclaim_dict
 
-    def _appendJSON(self, filename, exsclaim_json):
-        """Commit updates to exsclaim json and update list of scraped articles
-
-        Args:
-            filename (string): File in which to store the updated EXSCLAIM JSON
-            exsclaim_json (dict): Updated EXSCLAIM JSON
-        """
-        with open(filename, "w") as f:
-            json.dump(exsclaim_json, f, indent=3)
-        articles_file = self.results_directory / "_articles"
-        with open(articles_file, "a") as f:
-            for article in self.new_articles_visited:
-                f.write("%s\n" % article.split("/")[-1])
-
-    def run(self, search_query, exsclaim_json={}):
-        """Run the JournalScraper to find relevant article figures
+    def _get_journal_family(self, search_query):
+        """Instantiate the JournalFamily named in the search query
 
         Args:
             search_query (dict): A Search Query JSON to guide search
-            exsclaim_json (dict): An EXSCLAIM JSON to store results in
         Returns:
-            exsclaim_json (dict): Updated with results of search
+            j_instance (JournalFamily): journal family to scrape
         """
-        self.display_info("Running Journal Scraper\n")
         # Checks that user inputted journal family has been defined and
         # grabs instantiates an instance of the journal family object
         journal_family_name = search_query["journal_family"]
@@ -165,15 +182,41 @@ class JournalScraper(ExsclaimTool):
             raise NameError(
                 "journal family {0} is not defined".format(journal_family_name)
             )
-        journal_subclass = self.journals[journal_family_name]
-        j_instance = journal_subclass(search_query)
+        from . import journal
 
-        os.makedirs(self.results_directory, exist_ok=True)
-        t0 = time.time()
-        counter = 1
-        articles = j_instance.get_article_extensions()
-        # Extract figures, captions, and metadata from each article
-        for article in articles:
+        journal_subclass = getattr(journal, self.journals[journal_family_name])
+        return journal_subclass(search_query)
+
+    def _scrape_articles(self, j_instance):
+        """Extract figures, captions, and metadata from each found article
+
+        Args:
+            j_instance (JournalFamily): journal family to scrape
+        Yields:
+            (article, article_dict): the article url path and the EXSCLAIM
+                JSON of its figures, for each article scraped successfully.
+                Each is saved and recorded in the ledger before it is yielded.
+                The query's watermark is updated once every article is done
+        """
+        articles = [
+            article
+            for article in j_instance.get_article_extensions()
+            if shard.in_shard(article, self.search_query)
+        ]
+        from .utilities import http
+
+        # articles are fetched on a pool of threads, but saved and recorded
+        # here, in order, as each finishes
+        workers = j_instance.fetch.article_workers
+        if not j_instance.concurrent_articles:
+            workers = 1
+        scraped = http.imap(
+            lambda article: j_instance.get_article_figures(j_instance.domain + article),
+            articles,
+            workers,
+        )
+        scraped_articles = []
+        for counter, (article, future) in enumerate(scraped, start=1):
             self.display_info(
                 ">>> ({0} of {1}) Extracting figures from: ".format(
                     counter, len(articles)
@@ -181,25 +224,34 @@ class JournalScraper(ExsclaimTool):
                 + article.split("/")[-1]
             )
             try:
-                request = j_instance.domain + article
-                article_dict = j_instance.get_article_figures(request)
-                exsclaim_json = self._update_exsclaim(exsclaim_json, article_dict)
-                self.new_articles_visited.add(article)
+                article_dict = future.result()
             except Exception:
-                 pass
-            #     exception_string = (
-            #        "<!> ERROR: An exception occurred in"
-            #        " JournalScraper on article: {}".format(article)
-            #     )
-            #     if self.print:
-            #        Printer(exception_string + "\n")
-            #     self.logger.exception(exception_string)
-
-            # Save to file every N iterations (to accomodate restart scenarios)
-            if counter % 1000 == 0:
-                self._appendJSON(
-                    self.results_directory / "exsclaim.json", exsclaim_json
-                )
+                self.ledger.record(ledger.JOURNAL_SCRAPER, article, status=ledger.FAILED)
+                continue
+            self.store.put(article_dict)
+            self.ledger.record(ledger.JOURNAL_SCRAPER, article)
+            self.new_articles_visited.add(article)
+            scraped_articles.append(article)
+            yield article, article_dict
+        j_instance.update_watermark(scraped_articles)
+
+    def run(self, search_query, exsclaim_json={}):
+        """Run the JournalScraper to find relevant article figures
+
+        Args:
+            search_query (dict): A Search Query JSON to guide search
+            exsclaim_json (dict): An EXSCLAIM JSON to store results in
+        Returns:
+            exsclaim_json (dict): Updated with results of search
+        """
+        self.display_info("Running Journal Scraper\n")
+        j_instance = self._get_journal_family(search_query)
+
+        os.makedirs(self.results_directory, exist_ok=True)
+        t0 = time.time()
+        counter = 1
+        for _, article_dict in self._scrape_articles(j_instance):
+            exsclaim_json = self._update_exsclaim(exsclaim_json, article_dict)
             counter += 1
 
         t1 = time.time()
@@ -208,9 +260,41 @@ class JournalScraper(ExsclaimTool):
                 t1 - t0, int(counter - 1)
             )
         )
-        self._appendJSON(self.results_directory / "exsclaim.json", exsclaim_json)
+        self._display_cache_stats(j_instance)
         return exsclaim_json
 
+    def _display_cache_stats(self, j_instance):
+        """Report the HTTP cache's hits and misses"""
+        cache = j_instance.fetch.cache
+        if cache is None:
+            return
+        self.display_info(
+            "HTTP cache: {hits} hits, {revalidated} revalidated, {misses} misses,"
+            " {evictions} evicted, {entries} responses ({bytes} bytes)"
+            " stored\n".format(**cache.stats())
+        )
+
+    def stream(self, search_query, articles=()):
+        """Yield each article's figures as soon as the article is scraped
+
+        The JournalScraper is a source: incoming articles are passed through
+        unchanged before any new articles are scraped.
+
+        Args:
+            search_query (dict): A Search Query JSON to guide search
+            articles (iterable of dicts): EXSCLAIM JSONs of articles already
+                found, e.g. from a previous run
+        Yields:
+            article_dict (dict): An EXSCLAIM JSON of one article's figures
+        """
+        yield from articles
+        self.display_info("Running Journal Scraper\n")
+        j_instance = self._get_journal_family(search_query)
+        os.makedirs(self.results_directory, exist_ok=True)
+        for _, article_dict in self._scrape_articles(j_instance):
+            yield article_dict
+        self._display_cache_stats(j_instance)
+
 
 class HTMLScraper(ExsclaimTool):
     """
@@ -233,12 +317,20 @@ class HTMLScraper(ExsclaimTool):
         base_results_dir = paths.initialize_results_dir(
             self.search_query.get("results_dirs", None)
         )
-        self.results_directory = base_results_dir / self.search_query["name"]
+        self.results_directory = base_results_dir / shard.shard_name(self.search_query)
         figures_directory = self.results_directory / "figures"
         os.makedirs(figures_directory, exist_ok=True)
+        from .utilities import http
+
+        # rate limits figure loads in the driver
+        self.fetch = http.get_engine(self.search_query)
 
         # initiallize the selenium-stealth
         try:
+          from selenium import webdriver
+          from selenium.webdriver.chrome.service import Service
+          from selenium_stealth import stealth
+
           options = webdriver.ChromeOptions()
           options.add_argument("--headless")
           options.add_argument("--no-sandbox")
@@ -266,6 +358,11 @@ class HTMLScraper(ExsclaimTool):
     def save_figures_rsc(self, filename):
 
         # Load the HTML file and create a BeautifulSoup object
+        from bs4 import BeautifulSoup
+        import cv2
+        import numpy as np
+        from PIL import Image
+
         with open(filename, "r", encoding="utf-8") as file:
             html_content = file.read()
 
@@ -295,6 +392,7 @@ class HTMLScraper(ExsclaimTool):
 
 
             if img_url is not None:
+                self.fetch.throttle(img_url)
                 self.driver.get(img_url)
 
             figure_name = article_name + "_fig" + str(figure_number) + ".png"
@@ -332,7 +430,6 @@ class HTMLScraper(ExsclaimTool):
             figure_path = os.path.join(figures_directory , figure_name)
 
             with open(figure_path, 'wb') as out_file:
-                time.sleep(3)
                 self.driver.save_screenshot(figure_path)
 
                 # Load the image
@@ -358,6 +455,11 @@ class HTMLScraper(ExsclaimTool):
 
     def save_figures_wiley(self, filename):
         # Load the HTML file and create a BeautifulSoup object
+        from bs4 import BeautifulSoup
+        import cv2
+        import numpy as np
+        from PIL import Image
+
         with open(filename, "r", encoding="utf-8") as file:
             html_content = file.read()
 
@@ -389,6 +491,7 @@ class HTMLScraper(ExsclaimTool):
 
           if img_tags is not None:
             img_url = 'https://onlinelibrary.wiley.com' + img_tags
+            self.fetch.throttle(img_url)
             self.driver.get(img_url)
 
             # Extract caption
@@ -482,7 +585,6 @@ class HTMLScraper(ExsclaimTool):
               # print('figurepath',figure_path )
 
               with open(figure_path, 'wb') as out_file:
-                time.sleep(3)
                 self.driver.save_screenshot(figure_path)
 
                 # Load the image
@@ -508,6 +610,11 @@ class HTMLScraper(ExsclaimTool):
 
     def save_figures_acs(self, filename):
     # Load the HTML file and create a BeautifulSoup object
+        from bs4 import BeautifulSoup
+        import cv2
+        import numpy as np
+        from PIL import Image
+
         with open(filename, "r", encoding="utf-8") as file:
             html_content = file.read()
 
@@ -550,6 +657,7 @@ class HTMLScraper(ExsclaimTool):
                       if caption is not None:
                         figure_caption += caption.get_text()
                     if img_url is not None:
+                      self.fetch.throttle(img_url)
                       self.driver.get(img_url)
                       #response = requests.get(img_url, stream=True)
 
@@ -588,7 +696,6 @@ class HTMLScraper(ExsclaimTool):
                       figure_path = os.path.join(figures_directory , figure_name)
 
                       with open(figure_path, 'wb') as out_file:
-                        time.sleep(3)
                         self.driver.save_screenshot(figure_path)
 
                         # Load the image
@@ -614,6 +721,9 @@ class HTMLScraper(ExsclaimTool):
 
     def save_figures_nature(self, filename):
         # Load the HTML file and create a BeautifulSoup object
+        from bs4 import BeautifulSoup
+        import requests
+
         with open(filename, "r", encoding="utf-8") as file:
             html_content = file.read()
 
@@ -690,6 +800,8 @@ class HTMLScraper(ExsclaimTool):
         pass
 
     def get_journal(self, filename):
+        from bs4 import BeautifulSoup
+
         keywords = ['acs', 'nature', 'wiley', 'rsc']
         category = None
 
@@ -721,19 +833,9 @@ class HTMLScraper(ExsclaimTool):
                 contents added.
         """
         exsclaim_dict.update(article_dict)
+        self.store.put(article_dict)
         return exsclaim_dict
 
-    def _appendJSON(self, filename, exsclaim_json):
-        """Commit updates to exsclaim json and update list of scraped articles
-
-        Args:
-            filename (string): File in which to store the updated EXSCLAIM JSON
-            exsclaim_json (dict): Updated EXSCLAIM JSON
-        """
-        with open(filename, "w") as f:
-            json.dump(exsclaim_json, f, indent=3)
-        articles_file = self.results_directory / "_articles"
-
     def run(self, search_query, exsclaim_json={}):
         """Run the HTMLScraper to retrieve figures from user provided htmls
 
@@ -743,13 +845,19 @@ class HTMLScraper(ExsclaimTool):
         Returns:
             exsclaim_json (dict): Updated with results of search
         """
+        from bs4 import BeautifulSoup
+
         self.display_info("Running HTML Scraper\n")
 
         directory_path = search_query["html_folder"]
         os.makedirs(self.results_directory, exist_ok=True)
         t0 = time.time()
         counter = 1
-        articles = glob.glob(os.path.join(directory_path, '*.html'))
+        articles = [
+            article
+            for article in glob.glob(os.path.join(directory_path, '*.html'))
+            if shard.in_shard(article, search_query)
+        ]
 
         html_directory = self.results_directory / "html"
         os.makedirs(html_directory, exist_ok=True)
@@ -799,10 +907,6 @@ class HTMLScraper(ExsclaimTool):
 
             exsclaim_json = self._update_exsclaim(exsclaim_json, article_dict)
 
-            if counter % 1000 == 0:
-                self._appendJSON(
-                    self.results_directory / "exsclaim.json", exsclaim_json
-                )
             counter += 1
 
         t1 = time.time()
@@ -811,7 +915,6 @@ class HTMLScraper(ExsclaimTool):
                 t1 - t0, int(counter - 1)
             )
         )
-        self._appendJSON(self.results_directory / "exsclaim.json", exsclaim_json)
         return exsclaim_json
 
 
@@ -836,7 +939,7 @@ class PDFScraper(ExsclaimTool):
         base_results_dir = paths.initialize_results_dir(
             self.search_query.get("results_dirs", None)
         )
-        self.results_directory = base_results_dir / self.search_query["name"]
+        self.results_directory = base_results_dir / shard.shard_name(self.search_query)
         figures_directory = self.results_directory / "figures"
         os.makedirs(figures_directory, exist_ok=True)
 
@@ -846,6 +949,8 @@ class PDFScraper(ExsclaimTool):
             return base64.b64encode(image_file.read()).decode('utf-8') 
 
     def read_figure_captions(self,img_path, api_key ):
+        import requests
+
         prompt = """The provided image is a page from a literature paper. Please perform the following steps as accurately as possible:
             1. Identify and return in the correct order they are located (the index 0 figure or scheme is located on the top left of the page) in the page the figure name and the full caption that describe the figure or scheme depicted on this page.
             2. If a figure caption or scheme is not found directly above or under the image then do not consider it as an image caption or scheme and return 'N/A.
@@ -1049,6 +1154,8 @@ class PDFScraper(ExsclaimTool):
     #     return image_metadata
 
     def extract_images_from_pdf(self, pdf_path, output_folder, logo_hashes):
+        import fitz  # PyMuPDF
+
         pdf_document = fitz.open(pdf_path)
         image_counter = 0
         image_metadata = []
@@ -1172,6 +1279,9 @@ class PDFScraper(ExsclaimTool):
         return image_metadata
 
     def extract_captions_from_pdf(self, pdf_path, dpi=300):
+        from PIL import Image
+        import fitz  # PyMuPDF
+
         captions = {}
         pdf_document = fitz.open(pdf_path)
         for page_num, page in enumerate(pdf_document):
@@ -1251,6 +1361,8 @@ class PDFScraper(ExsclaimTool):
 
 
     def extract_title_from_pdf(self, pdf_path):
+        import fitz  # PyMuPDF
+
         pdf_document = fitz.open(pdf_path)
         
         # Get the title from metadata
@@ -1333,22 +1445,13 @@ class PDFScraper(ExsclaimTool):
                 contents added.
         """
         exsclaim_dict.update(article_dict)
+        self.store.put(article_dict)
         return exsclaim_dict
 
-    def _appendJSON(self, filename, exsclaim_json):
-        """Commit updates to exsclaim json and update list of scraped articles
-
-        Args:
-            filename (string): File in which to store the updated EXSCLAIM JSON
-            exsclaim_json (dict): Updated EXSCLAIM JSON
-        """
-        with open(filename, "w") as f:
-            json.dump(exsclaim_json, f, indent=3)
-        articles_file = self.results_directory / "_articles"
-
-
     def extract_text_from_pdf(self, pdf_path):
         "Extracts text from a PDF file and saves it a txt"
+        import fitz  # PyMuPDF
+
         pdf_document = fitz.open(pdf_path)
         pdf_text = ""
         for page_num in range(len(pdf_document)):
@@ -1371,7 +1474,11 @@ class PDFScraper(ExsclaimTool):
         os.makedirs(self.results_directory, exist_ok=True)
         t0 = time.time()
         counter = 1
-        articles = glob.glob(os.path.join(directory_path, '*.pdf'))
+        articles = [
+            article
+            for article in glob.glob(os.path.join(directory_path, '*.pdf'))
+            if shard.in_shard(article, search_query)
+        ]
         pdf_directory = self.results_directory / "pdf"
         os.makedirs(pdf_directory, exist_ok=True)
         print('articles', articles)
@@ -1398,10 +1505,6 @@ class PDFScraper(ExsclaimTool):
 
             exsclaim_json = self._update_exsclaim(exsclaim_json, article_dict)
 
-            if counter % 1000 == 0:
-                self._appendJSON(
-                    self.results_directory / "exsclaim.json", exsclaim_json
-                )
             counter += 1
 
         t1 = time.time()
@@ -1410,7 +1513,6 @@ class PDFScraper(ExsclaimTool):
                 t1 - t0, int(counter - 1)
             )
         )
-        self._appendJSON(self.results_directory / "exsclaim.json", exsclaim_json)
         # exsclaim_json = self.clean_json_file(exsclaim_json)
         return exsclaim_json
 
@@ -1431,6 +1533,8 @@ class CaptionDistributor(ExsclaimTool):
         self.model_path = ""
 
     def _load_model(self):
+        from . import caption
+
         if "" in self.model_path:
             self.model_path = os.path.dirname(__file__) + "/captions/models/"
         return caption.load_models(self.model_path)
@@ -1452,11 +1556,12 @@ class CaptionDistributor(ExsclaimTool):
 
     def _update_exsclaim(self,search_query,  exsclaim_dict, figure_name, delimiter, caption_dict):
         
+        from . import caption
+
         llm = search_query["llm"]
         api = search_query["openai_API"]
         exsclaim_dict[figure_name]["caption_delimiter"] = delimiter
         html_filename = exsclaim_dict[figure_name]["article_name"]
-        embeddings = OpenAIEmbeddings( openai_api_key=api)
         file_path = os.path.join("tools", "exsclaim", "output", search_query["name"], "html", f'{html_filename}.html')
 
         # loader = UnstructuredHTMLLoader(file_path)
@@ -1478,23 +1583,48 @@ class CaptionDistributor(ExsclaimTool):
 
         return exsclaim_dict
 
-    def _appendJSON(self, exsclaim_json, captions_distributed):
-        """Commit updates to EXSCLAIM JSON and updates list of ed figures
+    def _distribute_captions(self, search_query, exsclaim_json, figure_name):
+        """Separate the full caption of one figure into subfigure captions
 
         Args:
-            results_directory (string): Path to results directory
-            exsclaim_json (dict): Updated EXSCLAIM JSON
-            figures_separated (set): Figures which have already been separated
+            search_query (dict): A Search Query JSON to guide search
+            exsclaim_json (dict): An EXSCLAIM JSON containing figure_name
+            figure_name (str): name of the figure to distribute captions for
+        Returns:
+            success (bool): True if the captions were distributed
+        Modifies:
+            exsclaim_json[figure_name]["unassigned"]["captions"]
         """
-        with open(self.results_directory / "exsclaim.json", "w") as f:
-            json.dump(exsclaim_json, f, indent=3)
-        try:    
-            with open(self.results_directory / "_captions", "a+") as f:
-                for figure in captions_distributed:
-                    f.write("%s\n" % figure.split("/")[-1])
-        except:
-            with open(self.results_directory / "_captions", "a+", encoding='utf-8') as f:
-                    f.write("%s\n" % figure.split("/")[-1])
+        from . import caption
+
+        try:
+            caption_text = exsclaim_json[figure_name]["full_caption"]
+            self.logger.debug("Full caption: {}".format(caption_text))
+            #delimiter = caption.find_subfigure_delimiter(model, caption_text)
+            delimiter = 0
+            llm = search_query["llm"]
+            api = search_query["openai_API"]
+            caption_dict = caption.separate_captions(caption_text, api, llm)
+            self.logger.debug("Subfigure captions: {}".format(caption_dict))
+            self._update_exsclaim(search_query,
+                exsclaim_json, figure_name, delimiter, caption_dict
+            )
+            return True
+        except Exception:
+            if self.print:
+                Printer(
+                    (
+                        "<!> ERROR: An exception occurred in"
+                        " CaptionDistributor on figue: {}".format(figure_name)
+                    )
+                )
+            self.logger.exception(
+                (
+                    "<!> ERROR: An exception occurred in"
+                    " CaptionDistributor on figue: {}".format(figure_name)
+                )
+            )
+            return False
 
     def run(self, search_query, exsclaim_json):
         """Run the CaptionDistributor to distribute subfigure captions
@@ -1511,14 +1641,7 @@ class CaptionDistributor(ExsclaimTool):
         t0 = time.time()
 
         # List captions that have already been distributed
-        captions_file = self.results_directory / "_captions"
-        if os.path.isfile(captions_file):
-            with open(captions_file, "r") as f:
-                contents = f.readlines()
-            captions_distributed = {f.strip() for f in contents}
-        else:
-            captions_distributed = set()
-        new_captions_distributed = set()
+        captions_distributed = self.ledger.completed(ledger.CAPTION_DISTRIBUTOR)
 
         figures = [
             exsclaim_json[figure]["figure_name"]
@@ -1532,40 +1655,12 @@ class CaptionDistributor(ExsclaimTool):
                 + "Parsing captions from: "
                 + figure_name
             )
-            try:
-                caption_text = exsclaim_json[figure_name]["full_caption"]
-                print('full caption',caption_text)
-                #delimiter = caption.find_subfigure_delimiter(model, caption_text)
-                delimiter = 0
-                llm = search_query["llm"]
-                #print('llm', llm)
-                api = search_query["openai_API"]
-                #print('api',api)
-                caption_dict = caption.separate_captions(caption_text, api, llm)
-                print('full caption dict', caption_dict )
-                exsclaim_json = self._update_exsclaim(search_query,
-                    exsclaim_json, figure_name, delimiter, caption_dict
-                )
-                new_captions_distributed.add(figure_name)
-            except Exception:
-                #pass
-                if self.print:
-                    Printer(
-                        (
-                            "<!> ERROR: An exception occurred in"
-                            " CaptionDistributor on figue: {}".format(figure_name)
-                        )
-                    )
-                self.logger.exception(
-                    (
-                        "<!> ERROR: An exception occurred in"
-                        " CaptionDistributor on figue: {}".format(figure_name)
-                    )
-                )
-            # Save to file every N iterations (to accomodate restart scenarios)
-            if counter % 100 == 0:
-                self._appendJSON(exsclaim_json, new_captions_distributed)
-                new_captions_distributed = set()
+            success = self._distribute_captions(
+                search_query, exsclaim_json, figure_name
+            )
+            self._commit_figure(
+                ledger.CAPTION_DISTRIBUTOR, exsclaim_json, figure_name, success
+            )
             counter += 1
 
         t1 = time.time()
@@ -1574,5 +1669,32 @@ class CaptionDistributor(ExsclaimTool):
                 t1 - t0, int(counter - 1)
             )
         )
-        self._appendJSON(exsclaim_json, new_captions_distributed)
-        return exsclaim_json
\ No newline at end of file
+        return exsclaim_json
+
+    def stream(self, search_query, articles):
+        """Distribute subfigure captions one article at a time
+
+        Args:
+            search_query (dict): A Search Query JSON to guide search
+            articles (iterable of dicts): EXSCLAIM JSONs, one per article
+        Yields:
+            article_json (dict): the article's EXSCLAIM JSON with captions
+                distributed
+        """
+        self.display_info("Running Caption Distributor\n")
+        os.makedirs(self.results_directory, exist_ok=True)
+        captions_distributed = self.ledger.completed(ledger.CAPTION_DISTRIBUTOR)
+        for article_json in articles:
+            for figure_name in article_json:
+                if figure_name in captions_distributed:
+                    continue
+                self.display_info(
+                    ">>> Parsing captions from: " + figure_name
+                )
+                success = self._distribute_captions(
+                    search_query, article_json, figure_name
+                )
+                self._commit_figure(
+                    ledger.CAPTION_DISTRIBUTOR, article_json, figure_name, success
+                )
+            yield article_json
\ No newline at end of file
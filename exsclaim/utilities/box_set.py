@@ -0,0 +1,140 @@
+"""Sets of bounding boxes stored as arrays
+
+BoxSet holds many boxes in one x1, y1, x2, y2 array so the relations
+between two sets of boxes, such as which boxes contain which, are
+computed for every pair at once. It lives apart from exsclaim.utilities.boxes
+so that module can be imported without numpy.
+"""
+import numpy as np
+
+from .boxes import convert_coords_to_labelbox
+
+
+class BoxSet:
+    """Boxes stored together as an Nx4 float32 array of x1, y1, x2, y2
+
+    Relations between two sets of boxes are computed for every pair at
+    once, as NxM arrays. Boxes are converted to and from Geometry JSON only
+    when they are read from or written to a Figure JSON.
+
+    Args:
+        coords (array-like): Nx4 x1, y1, x2, y2 coordinates
+    """
+
+    def __init__(self, coords=()):
+        self.coords = np.asarray(coords, dtype=np.float32).reshape(-1, 4)
+
+    @classmethod
+    def from_geometries(cls, geometries):
+        """Boxes of a list of Geometry JSONs, [{"x": x1, "y": y1}, ...]
+
+        Compact [x1, y1, x2, y2] geometries are also accepted.
+        """
+        if len(geometries) == 0:
+            return cls()
+        if not isinstance(geometries[0][0], dict):
+            return cls(geometries)
+        points = np.array(
+            [[(point["x"], point["y"]) for point in box] for box in geometries],
+            dtype=np.float32,
+        )
+        return cls(np.concatenate([points.min(axis=1), points.max(axis=1)], axis=1))
+
+    def to_geometries(self):
+        """Geometry JSON of each box, with integer coordinates"""
+        return [
+            convert_coords_to_labelbox([int(value) for value in box])
+            for box in self.coords
+        ]
+
+    def __len__(self):
+        return len(self.coords)
+
+    def __getitem__(self, index):
+        """BoxSet of the boxes selected by an index, slice or mask"""
+        return BoxSet(self.coords[index])
+
+    def centers(self):
+        """Nx2 center (x, y) of each box"""
+        return (self.coords[:, :2] + self.coords[:, 2:]) / 2.0
+
+    def areas(self):
+        """Area of each box"""
+        return np.prod(np.clip(self.coords[:, 2:] - self.coords[:, :2], 0, None), 1)
+
+    def contained_in(self, outer, padding=0):
+        """NxM array, True where box i is strictly inside box j of outer
+
+        Args:
+            outer (BoxSet): M boxes that may contain these
+            padding (float): distance outer boxes are grown by on each side
+        """
+        inner = self.coords[:, None, :]
+        outer = outer.coords[None, :, :]
+        return (
+            (inner[..., 0] > outer[..., 0] - padding)
+            & (inner[..., 1] > outer[..., 1] - padding)
+            & (inner[..., 2] < outer[..., 2] + padding)
+            & (inner[..., 3] < outer[..., 3] + padding)
+        )
+
+    def iou(self, other):
+        """NxM intersection over union of every pair of boxes"""
+        top_left = np.maximum(self.coords[:, None, :2], other.coords[None, :, :2])
+        bottom_right = np.minimum(self.coords[:, None, 2:], other.coords[None, :, 2:])
+        intersection = np.prod(np.clip(bottom_right - top_left, 0, None), 2)
+        union = self.areas()[:, None] + other.areas()[None, :] - intersection
+        return np.divide(
+            intersection, union, out=np.zeros_like(intersection), where=union > 0
+        )
+
+    def distances(self, other):
+        """NxM squared distance between the centers of every pair of boxes
+
+        Distances are computed in float64 so they are exact for integer
+        coordinates.
+        """
+        difference = (
+            self.centers()[:, None, :].astype(np.float64)
+            - other.centers()[None, :, :].astype(np.float64)
+        )
+        return (difference**2).sum(axis=2)
+
+    def nearest(self, other, max_distance=None):
+        """Match each box to the box of other with the closest center
+
+        Args:
+            other (BoxSet): M candidate boxes
+            max_distance (float): largest squared distance of a match
+        Returns:
+            matches (np.ndarray): index in other of each box's match, or -1
+                if other is empty or the closest is beyond max_distance.
+                Ties go to the lowest index
+            distances (np.ndarray): squared distance to each match, -1
+                where there is no match
+        """
+        matches = np.full(len(self), -1)
+        distances = np.full(len(self), -1.0)
+        if len(self) == 0 or len(other) == 0:
+            return matches, distances
+        pairwise = self.distances(other)
+        closest = pairwise.argmin(axis=1)
+        closest_distances = pairwise[np.arange(len(self)), closest]
+        matched = np.ones(len(self), dtype=bool)
+        if max_distance is not None:
+            matched = closest_distances <= max_distance
+        matches[matched] = closest[matched]
+        distances[matched] = closest_distances[matched]
+        return matches, distances
+
+    def first_container(self, outer, padding=0):
+        """Index of the first box of outer containing each box, -1 if none
+
+        Args:
+            outer (BoxSet): M boxes that may contain these
+            padding (float): distance outer boxes are grown by on each side
+        """
+        contained = self.contained_in(outer, padding)
+        if contained.shape[1] == 0:
+            return np.full(len(self), -1)
+        return np.where(contained.any(axis=1), contained.argmax(axis=1), -1)
@@ -4,6 +4,10 @@ Throughout the models and data formats used in exsclaim, bounding
 boxes are sometimes stored as x1,y1,x2,y2 or 'coords' and sometimes
 as [{"x": x1, "y": y1}, ...] or 'labelbox'
 
+Compact EXSCLAIM JSON files (see exsclaim.utilities.schema) store
+geometry as [x1, y1, x2, y2], which the functions reading a geometry here
+also accept.
+
 In addition, we often want to check the relation of two bounding
 boxes and their properites (like center point)
 """
@@ -22,7 +26,9 @@ def convert_coords_to_labelbox(bbox_coordinates):
 
 def convert_labelbox_to_coords(geometry):
     """Converts from [{"x": x1, "y": y1}, ...] to (x1, y1, ...)"""
-    # print(geometry)
+    if not isinstance(geometry[0], dict):
+        x1, y1, x2, y2 = geometry
+        return x1, y1, x2, y2
     x1 = min([point["x"] for point in geometry])
     y1 = min([point["y"] for point in geometry])
     x2 = max([point["x"] for point in geometry])
@@ -47,6 +53,9 @@ def crop_from_geometry(geometry, image):
     Returns:
         Cropped image according to geometry given as numpy array
     """
+    if not isinstance(geometry[0], dict):
+        x1, y1, x2, y2 = geometry
+        return image[y1:y2, x1:x2]
     x1, y1 = geometry[0]["x"], geometry[0]["y"]
     x2, y2 = geometry[3]["x"], geometry[3]["y"]
     return image[y1:y2, x1:x2]
@@ -0,0 +1,370 @@
+"""Pooled, concurrent HTTP fetching shared by the journal scrapers
+
+Every JournalFamily fetches search pages, article pages and figure images
+through one FetchEngine per configuration. The engine keeps a
+requests.Session per domain, so connections and TLS sessions are reused,
+caps the number of requests in flight to each domain, and runs downloads
+on a shared pool of threads. Requests to each domain are rate limited by
+a token bucket, see exsclaim.utilities.rate_limit, and responses can be
+kept in an on disk cache, see exsclaim.utilities.http_cache. It is
+configured with the "http" field of the query, for example
+{"http": {"rate": 0.5, "domain_rates": {"www.nature.com": 2}}}.
+"""
+import collections
+import concurrent.futures
+import itertools
+import json
+import logging
+import os
+import pathlib
+import threading
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import http_cache
+from .rate_limit import RateLimiter
+
+# prefix of the cache keys of pages loaded in a browser
+RENDERED = "rendered:"
+
+HEADERS = {
+    "Accept": (
+        "text/html,application/xhtml+xml,application/xml;"
+        "q=0.9,image/webp,*/*;q=0.8"
+    ),
+    "Accept-Language": "en-US,en;q=0.5",
+    "Upgrade-Insecure-Requests": "1",
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:82.0)"
+        " Gecko/20100101 Firefox/82.0"
+    ),
+}
+
+# Defaults of the query's "http" options
+DEFAULTS = {
+    # threads downloading figure images, shared by every article
+    "max_workers": 8,
+    # requests in flight to one domain, and connections kept open to it
+    "max_per_domain": 4,
+    # articles scraped at once by the JournalScraper
+    "article_workers": 4,
+    # seconds to wait for a server to respond
+    "timeout": 30,
+    # retries of a request after a connection error, a 5xx response or
+    # a 429 Too Many Requests
+    "retries": 2,
+    # requests per second to each domain, or None for no limit
+    "rate": 1.0,
+    # requests that can be made at once to a domain that has been idle
+    "burst": 4,
+    # domains mapped to their own requests per second
+    "domain_rates": {},
+    # true, or options of the HTTPCache responses are kept in
+    "cache": False,
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_config(search_query):
+    """The query's "http" options, with defaults for those not given"""
+    return {**DEFAULTS, **search_query.get("http", {})}
+
+
+def get_engine(search_query):
+    """Get the FetchEngine shared by every scraper with the same options
+
+    Args:
+        search_query (dict): A Search Query JSON
+    Returns:
+        engine (FetchEngine): engine configured by the query's "http" field
+    """
+    config = get_config(search_query)
+    key = json.dumps(config, sort_keys=True)
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = FetchEngine(**config)
+        return _engines[key]
+
+
+def canonical_url(url):
+    """Url with its query parameters sorted and empty ones dropped
+
+    Urls with the same canonical url request the same page.
+
+    Args:
+        url (str): an absolute url
+    Returns:
+        canonical (str): e.g. https://a.org/search?order=x&q=y for
+            https://A.org/search?q=y&journal=&order=x
+    """
+    parts = urllib.parse.urlsplit(url)
+    query = sorted(urllib.parse.parse_qsl(parts.query))
+    return urllib.parse.urlunsplit(
+        (
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path or "/",
+            urllib.parse.urlencode(query),
+            "",
+        )
+    )
+
+
+def imap(function, items, workers):
+    """Apply function to each item on a pool of threads
+
+    At most workers items are in progress at once, and results are yielded
+    in the order of items as soon as they are ready.
+
+    Args:
+        function (callable): called with each item
+        items (iterable): items to apply function to
+        workers (int): number of threads
+    Yields:
+        (item, future) (tuple): each item and the future of its result.
+            future.result() raises if function raised
+    """
+    items = iter(items)
+    with concurrent.futures.ThreadPoolExecutor(max(1, workers)) as executor:
+        pending = collections.deque(
+            (item, executor.submit(function, item))
+            for item in itertools.islice(items, max(1, workers))
+        )
+        while pending:
+            yield pending.popleft()
+            for item in itertools.islice(items, 1):
+                pending.append((item, executor.submit(function, item)))
+
+
+class FetchEngine:
+    """Per domain connection pools and bounded concurrency for HTTP GETs
+
+    Args:
+        max_workers (int): threads running downloads
+        max_per_domain (int): requests in flight to, and connections kept
+            open to, each domain
+        article_workers (int): articles the JournalScraper scrapes at once.
+            Kept here so all "http" options are in one place
+        timeout (float): seconds to wait for a server to respond
+        retries (int): retries after connection errors, 5xx responses and
+            429 Too Many Requests
+        rate (float): requests per second to each domain, None for no limit
+        burst (int): requests that can be made at once to an idle domain
+        domain_rates (dict): domains mapped to their own requests per second
+        cache (bool or dict): if True, keep responses in an HTTPCache at
+            its default path. A dict sets its "path", "ttl" (seconds a
+            response is used without revalidating it, default a week),
+            "search_ttl" (the same for search result pages, default a day)
+            and "max_size_mb". Pages loaded in Selenium are cached through
+            render, except search result pages, which are paged through by
+            clicking in the browser
+    """
+
+    def __init__(
+        self,
+        max_workers=DEFAULTS["max_workers"],
+        max_per_domain=DEFAULTS["max_per_domain"],
+        article_workers=DEFAULTS["article_workers"],
+        timeout=DEFAULTS["timeout"],
+        retries=DEFAULTS["retries"],
+        rate=DEFAULTS["rate"],
+        burst=DEFAULTS["burst"],
+        domain_rates=None,
+        cache=False,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.max_per_domain = max_per_domain
+        self.article_workers = article_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers, thread_name_prefix="exsclaim-fetch"
+        )
+        self.limiter = RateLimiter(rate, burst, domain_rates)
+        self.cache = None
+        self.search_ttl = None
+        if cache:
+            cache = {} if cache is True else cache
+            self.cache = http_cache.HTTPCache(
+                cache.get("path", http_cache.DEFAULT_PATH),
+                ttl=cache.get("ttl", 7 * 86400),
+                max_bytes=int(cache.get("max_size_mb", 2048) * 2**20),
+            )
+            self.search_ttl = cache.get("search_ttl", 86400)
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.slots = {}
+
+    def _domain(self, domain):
+        """Session and request slots of a domain, created on first use"""
+        with self.lock:
+            if domain not in self.sessions:
+                session = requests.Session()
+                session.headers.update(HEADERS)
+                retry = Retry(
+                    total=self.retries,
+                    backoff_factor=0.5,
+                    # 429 and 503 pause the whole domain, see get
+                    status_forcelist=(500, 502, 504),
+                    respect_retry_after_header=False,
+                    allowed_methods=("GET", "HEAD"),
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.max_per_domain,
+                    max_retries=retry,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self.sessions[domain] = session
+                self.slots[domain] = threading.BoundedSemaphore(self.max_per_domain)
+            return self.sessions[domain], self.slots[domain]
+
+    def throttle(self, url):
+        """Wait until the rate limit of url's domain allows a request
+
+        For requests not made by the engine, such as page loads in Selenium.
+
+        Args:
+            url (str): url about to be requested
+        """
+        self.limiter.acquire(urllib.parse.urlsplit(url).netloc)
+
+    def render(self, url, load, ttl=None):
+        """Get a page loaded in a browser, such as Selenium, through the cache
+
+        Rendered pages have no validators, so a stale page is loaded again.
+        They are cached apart from the responses of get, as a browser's page
+        source differs from the html the server sends.
+
+        Args:
+            url (str): url of the page
+            load (callable): loads url in the browser and returns its page
+                source (str) or a screenshot (bytes)
+            ttl (float): seconds a cached page is fresh for, if not the
+                cache's time to live
+        Returns:
+            response (requests.Response): the page source as text, or the
+                screenshot as content
+        """
+        key = RENDERED + url
+        if self.cache is not None:
+            cached = self.cache.lookup(key, ttl)
+            if cached is not None and cached["fresh"]:
+                self.cache.hit(key)
+                return cached["response"]
+        self.throttle(url)
+        body = load(url)
+        content_type = "image/png"
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+            content_type = "text/html; charset=utf-8"
+        response = http_cache.cached_response(
+            url, 200, {"Content-Type": content_type}, body
+        )
+        response.from_cache = False
+        if self.cache is not None:
+            self.cache.store(key, response)
+        return response
+
+    def get(self, url, ttl=None, **kwargs):
+        """GET url on its domain's session, within its rate limit
+
+        A 429 Too Many Requests or 503 Service Unavailable response pauses
+        every request to the domain for its Retry-After, and the request is
+        retried afterwards. With a cache, a fresh cached response is
+        returned without a request, and a stale one is revalidated.
+
+        Args:
+            url (str): url to request
+            ttl (float): seconds a cached response of url is fresh for, if
+                not the cache's time to live
+            **kwargs: passed to requests.Session.get, e.g. headers
+        Returns:
+            response (requests.Response): the response, whatever its status
+        """
+        cached = None
+        use_cache = self.cache is not None and not kwargs.get("stream")
+        if use_cache:
+            cached = self.cache.lookup(url, ttl)
+        if cached is not None and cached["fresh"]:
+            self.cache.hit(url)
+            return cached["response"]
+        if cached is not None:
+            kwargs["headers"] = {**cached["validators"], **kwargs.get("headers", {})}
+        response = self._request(url, **kwargs)
+        if cached is not None and response.status_code == 304:
+            self.cache.hit(url, revalidated=True)
+            return cached["response"]
+        if use_cache:
+            self.cache.store(url, response)
+        return response
+
+    def _request(self, url, **kwargs):
+        """GET url, retrying while its domain is throttled"""
+        domain = urllib.parse.urlsplit(url).netloc
+        session, slots = self._domain(domain)
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in itertools.count():
+            self.limiter.acquire(domain)
+            with slots:
+                self.logger.debug("GET {}".format(url))
+                response = session.get(url, **kwargs)
+                if not kwargs.get("stream"):
+                    # read the body before giving up the slot
+                    response.content
+            throttled = self.limiter.throttled(domain, response, attempt)
+            if not throttled or attempt >= self.retries:
+                return response
+            response.close()
+
+    def download(self, url, path):
+        """Save the body of url to path
+
+        The body is written to a temporary file which replaces path once it
+        is complete, so an interrupted download never leaves a partial file.
+
+        Args:
+            url (str): url to download
+            path (str or pathlib.Path): file to save to
+        Raises:
+            requests.HTTPError: if the server responds with an error
+        """
+        path = pathlib.Path(path)
+        temporary = path.with_name(path.name + ".tmp")
+        response = self.get(url)
+        response.raise_for_status()
+        with open(temporary, "wb") as f:
+            f.write(response.content)
+        os.replace(temporary, path)
+
+    def map(self, function, *iterables):
+        """Run function on the engine's threads, like the builtin map
+
+        Args:
+            function (callable): e.g. a download
+            *iterables: arguments of each call
+        Returns:
+            results (list): the result of each call, in order
+        Raises:
+            Exception: the first error of any call, once all calls finish
+        """
+        futures = [self.executor.submit(function, *args) for args in zip(*iterables)]
+        concurrent.futures.wait(futures)
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Stop the download threads and close every session and the cache"""
+        self.executor.shutdown(wait=True)
+        if self.cache is not None:
+            self.cache.close()
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
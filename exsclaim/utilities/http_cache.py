@@ -0,0 +1,245 @@
+"""Persistent cache of HTTP responses shared by every query
+
+Search pages, article pages and figure images fetched by the journal
+scrapers are kept in a cache directory shared by every query and results
+directory. Bodies are stored once per content, under the SHA-256 of their
+bytes, and a SQLite index maps each url to its body, headers and
+validators. A response younger than its time to live is served without
+any request. An older one is revalidated with If-None-Match and
+If-Modified-Since, so a server that answers 304 Not Modified sends no
+body. The least recently used responses are evicted once the bodies grow
+past the cache's size limit.
+"""
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_PATH = pathlib.Path.home() / ".cache" / "exsclaim" / "http"
+
+# Headers stored with a response. Others are not needed to use it, and
+# bodies are stored already decompressed
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def cached_response(url, status, headers, body):
+    """A requests.Response built from a cached response
+
+    Args:
+        url (str): the response's url
+        status (int): its status code
+        headers (dict): its stored headers
+        body (bytes): its body
+    Returns:
+        response (requests.Response): with from_cache set to True
+    """
+    response = requests.Response()
+    response.url = url
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response._content = body
+    response.from_cache = True
+    return response
+
+
+class HTTPCache:
+    """Content addressed, size bounded cache of GET responses
+
+    Args:
+        path (str or pathlib.Path): directory of the cache
+        ttl (float): seconds a response is used without revalidating it
+        max_bytes (int): size of the stored bodies after which the least
+            recently used responses are evicted
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl=7 * 86400, max_bytes=2 * 2**30):
+        self.logger = logging.getLogger(__name__)
+        self.path = pathlib.Path(path)
+        self.bodies = self.path / "bodies"
+        os.makedirs(self.bodies, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            str(self.path / "index.sqlite3"), check_same_thread=False
+        )
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " url TEXT PRIMARY KEY,"
+                " digest TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " headers TEXT NOT NULL,"
+                " stored REAL NOT NULL,"
+                " used REAL NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_used ON responses (used)"
+            )
+
+    def _body_path(self, digest):
+        """Path a body is stored at, from its SHA-256 hex digest"""
+        return self.bodies / digest[:2] / digest
+
+    def lookup(self, url, ttl=None):
+        """Find a cached response for url
+
+        Args:
+            url (str): url that is about to be requested
+            ttl (float): seconds the response is fresh for, if not the
+                cache's time to live
+        Returns:
+            entry (dict): "response" (requests.Response), "fresh" (bool, True
+                if it is younger than the time to live) and "validators"
+                (dict of conditional request headers), or None if url is
+                not cached
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT digest, headers, stored FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        digest, headers, stored = row
+        try:
+            body = self._body_path(digest).read_bytes()
+        except OSError:
+            # the body was evicted by another process
+            return None
+        headers = json.loads(headers)
+        validators = {}
+        if "ETag" in headers:
+            validators["If-None-Match"] = headers["ETag"]
+        if "Last-Modified" in headers:
+            validators["If-Modified-Since"] = headers["Last-Modified"]
+        return {
+            "response": cached_response(url, 200, headers, body),
+            "fresh": time.time() - stored < (self.ttl if ttl is None else ttl),
+            "validators": validators,
+        }
+
+    def hit(self, url, revalidated=False):
+        """Mark a cached response as used, and as fresh if it was revalidated
+
+        Args:
+            url (str): url of the cached response
+            revalidated (bool): True if the server answered 304 Not Modified
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            if revalidated:
+                self.revalidated += 1
+                self.connection.execute(
+                    "UPDATE responses SET used = ?, stored = ? WHERE url = ?",
+                    (now, now, url),
+                )
+            else:
+                self.hits += 1
+                self.connection.execute(
+                    "UPDATE responses SET used = ? WHERE url = ?", (now, url)
+                )
+
+    def store(self, url, response):
+        """Cache a response, evicting old responses if the cache is full
+
+        Only complete 200 responses that do not forbid storing are cached.
+
+        Args:
+            url (str): url that was requested
+            response (requests.Response): the server's response
+        """
+        with self.lock:
+            self.misses += 1
+        cache_control = response.headers.get("Cache-Control", "").lower()
+        if response.status_code != 200 or "no-store" in cache_control:
+            return
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._body_path(digest)
+        if not path.is_file():
+            os.makedirs(path.parent, exist_ok=True)
+            temporary = path.with_name(
+                "{}.{}.tmp".format(digest, threading.get_ident())
+            )
+            temporary.write_bytes(body)
+            os.replace(temporary, path)
+        headers = {
+            name: response.headers[name]
+            for name in STORED_HEADERS
+            if name in response.headers
+        }
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (url, digest, len(body), json.dumps(headers), now, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        """Delete the least recently used responses until under max_bytes
+
+        A body is only deleted once no url refers to it.
+        """
+        (total,) = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM"
+            " (SELECT DISTINCT digest, size FROM responses)"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self.connection.execute(
+            "SELECT url, digest, size FROM responses ORDER BY used"
+        ).fetchall()
+        for url, digest, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.connection.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self.evictions += 1
+            (shared,) = self.connection.execute(
+                "SELECT COUNT(*) FROM responses WHERE digest = ?", (digest,)
+            ).fetchone()
+            if not shared:
+                total -= size
+                try:
+                    os.remove(self._body_path(digest))
+                except OSError:
+                    pass
+
+    def stats(self):
+        """Counts of hits, revalidations, misses and evictions, and size
+
+        Returns:
+            stats (dict): "hits", "revalidated", "misses", "evictions",
+                "entries" and "bytes"
+        """
+        with self.lock:
+            entries, size = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        """Close the connection to the cache index"""
+        with self.lock:
+            self.connection.close()
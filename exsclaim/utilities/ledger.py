@@ -0,0 +1,228 @@
+"""Transactional record of which articles and figures each tool has finished
+
+The ledger is a SQLite database in results_dir/ledger.sqlite3 with one row
+per (article, figure, stage). Tools record each item as soon as it is done,
+so a restarted run skips exactly the work that already finished. Results
+directories from older versions, which kept this state in the _articles,
+_captions and _figures text files, are imported the first time the ledger
+is opened. The ledger also keeps each query's watermark, the newest
+articles its last run saw, for incremental crawls.
+"""
+import json
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+
+JOURNAL_SCRAPER = "journal_scraper"
+CAPTION_DISTRIBUTOR = "caption_distributor"
+FIGURE_SEPARATOR = "figure_separator"
+
+DONE = "done"
+FAILED = "failed"
+
+LEGACY_FILES = {
+    JOURNAL_SCRAPER: "_articles",
+    CAPTION_DISTRIBUTOR: "_captions",
+    FIGURE_SEPARATOR: "_figures",
+}
+
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+
+def get_ledger(results_directory):
+    """Get the Ledger shared by every tool writing to results_directory
+
+    Args:
+        results_directory (str or pathlib.Path): path to the results directory
+    Returns:
+        ledger (Ledger): ledger saving to results_directory/ledger.sqlite3
+    """
+    key = str(pathlib.Path(results_directory).resolve())
+    with _ledgers_lock:
+        if key not in _ledgers or not os.path.isfile(_ledgers[key].path):
+            _ledgers[key] = Ledger(results_directory)
+        return _ledgers[key]
+
+
+class Ledger:
+    """Per item status of each stage of the pipeline
+
+    Articles are recorded with an empty figure name. Figures are recorded
+    with the name of the article they came from, or an empty article name
+    if it is not known.
+
+    Args:
+        results_directory (str or pathlib.Path): path to the results directory
+    """
+
+    def __init__(self, results_directory):
+        self.logger = logging.getLogger(__name__)
+        self.results_directory = pathlib.Path(results_directory)
+        os.makedirs(self.results_directory, exist_ok=True)
+        self.path = self.results_directory / "ledger.sqlite3"
+        self.lock = threading.Lock()
+        new = not os.path.isfile(self.path)
+        self.connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS ledger ("
+                " article TEXT NOT NULL,"
+                " figure TEXT NOT NULL,"
+                " stage TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " updated REAL NOT NULL,"
+                " PRIMARY KEY (article, figure, stage))"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks ("
+                " query TEXT PRIMARY KEY,"
+                " newest TEXT,"
+                " articles TEXT NOT NULL,"
+                " updated REAL NOT NULL)"
+            )
+        if new:
+            self._import_legacy_files()
+
+    def _import_legacy_files(self):
+        """Record the items listed in _articles, _captions and _figures"""
+        for stage, filename in LEGACY_FILES.items():
+            legacy_file = self.results_directory / filename
+            if not os.path.isfile(legacy_file):
+                continue
+            with open(legacy_file, "r", encoding="utf-8") as f:
+                items = {line.strip() for line in f if line.strip()}
+            self.logger.info(
+                "Importing {} items from {}".format(len(items), legacy_file)
+            )
+            if stage == JOURNAL_SCRAPER:
+                rows = [(item, "", stage) for item in items]
+            else:
+                rows = [("", item, stage) for item in items]
+            self._write(rows, DONE)
+
+    def _write(self, rows, status):
+        """Set the status of (article, figure, stage) rows in one transaction"""
+        updated = time.time()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO ledger VALUES (?, ?, ?, ?, ?)",
+                [row + (status, updated) for row in rows],
+            )
+
+    def record(self, stage, article="", figure="", status=DONE):
+        """Commit the status of one article or figure for a stage
+
+        Args:
+            stage (str): name of the stage, e.g. ledger.FIGURE_SEPARATOR
+            article (str): name of the article
+            figure (str): name of the figure, empty for an article
+            status (str): DONE or FAILED
+        """
+        article = article.split("/")[-1]
+        self._write([(article, figure, stage)], status)
+
+    def completed(self, stage):
+        """Names of the items a stage has finished
+
+        Args:
+            stage (str): name of the stage, e.g. ledger.FIGURE_SEPARATOR
+        Returns:
+            completed (set): figure names, or article names for stages that
+                record articles
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT article, figure FROM ledger WHERE stage = ? AND status = ?",
+                (stage, DONE),
+            ).fetchall()
+        return {figure if figure else article for article, figure in rows}
+
+    def watermark(self, query):
+        """The newest articles seen by a query's last run
+
+        Args:
+            query (str): key of the query, e.g. JournalFamily.watermark_key
+        Returns:
+            watermark (dict): "newest", the newest publication date seen as
+                YYYY-MM-DD, or None, and "articles", the names of the
+                articles seen, newest first. Empty if the query never ran
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT newest, articles FROM watermarks WHERE query = ?", (query,)
+            ).fetchone()
+        if row is None:
+            return {"newest": None, "articles": []}
+        return {"newest": row[0], "articles": json.loads(row[1])}
+
+    def set_watermark(self, query, newest, articles):
+        """Save the newest articles seen by a query's run
+
+        Args:
+            query (str): key of the query
+            newest (str): newest publication date seen, as YYYY-MM-DD
+            articles (list of str): names of the articles seen, newest first
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?)",
+                (query, newest, json.dumps(articles), time.time()),
+            )
+
+    def merge(self, other):
+        """Copy every row of another ledger into this one
+
+        Watermarks of the same query are combined: the newer date is kept
+        and the articles of both are seen.
+
+        Args:
+            other (str or pathlib.Path): path to the ledger.sqlite3 to merge
+        """
+        with self.lock:
+            self.connection.execute("ATTACH DATABASE ? AS other", (str(other),))
+            try:
+                with self.connection:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO ledger SELECT * FROM other.ledger"
+                    )
+                    # ledgers from older versions have no watermarks
+                    (has_watermarks,) = self.connection.execute(
+                        "SELECT COUNT(*) FROM other.sqlite_master"
+                        " WHERE type = 'table' AND name = 'watermarks'"
+                    ).fetchone()
+                    rows = []
+                    if has_watermarks:
+                        rows = self.connection.execute(
+                            "SELECT query, newest, articles FROM other.watermarks"
+                        ).fetchall()
+                    for query, newest, articles in rows:
+                        self._merge_watermark(query, newest, json.loads(articles))
+            finally:
+                self.connection.execute("DETACH DATABASE other")
+
+    def _merge_watermark(self, query, newest, articles):
+        """Combine a watermark with this ledger's watermark of the same query"""
+        row = self.connection.execute(
+            "SELECT newest, articles FROM watermarks WHERE query = ?", (query,)
+        ).fetchone()
+        if row is not None:
+            own_newest, own_articles = row[0], json.loads(row[1])
+            # the articles of the newer watermark come first
+            if (own_newest or "") >= (newest or ""):
+                articles, own_articles = own_articles, articles
+            newest = max(filter(None, [newest, own_newest]), default=None)
+            articles = articles + [a for a in own_articles if a not in articles]
+        self.connection.execute(
+            "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?)",
+            (query, newest, json.dumps(articles), time.time()),
+        )
+
+    def close(self):
+        """Close the connection to the ledger database"""
+        with self.lock:
+            self.connection.close()
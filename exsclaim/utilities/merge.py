@@ -0,0 +1,157 @@
+"""Merge the results directories of a sharded run into one dataset
+
+Each shard's figure store is compacted into a file sorted by figure name, so
+the shards are combined with a k-way merge that holds one record per shard in
+memory at a time. Figure images and other output files are copied, and the
+shards' ledgers are merged so the combined directory can be resumed.
+
+Usage:
+    python -m exsclaim.utilities.merge output/<query name>
+
+merges every output/<query name>/shard_* directory into output/<query name>.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import pathlib
+import shutil
+
+from . import schema
+from .ledger import get_ledger
+from .store import COMPACTED, FigureStore, latest_records
+
+logger = logging.getLogger(__name__)
+
+# files and directories of a results directory that are merged, not copied
+MERGED = {"store", "ledger.sqlite3", "exsclaim.json"}
+
+
+def find_shards(results_directory):
+    """List the shard results directories of a sharded run
+
+    Args:
+        results_directory (str or pathlib.Path): results directory of the query
+    Returns:
+        shards (list of pathlib.Paths): its shard_* subdirectories
+    """
+    pattern = os.path.join(str(results_directory), "shard_*")
+    return [pathlib.Path(path) for path in sorted(glob.glob(pattern))]
+
+
+def merge_records(shards):
+    """Merge the figures of several shards in figure name order
+
+    Args:
+        shards (list of paths): shard results directories
+    Yields:
+        (figure_name, figure_json) for every figure, once. If several shards
+            have a figure, the one from the last shard listed is kept.
+    """
+    streams = [FigureStore(shard).sorted_records() for shard in shards]
+    yield from latest_records(streams)
+
+
+def merge_shards(shards, output_directory, export=True, compact=False):
+    """Combine the results directories of a sharded run
+
+    Args:
+        shards (list of paths): shard results directories
+        output_directory (str or pathlib.Path): results directory to write
+            the merged dataset to
+        export (bool): if True, also write output_directory/exsclaim.json
+        compact (bool): if True, write exsclaim.json as a compact geometry
+            document, see exsclaim.utilities.schema
+    Returns:
+        count (int): number of figures in the merged dataset
+    """
+    output_directory = pathlib.Path(output_directory)
+    store_directory = output_directory / "store"
+    # the merged store replaces whatever was in output_directory before
+    shutil.rmtree(store_directory, ignore_errors=True)
+    os.makedirs(store_directory)
+
+    store_tmp = store_directory / (COMPACTED + ".tmp")
+    export_path = output_directory / "exsclaim.json"
+    export_tmp = output_directory / "exsclaim.json.tmp"
+    count = 0
+    with open(store_tmp, "w", encoding="utf-8") as store_file:
+        export_file = open(export_tmp, "w", encoding="utf-8") if export else None
+        try:
+            if export:
+                export_file.write(schema.header() if compact else "{")
+            for figure_name, figure_json in merge_records(shards):
+                record = {"figure_name": figure_name, "figure": figure_json}
+                store_file.write(json.dumps(record) + "\n")
+                if export and compact:
+                    entry = schema.dump_figure(figure_name, figure_json)
+                    export_file.write(("," if count else "") + entry)
+                elif export:
+                    # same layout as schema.dump(exsclaim_json, f)
+                    figure_json = schema.expand_figures(figure_json)
+                    entry = json.dumps({figure_name: figure_json}, indent=3)[1:-2]
+                    export_file.write(("," if count else "") + entry)
+                count += 1
+            if export and compact:
+                export_file.write("}}")
+            elif export:
+                export_file.write("\n}" if count else "}")
+        finally:
+            if export:
+                export_file.close()
+    os.replace(store_tmp, store_directory / COMPACTED)
+    if export:
+        os.replace(export_tmp, export_path)
+
+    ledger = get_ledger(output_directory)
+    for shard in shards:
+        shard = pathlib.Path(shard)
+        if os.path.isfile(shard / "ledger.sqlite3"):
+            ledger.merge(shard / "ledger.sqlite3")
+        for name in os.listdir(shard):
+            source = shard / name
+            if name in MERGED or not os.path.isdir(source):
+                continue
+            shutil.copytree(source, output_directory / name, dirs_exist_ok=True)
+    logger.info(
+        "Merged {} figures from {} shards into {}".format(
+            count, len(shards), output_directory
+        )
+    )
+    return count
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Merge the shard_* results directories of a sharded run"
+    )
+    parser.add_argument(
+        "results_directory", help="results directory of the query, <results_dir>/<name>"
+    )
+    parser.add_argument(
+        "--shards",
+        nargs="+",
+        help="shard results directories to merge. Default: results_directory/shard_*",
+    )
+    parser.add_argument(
+        "--no-export", action="store_true", help="do not write exsclaim.json"
+    )
+    parser.add_argument(
+        "--compact-geometry",
+        action="store_true",
+        help="write exsclaim.json with [x1, y1, x2, y2] geometry",
+    )
+    args = parser.parse_args(args)
+    shards = args.shards or find_shards(args.results_directory)
+    count = merge_shards(
+        shards,
+        args.results_directory,
+        export=not args.no_export,
+        compact=args.compact_geometry,
+    )
+    print("Merged {} figures from {} shards".format(count, len(shards)))
+
+
+if __name__ == "__main__":
+    main()
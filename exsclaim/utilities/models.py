@@ -1,13 +1,18 @@
 """Code for loading models from checkpoints saved in GoogleDrive
 
-Model names are mapped to googleids in model_names_to_google_ids."""
+Model names are mapped to googleids in model_names_to_google_ids.
+ModelRegistry defers loading each model until it is first used."""
 import os
 import pathlib
+import threading
 
 import torch
 
 from exsclaim.utilities import download
 
+# directory the checkpoints are saved in
+CHECKPOINTS = pathlib.Path(__file__).parent.parent / "figures" / "checkpoints"
+
 # stores the google drive file IDs of default neural network checkpoints
 # replace these if you wish to change a model
 model_names_to_googleids = {
@@ -21,7 +26,7 @@ model_names_to_googleids = {
 
 def load_model_from_checkpoint(model, model_name, cuda, device):
     """load checkpoint weights into model"""
-    checkpoints_path = pathlib.Path(__file__).parent.parent / "figures" / "checkpoints"
+    checkpoints_path = CHECKPOINTS
     checkpoint = checkpoints_path / model_name
     model.to(device)
     # download the model if isn't already
@@ -35,3 +40,41 @@ def load_model_from_checkpoint(model, model_name, cuda, device):
     else:
         model.load_state_dict(torch.load(checkpoint, map_location="cpu"))
     return model
+
+
+class ModelRegistry:
+    """Models that are loaded the first time they are used
+
+    Args:
+        loaders (dict): maps model names to functions that take no
+            arguments and return the loaded model
+    """
+
+    def __init__(self, loaders=None):
+        self.loaders = dict(loaders or {})
+        self.models = {}
+        self.lock = threading.Lock()
+
+    def register(self, name, loader):
+        """Add a model that will be loaded by calling loader on first use"""
+        self.loaders[name] = loader
+
+    def get(self, name):
+        """Return the model called name, loading it if it is not yet loaded"""
+        if name not in self.models:
+            with self.lock:
+                if name not in self.models:
+                    self.models[name] = self.loaders[name]()
+        return self.models[name]
+
+    def is_loaded(self, name):
+        """True if the model called name has been loaded"""
+        return name in self.models
+
+    def loaded(self):
+        """List the names of the models that have been loaded"""
+        return list(self.models)
+
+    def unload(self, name):
+        """Free the model called name. It is reloaded if used again"""
+        self.models.pop(name, None)
@@ -0,0 +1,181 @@
+"""Per domain token bucket rate limiting for the journal scrapers
+
+Each domain has a bucket holding up to burst tokens, refilled at rate
+tokens per second. A request takes a token, and only waits when the
+bucket is empty, so a crawl runs at exactly the rate a publisher allows
+without sleeping before every request. When a server answers 429 Too Many
+Requests or 503 Service Unavailable, every request to its domain waits out
+the Retry-After header, or an exponential backoff if there is none, and
+then continues at the sustained rate, without a burst.
+"""
+import email.utils
+import logging
+import threading
+import time
+
+# Statuses that mean a server wants fewer requests
+THROTTLED = (429, 503)
+
+
+def retry_after(response, default):
+    """Seconds a response asks the client to wait before retrying
+
+    Args:
+        response (requests.Response): a throttled response
+        default (float): seconds to wait if the response does not say
+    Returns:
+        seconds (float): from the Retry-After header, either a number of
+            seconds or an HTTP date, else default
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    return max(0.0, date.timestamp() - time.time())
+
+
+class TokenBucket:
+    """Request budget of one domain
+
+    Args:
+        rate (float): tokens added per second, i.e. the sustained request
+            rate. None for no limit
+        burst (int): most tokens the bucket holds, i.e. requests that can
+            be made at once after the domain has been idle
+        clock (callable): returns the current time in seconds
+        sleep (callable): waits a number of seconds
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.tokens = float(self.burst)
+        self.updated = clock()
+        self.paused_until = 0.0
+        self.waited = 0.0
+
+    def _reserve(self):
+        """Take a token, returning how long to wait before using it"""
+        with self.lock:
+            now = self.clock()
+            if self.rate is None:
+                return max(0.0, self.paused_until - now)
+            # while paused, updated is the end of the pause and no tokens
+            # are added until then
+            if now > self.updated:
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+            # tokens go negative so that waiting requests queue in order
+            self.tokens -= 1
+            return self.updated - now + max(0.0, -self.tokens) / self.rate
+
+    def acquire(self):
+        """Wait until a request may be made
+
+        Returns:
+            waited (float): seconds spent waiting
+        """
+        waited = 0.0
+        wait = self._reserve()
+        while wait > 0:
+            self.sleep(wait)
+            waited += wait
+            # the domain may have been paused while this request waited
+            with self.lock:
+                wait = self.paused_until - self.clock()
+        with self.lock:
+            self.waited += waited
+        return waited
+
+    def pause(self, seconds):
+        """Stop all requests for seconds, then restart at the sustained rate
+
+        Args:
+            seconds (float): time to pause for, e.g. from retry_after
+        """
+        with self.lock:
+            now = self.clock()
+            self.paused_until = max(self.paused_until, now + seconds)
+            # one request may be made when the pause ends, but no burst
+            self.tokens = min(self.tokens, 1.0)
+            self.updated = max(self.updated, self.paused_until)
+
+
+class RateLimiter:
+    """Token buckets of every domain
+
+    Args:
+        rate (float): default requests per second to each domain. None for
+            no limit
+        burst (int): default burst of each domain
+        domains (dict): domain names mapped to their own requests per
+            second, e.g. {"pubs.acs.org": 0.2}
+        max_retry_after (float): longest Retry-After that is waited out.
+            A server asking for longer is given up on
+    """
+
+    def __init__(self, rate=1.0, burst=4, domains=None, max_retry_after=300):
+        self.logger = logging.getLogger(__name__)
+        self.rate = rate
+        self.burst = burst
+        self.domains = domains or {}
+        self.max_retry_after = max_retry_after
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def bucket(self, domain):
+        """The domain's TokenBucket, created on first use"""
+        with self.lock:
+            if domain not in self.buckets:
+                rate = self.domains.get(domain, self.rate)
+                self.buckets[domain] = TokenBucket(rate, self.burst)
+            return self.buckets[domain]
+
+    def acquire(self, domain):
+        """Wait until a request to domain may be made"""
+        return self.bucket(domain).acquire()
+
+    def throttled(self, domain, response, attempt):
+        """Pause a domain that answered with a throttled response
+
+        Args:
+            domain (str): domain that answered
+            response (requests.Response): its response
+            attempt (int): number of earlier retries of the request
+        Returns:
+            retry (bool): True if the request should be retried
+        """
+        if response.status_code not in THROTTLED:
+            return False
+        rate = self.domains.get(domain, self.rate)
+        backoff = (1 / rate if rate else 1.0) * 2**attempt
+        seconds = retry_after(response, backoff)
+        if seconds > self.max_retry_after:
+            self.logger.warning(
+                "{} asked to wait {:.0f} s, giving up".format(domain, seconds)
+            )
+            return False
+        self.logger.info(
+            "{} responded {}, pausing it for {:.1f} s".format(
+                domain, response.status_code, seconds
+            )
+        )
+        self.bucket(domain).pause(seconds)
+        return True
+
+    def stats(self):
+        """Seconds spent waiting for each domain"""
+        with self.lock:
+            return {domain: bucket.waited for domain, bucket in self.buckets.items()}
@@ -0,0 +1,152 @@
+"""Persistent cache of FigureSeparator results keyed by figure content
+
+The same figure is often separated more than once: by re-runs, by
+overlapping queries and when it is scraped from both HTML and a PDF. The
+cache is a SQLite database, shared by every results directory, mapping a
+key built from the figure's bytes, the models and the separator settings
+to the figure's separator output. The least recently used results are
+evicted once the cache grows past its size limit.
+"""
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = pathlib.Path.home() / ".cache" / "exsclaim" / "figure_results.sqlite3"
+
+
+def file_digest(path, chunk_size=2**20):
+    """SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(figure_digest, settings):
+    """Key of a figure's result
+
+    Args:
+        figure_digest (str): digest of the figure's bytes, from file_digest
+        settings (dict): JSON serializable model versions and thresholds
+            the result depends on
+    Returns:
+        key (str): SHA-256 hex digest of both
+    """
+    text = json.dumps([figure_digest, settings], sort_keys=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Size bounded, least recently used cache of Figure JSON fragments
+
+    Args:
+        path (str or pathlib.Path): path to the SQLite database
+        max_bytes (int): size of the stored results after which the least
+            recently used are evicted
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=512 * 2**20):
+        self.logger = logging.getLogger(__name__)
+        self.path = pathlib.Path(path)
+        os.makedirs(self.path.parent, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " used REAL NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_used ON results (used)"
+            )
+
+    def get(self, key):
+        """Look up a result, marking it as recently used
+
+        Args:
+            key (str): key from make_key
+        Returns:
+            value (dict): the cached result, or None if it is not cached
+        """
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT value FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.connection.execute(
+                "UPDATE results SET used = ? WHERE key = ?", (time.time(), key)
+            )
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """Store a result, evicting old results if the cache is full
+
+        Args:
+            key (str): key from make_key
+            value (dict): JSON serializable result
+        """
+        text = json.dumps(value)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (key, text, len(text), time.time()),
+            )
+            self._evict()
+
+    def _evict(self):
+        """Delete the least recently used results until under max_bytes"""
+        (total,) = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        rows = self.connection.execute("SELECT key, size FROM results ORDER BY used")
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self.connection.executemany("DELETE FROM results WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+
+    def stats(self):
+        """Counts of hits, misses and evictions, and the cache's size
+
+        Returns:
+            stats (dict): "hits", "misses", "evictions", "entries" and
+                "bytes"
+        """
+        with self.lock:
+            entries, size = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        """Close the connection to the cache database"""
+        with self.lock:
+            self.connection.close()
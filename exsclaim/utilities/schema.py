@@ -0,0 +1,149 @@
+"""Compact encoding of the geometry in EXSCLAIM JSON files
+
+By default every geometry in an EXSCLAIM JSON is a list of four corner
+points, [{"x": x1, "y": y1}, ...]. With "compact_geometry": true in the
+query, exsclaim.json is written as a versioned document
+
+    {"schema": "exsclaim-compact-geometry", "version": 1, "figures": {...}}
+
+in which every geometry is an [x1, y1, x2, y2] list and whitespace is
+left out. The geometry helpers in exsclaim.utilities.boxes accept both
+forms, so compact files are used as they are read and never expanded.
+"""
+import contextlib
+import gc
+import json
+
+from .boxes import convert_coords_to_labelbox, convert_labelbox_to_coords
+
+SCHEMA = "exsclaim-compact-geometry"
+VERSION = 1
+
+
+def is_compact(geometry):
+    """Check if a geometry is an [x1, y1, x2, y2] list"""
+    return len(geometry) == 4 and not isinstance(geometry[0], dict)
+
+
+def compact_geometry(geometry):
+    """Geometry as [x1, y1, x2, y2]. An empty geometry stays empty"""
+    if not geometry or is_compact(geometry):
+        return geometry
+    return list(convert_labelbox_to_coords(geometry))
+
+
+def expand_geometry(geometry):
+    """Geometry as [{"x": x1, "y": y1}, ...]. An empty geometry stays empty"""
+    if not geometry or not is_compact(geometry):
+        return geometry
+    return convert_coords_to_labelbox(geometry)
+
+
+def _convert(value, convert):
+    """Copy of a JSON value with convert applied to every "geometry" """
+    if isinstance(value, dict):
+        return {
+            key: convert(item) if key == "geometry" else _convert(item, convert)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_convert(item, convert) for item in value]
+    return value
+
+
+def compact_figures(exsclaim_json):
+    """Copy of an EXSCLAIM JSON with every geometry as [x1, y1, x2, y2]"""
+    return _convert(exsclaim_json, compact_geometry)
+
+
+def expand_figures(exsclaim_json):
+    """Copy of an EXSCLAIM JSON with every geometry as four corner points"""
+    return _convert(exsclaim_json, expand_geometry)
+
+
+@contextlib.contextmanager
+def paused_gc():
+    """Pause the cyclic garbage collector, e.g. while JSON is decoded
+
+    Decoding a large EXSCLAIM JSON makes millions of containers, none of
+    them in reference cycles, and the collections they trigger take longer
+    than the decoding itself.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def is_document(data):
+    """Check if data read from an exsclaim.json is a compact document"""
+    return isinstance(data, dict) and data.get("schema") == SCHEMA
+
+
+def figures(data, expand=False):
+    """The EXSCLAIM JSON in data read from an exsclaim.json of either form
+
+    Args:
+        data (dict): an EXSCLAIM JSON or a compact document
+        expand (bool): if True, expand compact geometry to corner points
+    Returns:
+        exsclaim_json (dict): figure names mapped to Figure JSONs
+    Raises:
+        ValueError: if the document is from a newer version of the schema
+    """
+    if not is_document(data):
+        return data
+    if data.get("version", 0) > VERSION:
+        raise ValueError(
+            "exsclaim.json is version {} of {}, newer than the supported {}".format(
+                data["version"], SCHEMA, VERSION
+            )
+        )
+    exsclaim_json = data["figures"]
+    return expand_figures(exsclaim_json) if expand else exsclaim_json
+
+
+def load(path, expand=False):
+    """Read an exsclaim.json of either form
+
+    Args:
+        path (str or pathlib.Path): path to the exsclaim.json
+        expand (bool): if True, expand compact geometry to corner points
+    Returns:
+        exsclaim_json (dict): figure names mapped to Figure JSONs
+    """
+    with open(path, "r", encoding="utf-8") as f, paused_gc():
+        return figures(json.load(f), expand)
+
+
+def header():
+    """Start of a compact document, before its first figure"""
+    return '{{"schema":"{}","version":{},"figures":{{'.format(SCHEMA, VERSION)
+
+
+def dump_figure(figure_name, figure_json):
+    """A figure's "name":{...} entry in a compact document"""
+    return json.dumps(
+        {figure_name: compact_figures(figure_json)}, separators=(",", ":")
+    )[1:-1]
+
+
+def dump(exsclaim_json, f, compact=False):
+    """Write an EXSCLAIM JSON to a file
+
+    Args:
+        exsclaim_json (dict): figure names mapped to Figure JSONs
+        f (file): text file to write to
+        compact (bool): if True, write a compact document. Otherwise write
+            the EXSCLAIM JSON with corner point geometry, indented by 3
+    """
+    if not compact:
+        json.dump(expand_figures(exsclaim_json), f, indent=3)
+        return
+    f.write(header())
+    for index, (figure_name, figure_json) in enumerate(exsclaim_json.items()):
+        f.write(("," if index else "") + dump_figure(figure_name, figure_json))
+    f.write("}}")
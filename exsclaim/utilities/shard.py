@@ -0,0 +1,79 @@
+"""Deterministic partitioning of a query's work across several nodes
+
+A run is split into count shards and each node runs the whole pipeline on
+shard index, saving to its own results directory. Articles are assigned to
+shards by a hash of their name, so every node agrees on the partition
+without communicating and a rerun of a shard processes the same articles.
+The shard is set with the "shard" field of the query, for example
+{"shard": {"index": 0, "count": 4}}, or, for SLURM array jobs, by the
+SLURM_ARRAY_TASK_ID and SLURM_ARRAY_TASK_COUNT environment variables.
+"""
+import hashlib
+import os
+
+
+def get_shard(search_query):
+    """Determine which shard of the work this process runs
+
+    Args:
+        search_query (dict): A Search Query JSON
+    Returns:
+        (index, count) (tuple of ints): this process runs shard index of
+            count shards. (0, 1) if the work is not sharded
+    """
+    shard = search_query.get("shard")
+    if shard:
+        index, count = int(shard["index"]), int(shard["count"])
+    elif "SLURM_ARRAY_TASK_ID" in os.environ:
+        first = int(os.environ.get("SLURM_ARRAY_TASK_MIN", 0))
+        index = int(os.environ["SLURM_ARRAY_TASK_ID"]) - first
+        count = int(os.environ["SLURM_ARRAY_TASK_COUNT"])
+    else:
+        return 0, 1
+    if not 0 <= index < count:
+        raise ValueError("shard index {} is not in [0, {})".format(index, count))
+    return index, count
+
+
+def shard_of(key, count):
+    """Shard that an article or figure belongs to
+
+    Args:
+        key (str): article url or name, or figure name
+        count (int): number of shards
+    Returns:
+        index (int): shard in [0, count) that key is assigned to
+    """
+    key = key.rstrip("/").split("/")[-1]
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return int(digest, 16) % count
+
+
+def in_shard(key, search_query):
+    """Check if an article or figure belongs to this process's shard
+
+    Args:
+        key (str): article url or name, or figure name
+        search_query (dict): A Search Query JSON
+    Returns:
+        True if key is assigned to the shard this process runs
+    """
+    index, count = get_shard(search_query)
+    return count == 1 or shard_of(key, count) == index
+
+
+def shard_name(search_query):
+    """Name of the results directory for this process's shard
+
+    Args:
+        search_query (dict): A Search Query JSON
+    Returns:
+        name (str): the query name, followed by the shard's subdirectory
+            if the work is sharded
+    """
+    index, count = get_shard(search_query)
+    if count == 1:
+        return search_query["name"]
+    return os.path.join(
+        search_query["name"], "shard_{:03d}_of_{:03d}".format(index, count)
+    )
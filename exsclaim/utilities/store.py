@@ -0,0 +1,287 @@
+"""Append-only storage of Figure JSONs for a results directory
+
+Figures are written as one JSON record per line to numbered segment files in
+results_dir/store. A figure written more than once is resolved to its most
+recent record, so a tool only needs to write the figures it changed.
+Compaction merges all segments into a single file sorted by figure name,
+sorting one segment at a time and streaming the sorted segments into the
+compacted file, and exsclaim.json is produced from the store on demand with
+export().
+"""
+import heapq
+import json
+import logging
+import os
+import pathlib
+import re
+import threading
+
+from . import schema
+
+COMPACTED = "compacted.jsonl"
+SEGMENT = "segment_{:06d}.jsonl"
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(results_directory):
+    """Get the FigureStore shared by every tool writing to results_directory
+
+    Args:
+        results_directory (str or pathlib.Path): path to the results directory
+    Returns:
+        store (FigureStore): store saving to results_directory/store
+    """
+    key = str(pathlib.Path(results_directory).resolve())
+    with _stores_lock:
+        if key not in _stores or not os.path.isdir(_stores[key].directory):
+            _stores[key] = FigureStore(results_directory)
+        return _stores[key]
+
+
+def latest_records(streams):
+    """Merge streams of records sorted by figure name, keeping one per figure
+
+    Args:
+        streams (list of iterables): (figure_name, figure_json) records, each
+            sorted by figure name with at most one record per figure
+    Yields:
+        (figure_name, figure_json) for every figure, once, in figure name
+            order. If several streams have a figure, the one from the last
+            stream listed is kept.
+    """
+    # heapq.merge is stable, so records of a figure come in stream order
+    merged = heapq.merge(*streams, key=lambda record: record[0])
+    previous = None
+    for record in merged:
+        if previous is not None and record[0] != previous[0]:
+            yield previous
+        previous = record
+    if previous is not None:
+        yield previous
+
+
+class FigureStore:
+    """Append-only record store of Figure JSONs keyed by figure name
+
+    Args:
+        results_directory (str or pathlib.Path): path to the results directory
+        segment_size (int): bytes after which a new segment is started
+        max_segments (int): number of segments that triggers a compaction
+        fsync (bool): if True, flush each write to disk before returning
+    """
+
+    def __init__(
+        self, results_directory, segment_size=64 * 2**20, max_segments=16, fsync=True
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.results_directory = pathlib.Path(results_directory)
+        self.directory = self.results_directory / "store"
+        os.makedirs(self.directory, exist_ok=True)
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.fsync = fsync
+        self.lock = threading.RLock()
+        # never append to a segment left by a previous run, it may end in a
+        # partially written line
+        segments = self._segment_ids()
+        self.segment_id = segments[-1] + 1 if segments else 0
+        self.segment = None
+        if not segments and not os.path.isfile(self.directory / COMPACTED):
+            self._import_exsclaim_json()
+
+    def _segment_ids(self):
+        """List the ids of the segment files, oldest first"""
+        ids = []
+        for name in os.listdir(self.directory):
+            match = re.fullmatch(r"segment_(\d+)\.jsonl", name)
+            if match:
+                ids.append(int(match.group(1)))
+        return sorted(ids)
+
+    def _segment_paths(self):
+        """List the paths of all record files in the order they are replayed"""
+        paths = []
+        if os.path.isfile(self.directory / COMPACTED):
+            paths.append(self.directory / COMPACTED)
+        for segment_id in self._segment_ids():
+            paths.append(self.directory / SEGMENT.format(segment_id))
+        return paths
+
+    def _import_exsclaim_json(self):
+        """Seed an empty store with the figures of an existing exsclaim.json"""
+        exsclaim_path = self.results_directory / "exsclaim.json"
+        try:
+            exsclaim_json = schema.load(exsclaim_path)
+        except Exception:
+            return
+        self.logger.info("Importing {} into the figure store".format(exsclaim_path))
+        self.put(exsclaim_json)
+
+    def _open_segment(self):
+        """Open the current segment for appending, starting a new one if full"""
+        if self.segment is not None and self.segment.tell() >= self.segment_size:
+            self.segment.close()
+            self.segment = None
+            self.segment_id += 1
+            if len(self._segment_ids()) >= self.max_segments:
+                self.compact()
+        if self.segment is None:
+            self.segment = open(
+                self.directory / SEGMENT.format(self.segment_id), "a", encoding="utf-8"
+            )
+        return self.segment
+
+    @staticmethod
+    def _read_records(path):
+        """Read (figure_name, figure_json) records from a record file
+
+        Lines that can not be decoded, such as one cut off by a crash while
+        it was being written, are skipped.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    yield record["figure_name"], record["figure"]
+                except (ValueError, KeyError, TypeError):
+                    logging.getLogger(__name__).warning(
+                        "Skipping unreadable record in {}".format(path)
+                    )
+
+    def put(self, figures):
+        """Write Figure JSONs to the store
+
+        Args:
+            figures (dict): An EXSCLAIM JSON of the figures to write
+        """
+        if not figures:
+            return
+        lines = "".join(
+            json.dumps({"figure_name": name, "figure": figure_json}) + "\n"
+            for name, figure_json in figures.items()
+        )
+        with self.lock:
+            segment = self._open_segment()
+            segment.write(lines)
+            segment.flush()
+            if self.fsync:
+                os.fsync(segment.fileno())
+
+    def load(self):
+        """Read the latest version of every figure in the store
+
+        Returns:
+            exsclaim_json (dict): An EXSCLAIM JSON of every figure in the store
+        """
+        exsclaim_json = {}
+        with self.lock, schema.paused_gc():
+            if self.segment is not None:
+                self.segment.flush()
+            for path in self._segment_paths():
+                for figure_name, figure_json in self._read_records(path):
+                    exsclaim_json[figure_name] = figure_json
+        return exsclaim_json
+
+    def _sort_segment(self, segment_id):
+        """Write a segment's latest records, sorted by figure name, to a run file
+
+        Only this segment's records are held in memory.
+
+        Returns:
+            run_path (pathlib.Path): path to the sorted run file
+        """
+        segment_path = self.directory / SEGMENT.format(segment_id)
+        records = dict(self._read_records(segment_path))
+        run_path = self.directory / (SEGMENT.format(segment_id) + ".sorted")
+        with open(run_path, "w", encoding="utf-8") as f:
+            for figure_name in sorted(records):
+                record = {"figure_name": figure_name, "figure": records[figure_name]}
+                f.write(json.dumps(record) + "\n")
+        return run_path
+
+    def compact(self, compact_geometry=False):
+        """Merge all records into one file sorted by figure name
+
+        Each segment is sorted on its own, then the compacted file and the
+        sorted segments are merged as streams, so at most one segment's
+        records are held in memory.
+
+        Args:
+            compact_geometry (bool): if True, store every geometry as
+                [x1, y1, x2, y2], see exsclaim.utilities.schema
+        Returns:
+            count (int): number of figures in the store
+        """
+        with self.lock:
+            if self.segment is not None:
+                self.segment.close()
+                self.segment = None
+            merged = self._segment_ids()
+            runs = [self._sort_segment(segment_id) for segment_id in merged]
+            streams = [self._read_records(run) for run in runs]
+            if os.path.isfile(self.directory / COMPACTED):
+                streams.insert(0, self._read_records(self.directory / COMPACTED))
+            count = 0
+            tmp_path = self.directory / (COMPACTED + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for figure_name, figure_json in latest_records(streams):
+                    if compact_geometry:
+                        figure_json = schema.compact_figures(figure_json)
+                    record = {"figure_name": figure_name, "figure": figure_json}
+                    f.write(json.dumps(record) + "\n")
+                    count += 1
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.directory / COMPACTED)
+            # records in merged segments are now in the compacted file; if we
+            # crash before removing them they are replayed to the same values
+            for segment_id, run in zip(merged, runs):
+                os.remove(self.directory / SEGMENT.format(segment_id))
+                os.remove(run)
+            self.segment_id = merged[-1] + 1 if merged else self.segment_id
+        return count
+
+    def sorted_records(self):
+        """Iterate over the latest version of every figure, by figure name
+
+        Compacts the store first if it has uncompacted segments, which holds
+        at most one segment's records in memory, then streams the compacted
+        file, so the records are not all held in memory.
+
+        Yields:
+            (figure_name, figure_json) for every figure in the store
+        """
+        with self.lock:
+            if self.segment is not None or self._segment_ids():
+                self.compact()
+        if os.path.isfile(self.directory / COMPACTED):
+            yield from self._read_records(self.directory / COMPACTED)
+
+    def export(self, path=None, compact=False):
+        """Write every figure in the store to a single EXSCLAIM JSON file
+
+        Args:
+            path (str or pathlib.Path): where to write the EXSCLAIM JSON.
+                Default is results_dir/exsclaim.json
+            compact (bool): if True, write a compact geometry document, see
+                exsclaim.utilities.schema
+        Returns:
+            exsclaim_json (dict): An EXSCLAIM JSON of every figure in the store
+        """
+        if path is None:
+            path = self.results_directory / "exsclaim.json"
+        exsclaim_json = self.load()
+        tmp_path = pathlib.Path(str(path) + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            schema.dump(exsclaim_json, f, compact)
+        os.replace(tmp_path, path)
+        return exsclaim_json
+
+    def close(self):
+        """Close the segment currently open for writing"""
+        with self.lock:
+            if self.segment is not None:
+                self.segment.close()
+                self.segment = None
@@ -1,11 +1,10 @@
-import json
 import pandas as pd
 
+from .utilities import schema
+
 def read_jsons(filepath):
-    # Open the file and read its contents
-    with open(filepath, 'r') as f:
-        data = f.read()
-    my_dict = json.loads(data)
+    # Read an exsclaim.json with either geometry form
+    my_dict = schema.load(filepath)
     rows = [{**{'name': name}, **data} for name, data in my_dict.items()]
     df = pd.DataFrame(rows)
     return df
\ No newline at end of file
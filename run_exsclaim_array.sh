@@ -0,0 +1,22 @@
+#!/bin/bash
+#SBATCH --job-name=ex-eds
+#SBATCH --account=CDIdefect
+#SBATCH --nodes=1
+#SBATCH --gres=gpu:1
+#SBATCH --time=24:00:00
+#SBATCH --partition=gpu
+#SBATCH --array=0-3
+
+# Each array task runs the pipeline on one shard of the query's articles,
+# saving to <results_dir>/<name>/shard_<task>_of_<count>. After all tasks
+# finish, merge the shards into <results_dir>/<name> with:
+#   sbatch --dependency=afterok:<array job id> --wrap \
+#       "python -m exsclaim.utilities.merge <results_dir>/<name>"
+
+#module load anaconda3/2020.11
+#conda init bash
+#source ~/.bashrc
+#conda activate exsclaim
+
+source bin/activate
+python /lcrc/project/CDIdefect/kvriza_exsclaim/exsclaim/run_exsclaim.py